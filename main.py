@@ -1,4 +1,5 @@
 import asyncio
+import os
 import sys
 from logging import config, getLogger
 
@@ -7,29 +8,33 @@ import yaml
 from dotenv import load_dotenv
 
 from src import resolver
+from src.log import start_queue_logging
+from src.metrics import start_metrics_server
+from src.sweep import load_ohlcv, load_sweep_config, run_sweep
 
 load_dotenv()
 
-with open("main_logger_config.yml", encoding="UTF-8") as f:
+with open(
+    os.getenv("LOGGER_CONFIG_FILEPATH", "main_logger_config.yml"), encoding="UTF-8"
+) as f:
     y = yaml.safe_load(f.read())
+    # not a dictConfig key. see main_logger_config_async.yml
+    queue_config = y.pop("queue", None)
     config.dictConfig(y)
+    if queue_config is not None:
+        start_queue_logging(**queue_config)
 
 
 async def main(restart: bool):
     logger = getLogger(__name__)
     logger.info("start")
 
-    while True:
-        bot = resolver.create_market_maker_bot()
-        bot.start()
-        while bot.health_check():
-            logger.debug("health check ok")
-            await asyncio.sleep(10)
-        await bot.stop()
-
-        if not restart:
-            break
-        logger.warning("Restarting bot")
+    # a failed loop is restarted alone at once. providers, contracts, open
+    # orders and nonces of the bot are kept
+    bot = resolver.create_market_maker_bot(max_restarts=None if restart else 0)
+    bot.start()
+    await bot.wait()
+    await bot.stop()
 
     logger.warning("exit")
 
@@ -37,10 +42,28 @@ async def main(restart: bool):
 class Cli:
     """market maker bot"""
 
-    def run(self, restart: bool = True):
-        """run arbitrage bot"""
+    def run(self, restart: bool = True, metrics_port: int = None):
+        """run arbitrage bot. serves prometheus /metrics on metrics_port"""
+        if metrics_port is not None:
+            start_metrics_server(metrics_port)
         asyncio.run(main(restart))
 
+    def sweep(
+        self,
+        data: str,
+        grid: str,
+        output: str = "sweep_results.csv",
+        workers: int = None,
+    ):
+        """backtest a grid of price/size calculator configs on recorded bars"""
+        results = run_sweep(
+            ohlcv=load_ohlcv(data),
+            config=load_sweep_config(grid),
+            workers=workers,
+        )
+        results.to_csv(output, index=False)
+        print(results.head(20).to_string())
+
 
 if __name__ == "__main__":
     fire.Fire(Cli)
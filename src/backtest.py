@@ -0,0 +1,246 @@
+import itertools
+from dataclasses import dataclass
+from logging import getLogger
+
+import numpy as np
+import pandas as pd
+
+from .ohlcv import OHLCV_COLUMNS
+
+
+class ReplayFeed:
+    """Recorded bars replayed as IOhlcvGetter / IPriceGetter
+
+    At cursor i, bars [0, i] are visible and bar i is the forming bar whose
+    close is the current price. Mark prices without OHLCV can be replayed
+    as bars with op = hi = lo = cl.
+    """
+
+    def __init__(self, ohlcv: dict):
+        self._ohlcv = {
+            column: np.asarray(ohlcv[column], dtype=np.float64)
+            for column in OHLCV_COLUMNS
+        }
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self._ohlcv["timestamp"])
+
+    def seek(self, i: int):
+        self._cursor = i
+
+    def arrays(self) -> dict:
+        """all bars including the future ones"""
+        return self._ohlcv
+
+    def get_ohlcv_arrays(self) -> dict:
+        end = self._cursor + 1
+        return {column: values[:end] for column, values in self._ohlcv.items()}
+
+    def get_ohlcv_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self.get_ohlcv_arrays(), copy=False)
+
+    def bid_price(self) -> float:
+        return self.last_price()
+
+    def ask_price(self) -> float:
+        return self.last_price()
+
+    def last_price(self) -> float:
+        return self._ohlcv["cl"][self._cursor]
+
+
+class SimulatedExchange:
+    """Post-only limit order book of our own orders as IMaker / IPositionGetter
+
+    Orders crossing the current price are rejected on post (post-only).
+    A resting buy fills in full when a later bar trades below its price and
+    a resting sell when a later bar trades above it. side_int is 1 for buy
+    and -1 for sell in the price space of the feed.
+    """
+
+    def __init__(self, maker_fee_rate: float = 0.0):
+        self._maker_fee_rate = maker_fee_rate
+        self._logger = getLogger(__class__.__name__)
+
+        self._order_ids = itertools.count(1)
+        # order_id -> dict(order_id=, side_int=, size=, price=)
+        self._orders: dict = {}
+        self._price: float = None
+        self.position: float = 0.0
+        self.cash: float = 0.0
+        self.fills: list = []
+        self.posted_count: int = 0
+        self.rejected_count: int = 0
+
+    def set_price(self, price: float):
+        self._price = price
+
+    def current_position(self) -> float:
+        return self.position
+
+    async def post_limit_order(
+        self, symbol: str, side_int: int, size: float, price: float
+    ) -> str:
+        if size == 0:
+            return None
+        if (side_int > 0 and price >= self._price) or (
+            side_int < 0 and price <= self._price
+        ):
+            self.rejected_count += 1
+            return None
+        self.posted_count += 1
+        order_id = next(self._order_ids)
+        self._orders[order_id] = dict(
+            order_id=order_id, side_int=side_int, size=size, price=price
+        )
+        return order_id
+
+    async def cancel_all_orders(self, symbol: str):
+        self._orders.clear()
+
+    async def cancel_limit_order(self, symbol: str, side_int: int, order_id: str):
+        self._orders.pop(order_id, None)
+
+    async def replace_all_orders(self, symbol: str, orders: list):
+        await self.cancel_all_orders(symbol)
+        for order in orders:
+            await self.post_limit_order(symbol=symbol, **order)
+
+    async def get_open_orders(self, symbol: str) -> list:
+        return list(self._orders.values())
+
+    async def cancel_and_post_limit_orders(
+        self, symbol: str, cancel_orders: list, orders: list
+    ):
+        for order in cancel_orders:
+            await self.cancel_limit_order(symbol=symbol, **order)
+        for order in orders:
+            await self.post_limit_order(symbol=symbol, **order)
+
+    def match(self, timestamp: float, hi: float, lo: float):
+        for order_id, order in list(self._orders.items()):
+            if order["side_int"] > 0 and lo < order["price"]:
+                self._fill(timestamp, order)
+            elif order["side_int"] < 0 and hi > order["price"]:
+                self._fill(timestamp, order)
+            else:
+                continue
+            del self._orders[order_id]
+
+    def _fill(self, timestamp: float, order: dict):
+        notional = order["size"] * order["price"]
+        self.position += order["side_int"] * order["size"]
+        self.cash -= order["side_int"] * notional + notional * self._maker_fee_rate
+        self.fills.append(
+            (
+                timestamp,
+                order["order_id"],
+                order["side_int"],
+                order["size"],
+                order["price"],
+            )
+        )
+
+
+@dataclass
+class BacktestConfig:
+    # bars visible before the first quote (indicator warm up)
+    warmup_bars: int = 1
+
+
+@dataclass
+class BacktestResult:
+    timestamp: np.ndarray
+    price: np.ndarray
+    position: np.ndarray
+    cash: np.ndarray
+    fills: pd.DataFrame
+    posted_count: int = 0
+
+    @property
+    def equity(self) -> np.ndarray:
+        return self.cash + self.position * self.price
+
+    def summary(self) -> dict:
+        equity = self.equity
+        position = self.position
+        if len(equity) == 0:
+            equity = position = np.zeros(1)
+        drawdown = np.maximum.accumulate(equity) - equity
+        return dict(
+            pnl=float(equity[-1]),
+            max_drawdown=float(drawdown.max()),
+            fill_count=len(self.fills),
+            fill_rate=len(self.fills) / max(self.posted_count, 1),
+            inventory_variance=float(np.var(position)),
+            volume=float(self.fills["size"].sum()),
+            max_abs_position=float(np.abs(position).max()),
+        )
+
+
+class Backtester:
+    """Drives MarketMaker.execute over a ReplayFeed in virtual time
+
+    The market maker has to be built on the same feed (as IOhlcvGetter and
+    IPriceGetter) and exchange (as IMaker and IPositionGetter), e.g.
+
+        feed = ReplayFeed(ohlcv)
+        exchange = SimulatedExchange()
+        market_maker = mm.MarketMaker(
+            make_price_calculator=mm.NormMakePriceCalculator(feed, ...),
+            make_size_calculator=mm.SimpleMakeSizeCalculator(exchange, ...),
+            maker=exchange,
+            price_getter=feed,
+            ...
+        )
+        result = await Backtester(feed, exchange, BacktestConfig()).run(
+            market_maker
+        )
+
+    Quotes made at bar i are matched against bar i + 1, so there is no look
+    ahead. Nothing sleeps; one step is one bar.
+    """
+
+    def __init__(
+        self,
+        feed: ReplayFeed,
+        exchange: SimulatedExchange,
+        config: BacktestConfig,
+    ):
+        self._feed = feed
+        self._exchange = exchange
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+    async def run(self, market_maker) -> BacktestResult:
+        ohlcv = self._feed.arrays()
+        timestamp = ohlcv["timestamp"]
+        hi = ohlcv["hi"]
+        lo = ohlcv["lo"]
+        cl = ohlcv["cl"]
+
+        start = max(self._config.warmup_bars - 1, 0)
+        steps = range(start, len(self._feed) - 1)
+        position = np.empty(len(steps), dtype=np.float64)
+        cash = np.empty(len(steps), dtype=np.float64)
+        for k, i in enumerate(steps):
+            self._feed.seek(i)
+            self._exchange.set_price(cl[i])
+            await market_maker.execute()
+            self._exchange.match(timestamp[i + 1], hi[i + 1], lo[i + 1])
+            position[k] = self._exchange.position
+            cash[k] = self._exchange.cash
+
+        self._logger.debug("backtested %d bars", len(steps))
+        return BacktestResult(
+            timestamp=timestamp[start + 1 :],
+            price=cl[start + 1 :],
+            position=position,
+            cash=cash,
+            fills=pd.DataFrame(
+                self._exchange.fills,
+                columns=["timestamp", "order_id", "side_int", "size", "price"],
+            ),
+            posted_count=self._exchange.posted_count,
+        )
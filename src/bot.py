@@ -1,9 +1,11 @@
 import asyncio
-import sys
 import time
 from dataclasses import dataclass
 from logging import getLogger
 
+from .metrics import STAGE_SECONDS
+from .supervisor import Supervisor
+
 
 class IMarketMaker:
     def execute(self):
@@ -15,6 +17,19 @@ class IInfoLogger:
         ...
 
 
+class IService:
+    async def run(self):
+        ...
+
+
+class ITrigger:
+    async def run(self):
+        ...
+
+    async def wait(self, timeout: float) -> bool:
+        ...
+
+
 @dataclass
 class BotConfig:
     trade_loop_sec: int
@@ -27,50 +42,64 @@ class Bot:
         config: BotConfig,
         market_maker: IMarketMaker,
         info_logger: IInfoLogger = None,
+        trigger: ITrigger = None,
+        services: list = None,
+        supervisor: Supervisor = None,
     ):
         self._config = config
         self._market_maker = market_maker
         self._info_logger = info_logger
+        self._trigger = trigger
+        # background IService e.g. market data feeds
+        self._services = services or []
 
         self._logger = getLogger(__name__)
 
-        self._task: asyncio.Task = None
+        # failed loops are restarted alone. the market maker and its
+        # connections, caches and order state are kept
+        if supervisor is None:
+            supervisor = Supervisor()
+        self._supervisor = supervisor
 
     def health_check(self) -> bool:
-        return not self._task.done() and not self._task_b.done()
+        return self._supervisor.health_check()
 
     def start(self):
         self._logger.debug("start")
-        self._task = asyncio.create_task(self._trade())
-        self._task_b = asyncio.create_task(self._log_info())
+        self._supervisor.start("trade", self._trade)
+        self._supervisor.start("log_info", self._log_info)
+        if self._trigger is not None:
+            self._supervisor.start("trigger", self._trigger.run)
+        for i, service in enumerate(self._services):
+            self._supervisor.start(
+                "service_{}_{}".format(i, type(service).__name__), service.run
+            )
+
+    async def wait(self):
+        """wait until the supervisor gives up on a loop"""
+        await self._supervisor.wait()
 
     async def stop(self):
         self._logger.debug("force stop running tasks")
-        for task in [self._task, self._task_b]:
-            if task is None:
-                continue
-
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-            self._logger.debug(f"force stopped {task=}")
+        await self._supervisor.stop()
 
     async def _trade(self):
         self._logger.debug("start _trade")
-        try:
-            while True:
-                start = time.time()
-
-                # make
-                await self._market_maker.execute()
-
-                passed = time.time() - start
-                await asyncio.sleep(max(0, self._config.trade_loop_sec - passed))
-
-        except BaseException:
-            self._logger.error(sys.exc_info(), exc_info=True)
+        while True:
+            start = time.time()
+
+            # make
+            await self._market_maker.execute()
+
+            passed = time.time() - start
+            STAGE_SECONDS.labels("cycle").observe(passed)
+            timeout = max(0, self._config.trade_loop_sec - passed)
+            if self._trigger is None:
+                await asyncio.sleep(timeout)
+            else:
+                # requote on trigger, trade_loop_sec is a heartbeat
+                triggered = await self._trigger.wait(timeout)
+                self._logger.debug("triggered=%s", triggered)
 
     async def _log_info(self):
         self._logger.debug("start _log_info")
@@ -0,0 +1,44 @@
+import time
+from typing import Callable, Optional
+
+
+class TTLCache:
+    """Caches contract reads for `ttl_sec`
+
+    With `block_number_getter`, entries are also dropped when the block
+    number changes, so a value never outlives the block it was read at.
+    One instance can be shared by ticker and position getter.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float,
+        block_number_getter: Callable[[], Optional[int]] = None,
+    ):
+        self._ttl_sec = ttl_sec
+        self._block_number_getter = block_number_getter
+
+        self._entries: dict = {}  # key -> (value, ts, block_number)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, fetch: Callable):
+        block_number = (
+            None if self._block_number_getter is None else self._block_number_getter()
+        )
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, ts, entry_block_number = entry
+            if now - ts < self._ttl_sec and entry_block_number == block_number:
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        value = fetch()
+        self._entries[key] = (value, now, block_number)
+        return value
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,136 @@
+import math
+import statistics
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Optional
+
+URGENCY_LOW = "low"
+URGENCY_NORMAL = "normal"
+URGENCY_HIGH = "high"
+
+
+@dataclass
+class FeeOracleConfig:
+    # blocks of eth_feeHistory the tips are taken from
+    history_blocks: int = 20
+    # priority fee percentile of recent blocks per urgency
+    reward_percentiles: dict = field(
+        default_factory=lambda: {
+            URGENCY_LOW: 10,
+            URGENCY_NORMAL: 50,
+            URGENCY_HIGH: 90,
+        }
+    )
+    # maxFeePerGas = base fee * multiplier + tip. 2 survives 6 full blocks
+    base_fee_multiplier: float = 2.0
+    # gasPrice = eth_gasPrice * multiplier on chains without EIP-1559
+    legacy_multipliers: dict = field(
+        default_factory=lambda: {
+            URGENCY_LOW: 1.0,
+            URGENCY_NORMAL: 1.1,
+            URGENCY_HIGH: 1.25,
+        }
+    )
+    update_interval_sec: float = 2.0
+    # geth / erigon reject replacements below +10%
+    bump_rate: float = 0.125
+    max_fee_per_gas: Optional[int] = None
+
+
+class FeeOracle:
+    """Fee fields of a tx by urgency from recent block headers
+
+    Uses base fees and priority fee percentiles of eth_feeHistory (EIP-1559)
+    and falls back to eth_gasPrice when the chain has no base fee. The
+    history is refreshed at most every `update_interval_sec`.
+    """
+
+    def __init__(self, async_w3, config: FeeOracleConfig):
+        self._async_w3 = async_w3
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        self._updated_at: Optional[float] = None
+        self._eip1559: Optional[bool] = None
+        self._base_fee: int = 0
+        # urgency -> tip (EIP-1559) or gas price (legacy)
+        self._fees: dict = {}
+
+    async def fees(self, urgency: str = URGENCY_NORMAL) -> dict:
+        await self._update()
+        if self._eip1559:
+            tip = self._fees[urgency]
+            max_fee = int(self._base_fee * self._config.base_fee_multiplier) + tip
+            if self._config.max_fee_per_gas is not None:
+                max_fee = min(max_fee, self._config.max_fee_per_gas)
+            return {
+                "maxFeePerGas": max_fee,
+                "maxPriorityFeePerGas": min(tip, max_fee),
+            }
+        return {"gasPrice": self._fees[urgency]}
+
+    async def bump(self, tx: dict) -> dict:
+        """fees of a replacement (same nonce) of a stuck tx"""
+        fees = await self.fees(URGENCY_HIGH)
+        bumped = {}
+        for key, value in fees.items():
+            # at least bump_rate over the stuck tx, or the current fee if higher
+            # (rounded up so that small fees still rise)
+            bumped[key] = max(
+                math.ceil(tx.get(key, 0) * (1 + self._config.bump_rate)), value
+            )
+        if "maxFeePerGas" in bumped:
+            bumped["maxFeePerGas"] = max(
+                bumped["maxFeePerGas"], bumped["maxPriorityFeePerGas"]
+            )
+        max_fee = self._config.max_fee_per_gas
+        if max_fee is not None:
+            # never above the cap, but never below the stuck tx either
+            for key in ["maxFeePerGas", "maxPriorityFeePerGas", "gasPrice"]:
+                if key in bumped:
+                    bumped[key] = max(min(bumped[key], max_fee), tx.get(key, 0))
+        self._logger.info("bump fees fees=%s -> bumped=%s", fees, bumped)
+        return dict(tx, **bumped)
+
+    async def _update(self):
+        now = time.monotonic()
+        if (
+            self._updated_at is not None
+            and now - self._updated_at < self._config.update_interval_sec
+        ):
+            return
+        await self._fetch()
+        self._updated_at = now
+
+    async def _fetch(self):
+        if self._eip1559 is not False:
+            percentiles = list(self._config.reward_percentiles.values())
+            try:
+                history = await self._async_w3.eth.fee_history(
+                    self._config.history_blocks, "latest", percentiles
+                )
+            except ValueError as e:
+                # method not found on the node
+                self._logger.info("eth_feeHistory unsupported e=%r", e)
+                history = None
+            # the last base fee is the one of the next block
+            if history is not None and history["baseFeePerGas"][-1] > 0:
+                self._eip1559 = True
+                self._base_fee = history["baseFeePerGas"][-1]
+                self._fees = {
+                    urgency: int(
+                        statistics.median(
+                            [rewards[i] for rewards in history["reward"]] or [0]
+                        )
+                    )
+                    for i, urgency in enumerate(self._config.reward_percentiles)
+                }
+                return
+            self._eip1559 = False
+
+        gas_price = await self._async_w3.eth.gas_price
+        self._fees = {
+            urgency: int(gas_price * multiplier)
+            for urgency, multiplier in self._config.legacy_multipliers.items()
+        }
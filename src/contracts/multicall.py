@@ -0,0 +1,88 @@
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+
+from .utils import encode_method_call
+
+# same address on most EVM chains https://github.com/mds1/multicall
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "getBlockNumber",
+        "outputs": [{"name": "blockNumber", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+
+class Multicall3:
+    """Aggregates view calls into one eth_call
+
+    All results are read at the same block. The block number is returned
+    along with them, so no extra eth_blockNumber round trip is needed.
+    """
+
+    def __init__(self, w3, async_w3, address: str = MULTICALL3_ADDRESS):
+        self._async_w3 = async_w3
+        self._contract = w3.eth.contract(
+            address=Web3.toChecksumAddress(address), abi=MULTICALL3_ABI
+        )
+
+    async def aggregate(self, method_calls: list, block_identifier="latest") -> tuple:
+        """returns (block_number, results). a result is None if its call failed"""
+        method_calls = [self._contract.functions.getBlockNumber()] + method_calls
+        aggregate_call = self._contract.functions.aggregate3(
+            [
+                (method_call.address, True, encode_method_call(method_call))
+                for method_call in method_calls
+            ]
+        )
+        data = await self._async_w3.eth.call(
+            {
+                "to": self._contract.address,
+                "data": encode_method_call(aggregate_call),
+            },
+            block_identifier,
+        )
+        (return_data,) = self._async_w3.codec.decode_abi(
+            get_abi_output_types(aggregate_call.abi), data
+        )
+
+        results = []
+        for method_call, (success, result_data) in zip(method_calls, return_data):
+            if not success:
+                results.append(None)
+                continue
+            result = self._async_w3.codec.decode_abi(
+                get_abi_output_types(method_call.abi), result_data
+            )
+            results.append(result[0] if len(result) == 1 else result)
+        return results[0], results[1:]
@@ -0,0 +1,60 @@
+import asyncio
+from logging import getLogger
+from typing import Optional
+
+
+class NonceManager:
+    """Allocates nonces locally so that txs can be sent without waiting receipts
+
+    One manager is shared by all senders of the account. An allocated nonce
+    is in flight until its sender calls `done` (sent, or taken on chain).
+    """
+
+    def __init__(self, async_w3, address: str):
+        self._w3 = async_w3
+        self._address = address
+        self._logger = getLogger(__class__.__name__)
+
+        self._next_nonce: Optional[int] = None
+        self._in_flight: set = set()
+        self._lock = asyncio.Lock()
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = await self._get_pending_nonce()
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            self._in_flight.add(nonce)
+            return nonce
+
+    def done(self, nonce: int):
+        """`nonce` is no longer waiting to be sent"""
+        self._in_flight.discard(nonce)
+
+    def release(self, nonce: int) -> bool:
+        """give back an allocated nonce that was not sent
+
+        Only the last allocated nonce can be given back. Returns False when
+        later nonces are allocated, so that `nonce` is a gap to be filled.
+        """
+        if self._next_nonce is not None and self._next_nonce == nonce + 1:
+            self._next_nonce = nonce
+            self._in_flight.discard(nonce)
+            return True
+        return False
+
+    async def resync(self):
+        # called on a nonce conflict or when an allocated nonce was never sent
+        # (gap). the pending count is the first nonce the node has not seen yet
+        async with self._lock:
+            nonce = await self._get_pending_nonce()
+            if len(self._in_flight) > 0 and self._next_nonce is not None:
+                # other senders hold unsent nonces below the local counter.
+                # rewinding would hand them out again. only move forward
+                nonce = max(nonce, self._next_nonce)
+            self._logger.info("resync nonce %s -> %s", self._next_nonce, nonce)
+            self._next_nonce = nonce
+
+    async def _get_pending_nonce(self) -> int:
+        return await self._w3.eth.get_transaction_count(self._address, "pending")
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Optional
+
+import aiohttp
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from ..metrics import RETRIES
+
+
+@dataclass
+class ProviderPoolConfig:
+    endpoint_uris: list
+    request_timeout_sec: float = 5.0
+    # weight of the newest sample in the moving latency average
+    latency_alpha: float = 0.2
+    # consecutive failures until a node is ejected
+    max_failures: int = 3
+    # ejected nodes are probed with eth_blockNumber after this
+    probe_interval_sec: float = 10.0
+    # sent to all nodes. the first success is returned
+    broadcast_methods: list = field(default_factory=lambda: ["eth_sendRawTransaction"])
+
+
+@dataclass
+class _Node:
+    uri: str
+    latency_sec: float = 0.0
+    failures: int = 0
+    ejected_at: Optional[float] = None
+    probing: bool = False
+
+
+class AsyncProviderPool(AsyncJSONBaseProvider):
+    """JSON-RPC over several HTTP nodes
+
+    Reads go to the healthy node with the lowest moving average latency and
+    fail over to the next one on a transport error or timeout. JSON-RPC
+    error responses (e.g. reverts) are answers, not failures. Broadcast
+    methods fan out to every node. A node is ejected after `max_failures`
+    consecutive failures and probed in the background until it answers.
+    Connections are kept alive in one aiohttp session.
+    """
+
+    def __init__(self, config: ProviderPoolConfig):
+        super().__init__()
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        self._nodes = [_Node(uri=uri) for uri in config.endpoint_uris]
+        self._session: Optional[aiohttp.ClientSession] = None
+        # fan-out requests still running after the first success
+        self._background_tasks: set = set()
+
+    def __str__(self):
+        return f"AsyncProviderPool({[node.uri for node in self._nodes]})"
+
+    async def make_request(self, method, params):
+        self._probe_ejected_nodes()
+        request_data = self.encode_rpc_request(method, params)
+        if method in self._config.broadcast_methods:
+            return await self._broadcast(request_data)
+
+        error = None
+        for i, node in enumerate(self._ordered_nodes()):
+            if i > 0:
+                RETRIES.labels("rpc_failover").inc()
+            try:
+                return await self._request(node, request_data)
+            except Exception as e:
+                self._logger.info("%s failed method=%s e=%r", node.uri, method, e)
+                error = e
+        raise error
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _ordered_nodes(self) -> list:
+        healthy = [node for node in self._nodes if node.ejected_at is None]
+        ejected = [node for node in self._nodes if node.ejected_at is not None]
+        # ejected nodes are the last resort, least recently ejected first
+        return sorted(healthy, key=lambda node: node.latency_sec) + sorted(
+            ejected, key=lambda node: node.ejected_at
+        )
+
+    async def _broadcast(self, request_data: bytes):
+        tasks = [
+            self._create_background_task(self._request(node, request_data))
+            for node in self._nodes
+        ]
+
+        # the first result wins. error responses (e.g. "already known" from a
+        # node that got the tx by gossip) only when no node succeeds
+        error_response = None
+        error = None
+        for completed in asyncio.as_completed(tasks):
+            try:
+                response = await completed
+            except Exception as e:
+                error = e
+                continue
+            if "error" not in response:
+                return response
+            error_response = error_response or response
+        if error_response is not None:
+            return error_response
+        raise error
+
+    async def _request(self, node: _Node, request_data: bytes):
+        session = self._get_session()
+        start = time.monotonic()
+        try:
+            async with session.post(
+                node.uri,
+                data=request_data,
+                headers={"Content-Type": "application/json"},
+                timeout=aiohttp.ClientTimeout(total=self._config.request_timeout_sec),
+            ) as response:
+                response.raise_for_status()
+                raw_response = await response.read()
+            decoded = self.decode_rpc_response(raw_response)
+        except Exception:
+            self._on_failure(node)
+            raise
+        self._on_success(node, time.monotonic() - start)
+        return decoded
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=60)
+            )
+        return self._session
+
+    def _on_success(self, node: _Node, latency_sec: float):
+        alpha = self._config.latency_alpha
+        if node.failures > 0 or node.latency_sec == 0:
+            node.latency_sec = latency_sec
+        else:
+            node.latency_sec = alpha * latency_sec + (1 - alpha) * node.latency_sec
+        if node.ejected_at is not None:
+            self._logger.info("%s is back", node.uri)
+        node.failures = 0
+        node.ejected_at = None
+
+    def _on_failure(self, node: _Node):
+        node.failures += 1
+        if node.failures >= self._config.max_failures:
+            if node.ejected_at is None:
+                self._logger.warning("%s ejected", node.uri)
+            node.ejected_at = time.monotonic()
+
+    def _probe_ejected_nodes(self):
+        now = time.monotonic()
+        for node in self._nodes:
+            if (
+                node.ejected_at is not None
+                and not node.probing
+                and now - node.ejected_at >= self._config.probe_interval_sec
+            ):
+                node.probing = True
+                self._create_background_task(self._probe(node))
+
+    def _create_background_task(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_background_task_done)
+        return task
+
+    def _on_background_task_done(self, task: asyncio.Task):
+        self._background_tasks.discard(task)
+        if not task.cancelled():
+            # failures are already counted. mark the exception as retrieved
+            task.exception()
+
+    async def _probe(self, node: _Node):
+        try:
+            await self._request(node, self.encode_rpc_request("eth_blockNumber", []))
+        except Exception as e:
+            self._logger.debug("probe %s failed e=%r", node.uri, e)
+        finally:
+            node.probing = False
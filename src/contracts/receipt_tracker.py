@@ -0,0 +1,127 @@
+import asyncio
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional
+
+import web3
+from hexbytes import HexBytes
+from web3.logs import DISCARD
+
+
+@dataclass
+class ReceiptTrackerConfig:
+    poll_interval_sec: float = 0.1
+
+
+class ReceiptTracker:
+    """Awaits the receipts of all in-flight txs in one polling loop
+
+    Instead of one wait_for_transaction_receipt poll per tx, the loop fetches
+    the receipts of every pending tx together, and only again once a new block
+    arrived. Logs of each receipt are decoded for the registered event
+    handlers before the waiters are resolved. The loop runs while txs are
+    pending.
+    """
+
+    def __init__(self, async_w3, config: ReceiptTrackerConfig = None):
+        self._async_w3 = async_w3
+        self._config = config or ReceiptTrackerConfig()
+        self._logger = getLogger(__class__.__name__)
+
+        # tx_hash -> future of the receipt
+        self._pending: dict = {}
+        # tx hashes not polled yet. they may have been mined in a seen block
+        self._unpolled: set = set()
+        self._event_handlers: list = []  # [(contract event, callback)]
+        self._receipt_handlers: list = []
+        self._block_number: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_event_handler(self, event, callback):
+        """call `callback(log)` for each `event` log in tracked receipts"""
+        self._event_handlers.append((event, callback))
+
+    def add_receipt_handler(self, callback):
+        self._receipt_handlers.append(callback)
+
+    def track(self, tx_hash) -> asyncio.Future:
+        tx_hash = HexBytes(tx_hash)
+        future = self._pending.get(tx_hash)
+        if future is not None:
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tx_hash] = future
+        self._unpolled.add(tx_hash)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return future
+
+    def untrack(self, tx_hash):
+        tx_hash = HexBytes(tx_hash)
+        self._unpolled.discard(tx_hash)
+        future = self._pending.pop(tx_hash, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def wait(self, tx_hash, timeout: float = 120):
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(self.track(tx_hash)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self.untrack(tx_hash)
+            raise web3.exceptions.TimeExhausted(
+                f"{HexBytes(tx_hash).hex()} is not in the chain after {timeout} seconds"
+            )
+
+    async def _run(self):
+        while len(self._pending) > 0:
+            try:
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.warning("receipt poll failed e=%r", e)
+            if len(self._pending) > 0:
+                await asyncio.sleep(self._config.poll_interval_sec)
+
+    async def _poll(self):
+        if len(self._unpolled) > 0:
+            # a just sent tx may already be mined
+            tx_hashes = list(self._unpolled)
+        else:
+            # receipts only appear with a new block
+            block_number = await self._async_w3.eth.block_number
+            if block_number == self._block_number:
+                return
+            self._block_number = block_number
+            tx_hashes = list(self._pending)
+
+        self._unpolled.difference_update(tx_hashes)
+        receipts = await asyncio.gather(
+            *[self._get_receipt(tx_hash) for tx_hash in tx_hashes]
+        )
+        for tx_hash, receipt in zip(tx_hashes, receipts):
+            if receipt is None:
+                continue
+            future = self._pending.pop(tx_hash, None)
+            if future is None:
+                # untracked meanwhile
+                continue
+            self._handle_receipt(receipt)
+            if not future.done():
+                future.set_result(receipt)
+
+    async def _get_receipt(self, tx_hash):
+        try:
+            return await self._async_w3.eth.get_transaction_receipt(tx_hash)
+        except web3.exceptions.TransactionNotFound:
+            return None
+
+    def _handle_receipt(self, receipt):
+        for callback in self._receipt_handlers:
+            callback(receipt)
+        for event, callback in self._event_handlers:
+            for log in event.processReceipt(receipt, errors=DISCARD):
+                callback(log)
@@ -0,0 +1,68 @@
+import json
+import os
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional
+
+from .utils import get_contract_from_abi_json
+
+
+@dataclass
+class ContractRegistryConfig:
+    # json file of immutable on-chain metadata (e.g. market symbols).
+    # None to keep it in memory only
+    index_filepath: Optional[str] = None
+
+
+class ContractRegistry:
+    """Shared contract objects and their immutable metadata
+
+    Each deployment json is turned into a contract object once and handed
+    out to every component. Metadata read from chain is stored in the index
+    file, so later starts need no RPC for it.
+    """
+
+    def __init__(self, w3, config: ContractRegistryConfig = None):
+        self._w3 = w3
+        self._config = config or ContractRegistryConfig()
+        self._logger = getLogger(__class__.__name__)
+
+        # filepath -> contract
+        self._contracts: dict = {}
+        # address -> symbol
+        self._symbols: dict = {}
+        if self._config.index_filepath is not None and os.path.exists(
+            self._config.index_filepath
+        ):
+            with open(self._config.index_filepath) as f:
+                self._symbols = json.load(f).get("symbols", {})
+
+    def contract(self, filepath: str):
+        contract = self._contracts.get(filepath)
+        if contract is None:
+            contract = get_contract_from_abi_json(self._w3, filepath)
+            self._contracts[filepath] = contract
+        return contract
+
+    def symbol(self, contract) -> str:
+        symbol = self._symbols.get(contract.address)
+        if symbol is None:
+            symbol = contract.functions.symbol().call()
+            self._symbols[contract.address] = symbol
+            self._save_index()
+        return symbol
+
+    def _save_index(self):
+        if self._config.index_filepath is None:
+            return
+        tmp_filepath = self._config.index_filepath + ".tmp"
+        try:
+            dirpath = os.path.dirname(self._config.index_filepath)
+            if dirpath != "":
+                os.makedirs(dirpath, exist_ok=True)
+            with open(tmp_filepath, "w") as f:
+                json.dump({"symbols": self._symbols}, f, indent=2, sort_keys=True)
+            os.replace(tmp_filepath, self._config.index_filepath)
+        except OSError as e:
+            # e.g. read-only deployment directory. only costs RPCs on restart
+            self._logger.warning("failed to save index e=%r", e)
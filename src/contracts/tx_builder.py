@@ -0,0 +1,88 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional
+
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from .utils import is_already_known
+
+
+@dataclass
+class TxBuilderConfig:
+    # gas limit = max gas used of recent receipts * margin
+    gas_margin: float = 1.3
+    # receipts per method kept for the gas limit
+    gas_samples: int = 20
+    # None to read eth_chainId once
+    chain_id: Optional[int] = None
+
+
+class TxBuilder:
+    """Signs txs locally and sends them with eth_sendRawTransaction only
+
+    Replaces construct_sign_and_send_raw_middleware, which reads the chain
+    id, gas and gas price before every send. The chain id is read once and
+    gas limits are learned per method from the receipts of earlier txs
+    (`observe`). Txs of one method with different calldata sizes (e.g.
+    multicalls of different batch sizes) are learned separately. A reverted
+    tx (possibly out of gas) clears what was learned for its method, so
+    the next one is estimated again.
+    """
+
+    def __init__(self, async_w3, account, config: TxBuilderConfig = None):
+        self._async_w3 = async_w3
+        self._account = account
+        self._config = config or TxBuilderConfig()
+        self._logger = getLogger(__class__.__name__)
+
+        self._chain_id: Optional[int] = self._config.chain_id
+        # (to, selector, calldata size) -> recent gas used
+        self._gas_used: dict = {}
+
+    def gas_limit(self, tx: dict) -> Optional[int]:
+        """learned gas limit of `tx`. None until a receipt of its method"""
+        samples = self._gas_used.get(_method_key(tx))
+        if not samples:
+            return None
+        return math.ceil(max(samples) * self._config.gas_margin)
+
+    def observe(self, tx: dict, receipt):
+        key = _method_key(tx)
+        if receipt["status"] == 0:
+            if self._gas_used.pop(key, None) is not None:
+                self._logger.info("tx reverted. forget gas of key=%s", key)
+            return
+        samples = self._gas_used.get(key)
+        if samples is None:
+            samples = deque(maxlen=self._config.gas_samples)
+            self._gas_used[key] = samples
+        samples.append(receipt["gasUsed"])
+
+    async def send(self, tx: dict) -> HexBytes:
+        """sign `tx` (with nonce and gas) and send it"""
+        raw_transaction = await self.sign(tx)
+        try:
+            return await self._async_w3.eth.send_raw_transaction(raw_transaction)
+        except ValueError as e:
+            if not is_already_known(e):
+                raise e
+            return HexBytes(keccak(raw_transaction))
+
+    async def sign(self, tx: dict) -> HexBytes:
+        tx = dict(tx)
+        tx.pop("from", None)
+        if self._chain_id is None:
+            self._chain_id = await self._async_w3.eth.chain_id
+        tx.setdefault("chainId", self._chain_id)
+        if "gasPrice" not in tx and "maxFeePerGas" not in tx:
+            # without a fee oracle or a static gas price
+            tx["gasPrice"] = await self._async_w3.eth.gas_price
+        return self._account.sign_transaction(tx).rawTransaction
+
+
+def _method_key(tx: dict) -> tuple:
+    data = HexBytes(tx.get("data", b""))
+    return tx["to"], data[:4].hex(), len(data)
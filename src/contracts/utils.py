@@ -1,8 +1,19 @@
 import json
+from functools import lru_cache
 
 from eth_account import Account
-from web3 import Web3
-from web3.middleware import construct_sign_and_send_raw_middleware, geth_poa_middleware
+from web3 import AsyncHTTPProvider, Web3
+from web3._utils.abi import get_abi_output_types
+from web3._utils.contracts import encode_transaction_data
+from web3.eth import AsyncEth
+from web3.middleware import (
+    async_geth_poa_middleware,
+    construct_sign_and_send_raw_middleware,
+    geth_poa_middleware,
+)
+
+from ..metrics import async_rpc_metrics_middleware, rpc_metrics_middleware
+from .provider_pool import AsyncProviderPool, ProviderPoolConfig
 
 
 def get_tx_options(network_name: str):
@@ -23,6 +34,8 @@ def get_w3(network_name: str, web3_provider_uri: str, user_private_key: str = No
     else:
         provider = Web3.HTTPProvider(web3_provider_uri)
     w3 = Web3(provider)
+    # innermost, so only the round trip to the node is measured
+    w3.middleware_onion.inject(rpc_metrics_middleware, layer=0)
 
     if network_name in ["mumbai"]:
         w3.middleware_onion.inject(geth_poa_middleware, layer=0)
@@ -34,11 +47,130 @@ def get_w3(network_name: str, web3_provider_uri: str, user_private_key: str = No
     return w3
 
 
+def get_async_w3(
+    network_name: str, web3_provider_uri: str, user_private_key: str = None
+):
+    """web3_provider_uri: http(s) uri or comma separated uris for a provider pool"""
+    web3_provider_uris = web3_provider_uri.split(",")
+    for uri in web3_provider_uris:
+        if not uri.startswith("http"):
+            raise ValueError(f"async provider requires http(s) uri: {uri=}")
+    if len(web3_provider_uris) > 1:
+        provider = AsyncProviderPool(
+            ProviderPoolConfig(endpoint_uris=web3_provider_uris)
+        )
+    else:
+        provider = AsyncHTTPProvider(web3_provider_uri)
+    w3 = Web3(
+        provider,
+        modules={"eth": (AsyncEth,)},
+        middlewares=[async_rpc_metrics_middleware],
+    )
+
+    if network_name in ["mumbai"]:
+        w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+
+    if user_private_key is not None:
+        user_account = Account().from_key(user_private_key)
+        w3.eth.default_account = user_account.address
+        w3.middleware_onion.add(
+            async_construct_sign_and_send_raw_middleware(user_account)
+        )
+    return w3
+
+
+def async_construct_sign_and_send_raw_middleware(account):
+    # async counterpart of web3's construct_sign_and_send_raw_middleware,
+    # which only supports sync providers in web3 v5
+    async def sign_and_send_raw_middleware(make_request, w3):
+        async def middleware(method, params):
+            if method != "eth_sendTransaction":
+                return await make_request(method, params)
+
+            transaction = dict(params[0])
+            if transaction.get("from") != account.address:
+                return await make_request(method, params)
+
+            if "nonce" not in transaction:
+                transaction["nonce"] = await w3.eth.get_transaction_count(
+                    account.address, "pending"
+                )
+            if "chainId" not in transaction:
+                transaction["chainId"] = await w3.eth.chain_id
+            if "gas" not in transaction:
+                transaction["gas"] = await w3.eth.estimate_gas(transaction)
+            if "gasPrice" not in transaction and "maxFeePerGas" not in transaction:
+                transaction["gasPrice"] = await w3.eth.gas_price
+            transaction.pop("from")
+
+            signed = account.sign_transaction(transaction)
+            response = await make_request(
+                "eth_sendRawTransaction", [signed.rawTransaction.hex()]
+            )
+            if is_already_known(response.get("error")):
+                return dict(
+                    {k: v for k, v in response.items() if k != "error"},
+                    result=signed.hash.hex(),
+                )
+            return response
+
+        return middleware
+
+    return sign_and_send_raw_middleware
+
+
+def is_already_known(error) -> bool:
+    # the node already holds this exact signed tx (e.g. a node of a provider
+    # pool got it by gossip). the send succeeded and the tx hash is known
+    return error is not None and "already known" in str(error)
+
+
 def get_contract_from_abi_json(w3, filepath: str):
-    with open(filepath) as f:
-        abi = json.load(f)
+    abi = _load_abi_json(filepath)
     contract = w3.eth.contract(
         address=abi["address"],
         abi=abi["abi"],
     )
     return contract
+
+
+def encode_method_call(method_call) -> str:
+    # same encoding as ContractFunction.transact (supports struct args as dict)
+    # without touching the provider
+    return encode_transaction_data(
+        method_call.web3,
+        method_call.function_identifier,
+        method_call.contract_abi,
+        method_call.abi,
+        method_call.args,
+        method_call.kwargs,
+    )
+
+
+def to_transaction(method_call, tx_options: dict, from_address: str) -> dict:
+    return dict(
+        tx_options,
+        **{
+            "from": from_address,
+            "to": method_call.address,
+            "data": encode_method_call(method_call),
+        },
+    )
+
+
+async def async_call(async_w3, method_call, block_identifier="latest"):
+    data = await async_w3.eth.call(
+        {"to": method_call.address, "data": encode_method_call(method_call)},
+        block_identifier,
+    )
+    result = async_w3.codec.decode_abi(get_abi_output_types(method_call.abi), data)
+    if len(result) == 1:
+        return result[0]
+    return result
+
+
+@lru_cache(maxsize=None)
+def _load_abi_json(filepath: str) -> dict:
+    # deployment jsons are large and shared by every component of every market
+    with open(filepath) as f:
+        return json.load(f)
@@ -0,0 +1,66 @@
+import asyncio
+import json
+from logging import getLogger
+
+import websockets
+
+
+class WebsocketSubscriber:
+    """eth_subscribe over a websocket endpoint
+
+    web3 v5 has no subscription api, so this talks JSON-RPC directly.
+    Callbacks are called on the event loop with the notification result and
+    should not block. Subscriptions are renewed after a reconnect.
+    """
+
+    def __init__(self, web3_provider_uri: str, reconnect_sec: float = 1.0):
+        self._uri = web3_provider_uri
+        self._reconnect_sec = reconnect_sec
+        self._logger = getLogger(__class__.__name__)
+
+        self._subscriptions: list = []  # [(params, callback)]
+
+    def subscribe(self, params: list, callback):
+        self._subscriptions.append((params, callback))
+
+    async def run(self):
+        while True:
+            try:
+                await self._run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.warning("websocket disconnected e=%r. reconnecting", e)
+            await asyncio.sleep(self._reconnect_sec)
+
+    async def _run_once(self):
+        async with websockets.connect(self._uri) as ws:
+            for request_id, (params, _) in enumerate(self._subscriptions):
+                await ws.send(
+                    json.dumps(
+                        {
+                            "jsonrpc": "2.0",
+                            "id": request_id,
+                            "method": "eth_subscribe",
+                            "params": params,
+                        }
+                    )
+                )
+
+            subscription_id_to_callback = {}
+            async for message in ws:
+                data = json.loads(message)
+                if "error" in data:
+                    raise ValueError(data["error"])
+                if "id" in data:
+                    _, callback = self._subscriptions[data["id"]]
+                    subscription_id_to_callback[data["result"]] = callback
+                    continue
+                if data.get("method") != "eth_subscription":
+                    continue
+
+                callback = subscription_id_to_callback.get(
+                    data["params"]["subscription"]
+                )
+                if callback is not None:
+                    callback(data["params"]["result"])
@@ -1,28 +1,139 @@
 # %%
+import asyncio
+import json
+import math
+from dataclasses import dataclass
+from logging import getLogger
+
 import ccxt
 import pandas as pd
+import websockets
+
+from ..ohlcv import OhlcvRingBuffer
 
 
 class BinanceRestOhlcv:
-    def __init__(self, ccxt_exchange: ccxt.binance, symbol: str, timeframe: str):
+    def __init__(
+        self,
+        ccxt_exchange: ccxt.binance,
+        symbol: str,
+        timeframe: str,
+        capacity: int = 1000,
+    ):
         self._exchange = ccxt_exchange
         self._symbol = symbol
         self._timeframe = timeframe
 
+        self.store = OhlcvRingBuffer(capacity)
+
+    def get_ohlcv_arrays(self) -> dict:
+        self.update()
+        return self.store.arrays()
+
     def get_ohlcv_df(self):
+        return pd.DataFrame(self.get_ohlcv_arrays(), copy=False)
+
+    def update(self):
+        # fetch from the last stored (still forming) bar, which is replaced
+        self.store.update(self.fetch(since=self.store.last_timestamp()))
+
+    def fetch(self, since: int = None) -> list:
         # [
         #   [1663172280000, 20203.95, 20214.19, 20190.56, 20193.88, 304.94341]
         # ]
-        data = self._exchange.fetch_ohlcv(self._symbol, self._timeframe)
-        df = pd.DataFrame(
-            data,
-            columns=[
-                "timestamp",
-                "op",
-                "hi",
-                "lo",
-                "cl",
-                "volume",
-            ],
+        return self._exchange.fetch_ohlcv(self._symbol, self._timeframe, since=since)
+
+
+@dataclass
+class BinanceWebsocketFeedConfig:
+    # stream symbol e.g. "ethusdt"
+    symbol: str
+    interval: str = "1m"
+    uri: str = "wss://stream.binance.com:9443"
+    reconnect_sec: float = 1.0
+
+
+class BinanceWebsocketFeed:
+    """kline and bookTicker streams kept in memory
+
+    Bars are written to the store of `rest_ohlcv`, which is also used to
+    backfill missed bars after every (re)connect. No request is made on
+    get_ohlcv_arrays / *_price calls.
+    """
+
+    def __init__(
+        self, rest_ohlcv: BinanceRestOhlcv, config: BinanceWebsocketFeedConfig
+    ):
+        self._rest_ohlcv = rest_ohlcv
+        self._store = rest_ohlcv.store
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        self._bid_price = math.nan
+        self._ask_price = math.nan
+        self._last_price = math.nan
+
+    def get_ohlcv_arrays(self) -> dict:
+        return self._store.arrays()
+
+    def get_ohlcv_df(self):
+        return pd.DataFrame(self.get_ohlcv_arrays(), copy=False)
+
+    def bid_price(self) -> float:
+        return self._bid_price
+
+    def ask_price(self) -> float:
+        return self._ask_price
+
+    def last_price(self) -> float:
+        return self._last_price
+
+    async def run(self):
+        while True:
+            try:
+                await self._run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._logger.warning("websocket disconnected e=%r. reconnecting", e)
+            await asyncio.sleep(self._config.reconnect_sec)
+
+    async def _run_once(self):
+        symbol = self._config.symbol.lower()
+        streams = f"{symbol}@kline_{self._config.interval}/{symbol}@bookTicker"
+        async with websockets.connect(
+            f"{self._config.uri}/stream?streams={streams}"
+        ) as ws:
+            # messages received meanwhile are buffered by the connection
+            await self._backfill()
+            async for message in ws:
+                self._on_message(json.loads(message)["data"])
+
+    async def _backfill(self):
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(
+            None, self._rest_ohlcv.fetch, self._store.last_timestamp()
         )
-        return df
+        self._store.update(data)
+        self._logger.debug("backfilled %d bars", len(data))
+
+    def _on_message(self, data: dict):
+        if data.get("e") == "kline":
+            k = data["k"]
+            self._store.update(
+                [
+                    [
+                        k["t"],
+                        float(k["o"]),
+                        float(k["h"]),
+                        float(k["l"]),
+                        float(k["c"]),
+                        float(k["v"]),
+                    ]
+                ]
+            )
+            self._last_price = float(k["c"])
+        elif "b" in data and "a" in data:
+            # bookTicker has no event type
+            self._bid_price = float(data["b"])
+            self._ask_price = float(data["a"])
@@ -1,16 +1,403 @@
+import asyncio
 from logging import getLogger
 import time
 from dataclasses import dataclass, field
-from typing import Optional
-from ..contracts.utils import get_contract_from_abi_json
+from typing import Callable, Optional
+from ..contracts.cache import TTLCache
+from ..contracts.fee_oracle import URGENCY_HIGH, URGENCY_NORMAL, FeeOracle
+from ..contracts.multicall import MULTICALL3_ADDRESS, Multicall3
+from ..contracts.nonce_manager import NonceManager
+from ..contracts.receipt_tracker import ReceiptTracker
+from ..contracts.registry import ContractRegistry
+from ..contracts.tx_builder import TxBuilder
+from ..contracts.ws_subscriber import WebsocketSubscriber
+from ..contracts.utils import (
+    async_call,
+    encode_method_call,
+    to_transaction,
+)
+from ..metrics import CANCEL_SKIPS, NONCE_ERRORS, RETRIES, STAGE_SECONDS
+from ..recorder import Recorder
 
 import web3
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
 
 Q96: int = 0x1000000000000000000000000  # same as 1 << 96
 MAX_UINT: int = int(web3.constants.MAX_INT, base=16)
 DECIMALS: int = 18
 
 
+@dataclass
+class PerpdexOpenOrdersConfig:
+    market_contract_abi_json_filepaths: list
+    exchange_contract_abi_json_filepath: str
+    # re-read getLimitOrderIds to fix drift (missed logs, reorgs)
+    reconcile_interval_sec: float = 60.0
+
+
+class PerpdexOpenOrders:
+    """Resting limit orders of our account per market and side
+
+    Bootstrapped from getLimitOrderIds and then kept current from exchange
+    logs: receipts of our own txs via the receipt tracker and, when a
+    subscriber is given, the exchange log subscription. A fill
+    (LimitOrderSettled) does not name the order, so it makes the market due
+    for reconciliation. `reconcile` is fed by PerpdexStateSnapshot with
+    getLimitOrderIds read in the same multicall as the rest of the state.
+    Without a subscriber, fills by other txs show up in no receipt of ours,
+    so the book is reconciled on every update. So it is when the exchange
+    ABI lacks one of the order events (e.g. new orders would be invisible
+    until the next reconcile and quoted again).
+    """
+
+    def __init__(
+        self,
+        w3,
+        async_w3,
+        config: PerpdexOpenOrdersConfig,
+        receipt_tracker: ReceiptTracker = None,
+        subscriber: WebsocketSubscriber = None,
+        registry: ContractRegistry = None,
+    ):
+        self._async_w3 = async_w3
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self.markets = [
+            registry.contract(filepath).address
+            for filepath in config.market_contract_abi_json_filepaths
+        ]
+        self._exchange_contract = registry.contract(
+            config.exchange_contract_abi_json_filepath
+        )
+
+        # (market, isBid, orderId) -> dict(base=, price_x96=, block_number=)
+        # base and price_x96 are None for orders only known from getLimitOrderIds
+        self._orders: dict = {}
+        # (market, isBid, orderId) -> block number of orders removed by logs
+        # that a reconcile of an older block must not bring back
+        self._removed: dict = {}
+        # markets with fills or never reconciled
+        self._dirty_markets = set(self.markets)
+        self._reconciled_at: Optional[float] = None
+        self._update_lock = asyncio.Lock()
+        # the book is only current when creates, cancels and fills are
+        # all followed from logs
+        self._follows_logs = subscriber is not None and all(
+            _has_event(self._exchange_contract, name)
+            for name in ["LimitOrderCreated", "LimitOrderCanceled", "LimitOrderSettled"]
+        )
+
+        # log topic -> (contract event, handler)
+        self._events = {}
+        for name, handler in [
+            ("LimitOrderCreated", self._on_created),
+            ("LimitOrderCanceled", self._on_canceled),
+            ("LimitOrderSettled", self._on_settled),
+        ]:
+            if _has_event(self._exchange_contract, name):
+                event = self._exchange_contract.events[name]()
+                self._events[HexBytes(event_abi_to_log_topic(event.abi))] = (
+                    event,
+                    handler,
+                )
+                if receipt_tracker is not None:
+                    receipt_tracker.add_event_handler(event, handler)
+        if subscriber is not None:
+            subscriber.subscribe(
+                ["logs", {"address": self._exchange_contract.address}], self._on_log
+            )
+
+    async def update(self):
+        """reconcile with getLimitOrderIds when due
+
+        Not needed when a PerpdexStateSnapshot feeds `reconcile`.
+        """
+        async with self._update_lock:
+            if not self.needs_reconcile():
+                return
+            trader = self._async_w3.eth.default_account
+            keys = [
+                (market, is_bid) for market in self.markets for is_bid in [False, True]
+            ]
+            block_number = await self._async_w3.eth.block_number
+            results = await asyncio.gather(
+                *[
+                    async_call(
+                        self._async_w3,
+                        self._exchange_contract.functions.getLimitOrderIds(
+                            trader, market, is_bid
+                        ),
+                        block_number,
+                    )
+                    for market, is_bid in keys
+                ]
+            )
+            self.reconcile(block_number, dict(zip(keys, results)))
+
+    def needs_reconcile(self) -> bool:
+        return (
+            not self._follows_logs
+            or len(self._dirty_markets) > 0
+            or self._reconciled_at is None
+            or time.monotonic() - self._reconciled_at
+            >= self._config.reconcile_interval_sec
+        )
+
+    def reconcile(self, block_number: int, order_ids: dict):
+        """order_ids: (market, isBid) -> getLimitOrderIds at `block_number`"""
+        drift = 0
+        for (market, is_bid), ids in order_ids.items():
+            ids = set(ids)
+            for order_id in ids:
+                key = (market, is_bid, order_id)
+                if key in self._orders or self._removed.get(key, -1) > block_number:
+                    continue
+                self._orders[key] = dict(
+                    base=None, price_x96=None, block_number=block_number
+                )
+                drift += 1
+            for key in list(self._orders):
+                if (
+                    key[:2] == (market, is_bid)
+                    and key[2] not in ids
+                    # created after the block read
+                    and self._orders[key]["block_number"] <= block_number
+                ):
+                    del self._orders[key]
+                    drift += 1
+            self._dirty_markets.discard(market)
+
+        self._removed = {
+            key: removed_block_number
+            for key, removed_block_number in self._removed.items()
+            if removed_block_number > block_number
+        }
+        self._reconciled_at = time.monotonic()
+        if drift > 0:
+            self._logger.debug("reconciled %s orders at %s", drift, block_number)
+
+    def order_ids(self, market: str, is_bid: bool) -> list:
+        return sorted(
+            key[2] for key in self._orders if key[0] == market and key[1] == is_bid
+        )
+
+    def order(self, market: str, is_bid: bool, order_id: int) -> Optional[dict]:
+        return self._orders.get((market, is_bid, order_id))
+
+    def _is_ours(self, args) -> bool:
+        return (
+            args.trader == self._async_w3.eth.default_account
+            and args.market in self.markets
+        )
+
+    def _on_log(self, result: dict):
+        topics = [HexBytes(topic) for topic in result.get("topics", [])]
+        if len(topics) == 0 or topics[0] not in self._events:
+            return
+        event, handler = self._events[topics[0]]
+        try:
+            log = event.processLog(
+                dict(
+                    result,
+                    topics=topics,
+                    blockNumber=int(result["blockNumber"], 16),
+                    logIndex=int(result["logIndex"], 16),
+                    transactionIndex=int(result["transactionIndex"], 16),
+                )
+            )
+        except Exception as e:
+            # e.g. the same event name with other indexed args
+            self._logger.debug("undecodable log e=%r", e)
+            return
+        handler(log)
+
+    def _on_created(self, log):
+        args = log.args
+        if not self._is_ours(args):
+            return
+        self._orders[(args.market, args.isBid, args.orderId)] = dict(
+            base=args.base,
+            price_x96=args.priceX96,
+            block_number=log.blockNumber,
+        )
+
+    def _on_canceled(self, log):
+        args = log.args
+        if not self._is_ours(args):
+            return
+        key = (args.market, args.isBid, args.orderId)
+        self._orders.pop(key, None)
+        self._removed[key] = log.blockNumber
+
+    def _on_settled(self, log):
+        args = log.args
+        if not self._is_ours(args):
+            return
+        self._dirty_markets.add(args.market)
+
+
+@dataclass
+class PerpdexStateSnapshotConfig:
+    market_contract_abi_json_filepaths: list
+    exchange_contract_abi_json_filepath: str
+    # None to read with individual eth_calls pinned to one block
+    multicall_address: Optional[str] = MULTICALL3_ADDRESS
+
+
+class PerpdexStateSnapshot:
+    """On-chain state of our account read once per cycle at a single block
+
+    Ticker, position getter and orderer read from the latest snapshot
+    instead of making their own eth_calls. With `open_orders`, order ids come
+    from the event-driven book and getLimitOrderIds is only read when the
+    book is due for reconciliation. Without multicall, the reads are pinned
+    to the block of `block_number_getter` (e.g. the newHeads block number of
+    PerpdexRequoteTrigger) when it has one, instead of eth_blockNumber.
+    """
+
+    def __init__(
+        self,
+        w3,
+        async_w3,
+        config: PerpdexStateSnapshotConfig,
+        recorder: Recorder = None,
+        open_orders: PerpdexOpenOrders = None,
+        registry: ContractRegistry = None,
+        block_number_getter: Callable[[], Optional[int]] = None,
+    ):
+        self._async_w3 = async_w3
+        self._config = config
+        self._block_number_getter = block_number_getter
+        self._recorder = recorder
+        self.open_orders = open_orders
+        self._logger = getLogger(__class__.__name__)
+
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self._exchange_contract = registry.contract(
+            config.exchange_contract_abi_json_filepath
+        )
+        self._market_contracts = [
+            registry.contract(filepath)
+            for filepath in config.market_contract_abi_json_filepaths
+        ]
+        self._multicall = (
+            None
+            if config.multicall_address is None
+            else Multicall3(w3, async_w3, config.multicall_address)
+        )
+
+        self.block_number: Optional[int] = None
+        self._values: dict = {}
+
+    async def update(self):
+        with_order_ids = self.open_orders is None or self.open_orders.needs_reconcile()
+        keys, method_calls = self._method_calls(with_order_ids)
+        if self._multicall is None:
+            block_number = (
+                None
+                if self._block_number_getter is None
+                else self._block_number_getter()
+            )
+            if block_number is None:
+                block_number = await self._async_w3.eth.block_number
+            results = await asyncio.gather(
+                *[
+                    async_call(self._async_w3, method_call, block_number)
+                    for method_call in method_calls
+                ]
+            )
+        else:
+            block_number, results = await self._multicall.aggregate(method_calls)
+
+        self.block_number = block_number
+        self._values = dict(zip(keys, results))
+        self._logger.debug("snapshot updated block_number=%s", block_number)
+        if self.open_orders is not None and with_order_ids:
+            self.open_orders.reconcile(
+                block_number,
+                {
+                    key[1:]: value
+                    for key, value in self._values.items()
+                    if key[0] == "getLimitOrderIds" and value is not None
+                },
+            )
+        if self._recorder is not None:
+            self._record()
+
+    def mark_price_x96(self, market: str) -> int:
+        return self._get(("getMarkPriceX96", market))
+
+    def share_mark_price_x96(self, market: str) -> int:
+        return self._get(("getShareMarkPriceX96", market))
+
+    def position_share(self, market: str) -> int:
+        return self._get(("getPositionShare", market))
+
+    def limit_order_ids(self, market: str, is_bid: bool) -> list:
+        if self.open_orders is not None:
+            return self.open_orders.order_ids(market, is_bid)
+        return self._get(("getLimitOrderIds", market, is_bid))
+
+    def total_account_value(self) -> int:
+        return self._get(("getTotalAccountValue",))
+
+    def _get(self, key: tuple):
+        if key not in self._values:
+            raise ValueError(f"not in snapshot {key=}. update() first")
+        value = self._values[key]
+        if value is None:
+            raise ValueError(f"call failed in snapshot {key=}")
+        return value
+
+    def _record(self):
+        for market_contract in self._market_contracts:
+            market = market_contract.address
+            mark_price_x96 = self._values[("getMarkPriceX96", market)]
+            position_share = self._values[("getPositionShare", market)]
+            self._recorder.record(
+                "snapshot",
+                block_number=self.block_number,
+                market=market,
+                mark_price=None if mark_price_x96 is None else mark_price_x96 / Q96,
+                position=None
+                if position_share is None
+                else position_share / (10**DECIMALS),
+            )
+
+    def _method_calls(self, with_order_ids: bool = True) -> tuple:
+        trader = self._async_w3.eth.default_account
+        exchange_functions = self._exchange_contract.functions
+        keys = [("getTotalAccountValue",)]
+        method_calls = [exchange_functions.getTotalAccountValue(trader)]
+        for market_contract in self._market_contracts:
+            market = market_contract.address
+            keys += [
+                ("getMarkPriceX96", market),
+                ("getShareMarkPriceX96", market),
+                ("getPositionShare", market),
+            ]
+            method_calls += [
+                market_contract.functions.getMarkPriceX96(),
+                market_contract.functions.getShareMarkPriceX96(),
+                exchange_functions.getPositionShare(trader, market),
+            ]
+            if with_order_ids:
+                keys += [
+                    ("getLimitOrderIds", market, False),
+                    ("getLimitOrderIds", market, True),
+                ]
+                method_calls += [
+                    exchange_functions.getLimitOrderIds(trader, market, False),
+                    exchange_functions.getLimitOrderIds(trader, market, True),
+                ]
+        return keys, method_calls
+
+
 @dataclass
 class PerpdexContractTickerConfig:
     market_contract_abi_json_filepath: str
@@ -19,18 +406,27 @@ class PerpdexContractTickerConfig:
 
 
 class PerpdexContractTicker:
-    def __init__(self, w3, config: PerpdexContractTickerConfig):
+    def __init__(
+        self,
+        w3,
+        config: PerpdexContractTickerConfig,
+        snapshot: PerpdexStateSnapshot = None,
+        cache: TTLCache = None,
+        registry: ContractRegistry = None,
+    ):
         self._w3 = w3
         self._config = config
+        self._snapshot = snapshot
+        if cache is None:
+            cache = TTLCache(ttl_sec=config.update_limit_sec)
+        self._cache = cache
 
-        self._market_contract = get_contract_from_abi_json(
-            w3,
-            config.market_contract_abi_json_filepath,
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self._market_contract = registry.contract(
+            config.market_contract_abi_json_filepath
         )
 
-        self._mark_price = 0.0
-        self._last_ts = 0.0
-
     def bid_price(self):
         return self._get_mark_price()
 
@@ -41,12 +437,17 @@ class PerpdexContractTicker:
         return self._get_mark_price()
 
     def _get_mark_price(self) -> float:
-        if time.time() - self._last_ts >= self._config.update_limit_sec:
-            price_x96 = self._market_contract.functions.getMarkPriceX96().call()
-            self._mark_price = price_x96 / Q96
+        if self._snapshot is not None:
+            price_x96 = self._snapshot.mark_price_x96(self._market_contract.address)
+        else:
+            price_x96 = self._cache.get(
+                ("getMarkPriceX96", self._market_contract.address),
+                self._market_contract.functions.getMarkPriceX96().call,
+            )
+        mark_price = price_x96 / Q96
         if self._config.inverse:
-            return 1 / self._mark_price
-        return self._mark_price
+            return 1 / mark_price
+        return mark_price
 
 
 @dataclass
@@ -55,123 +456,299 @@ class PerpdexOrdererConfig:
     exchange_contract_abi_json_filepath: str
     inverse: bool
     tx_options: dict = field(default_factory=dict)
+    use_multicall: bool = True
+    # resend with bumped fees (same nonce) when not mined in time.
+    # needs a fee oracle
+    replace_after_sec: float = 30.0
+    max_replacements: int = 5
+    # TimeExhausted when no receipt (of any replacement) arrives in time
+    receipt_timeout_sec: float = 120.0
 
 
 class PerpdexOrderer:
-    def __init__(self, w3, config: PerpdexOrdererConfig):
+    def __init__(
+        self,
+        w3,
+        async_w3,
+        config: PerpdexOrdererConfig,
+        nonce_manager: NonceManager = None,
+        snapshot: PerpdexStateSnapshot = None,
+        recorder: Recorder = None,
+        fee_oracle: FeeOracle = None,
+        receipt_tracker: ReceiptTracker = None,
+        open_orders: PerpdexOpenOrders = None,
+        registry: ContractRegistry = None,
+        tx_builder: TxBuilder = None,
+    ):
         self._w3 = w3
+        self._async_w3 = async_w3
         self._config = config
+        self._snapshot = snapshot
+        self._recorder = recorder
+        self._fee_oracle = fee_oracle
+        # None to sign with the middleware of async_w3
+        self._tx_builder = tx_builder
         self._logger = getLogger(__name__)
 
-        self._exchange_contract = get_contract_from_abi_json(
-            w3,
-            config.exchange_contract_abi_json_filepath,
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self._exchange_contract = registry.contract(
+            config.exchange_contract_abi_json_filepath
         )
 
         self._symbol_to_market_contract: dict = {}
         for filepath in config.market_contract_abi_json_filepaths:
-            contract = get_contract_from_abi_json(w3, filepath)
-            symbol = contract.functions.symbol().call()
+            contract = registry.contract(filepath)
+            symbol = registry.symbol(contract)
             self._symbol_to_market_contract[symbol] = contract
 
-    def cancel_all_orders(self, symbol: str):
-        self.cancel_all_ask_orders(symbol=symbol)
-        self.cancel_all_bid_orders(symbol=symbol)
+        if receipt_tracker is None:
+            receipt_tracker = ReceiptTracker(async_w3)
+        self._receipt_tracker = receipt_tracker
 
-    def cancel_all_bid_orders(self, symbol: str):
-        market_contract = self._symbol_to_market_contract[symbol]
-        order_ids = self._exchange_contract.functions.getLimitOrderIds(
-            self._w3.eth.default_account,  # trader
-            market_contract.address,  # market
-            True,  # isBid
-        ).call()
-        self._logger.debug(f"Bid orderIds {order_ids}")
-        for order_id in order_ids:
-            self.cancel_limit_order(symbol=symbol, side_int=1, order_id=order_id)
-
-    def cancel_all_ask_orders(self, symbol: str):
-        market_contract = self._symbol_to_market_contract[symbol]
-        order_ids = self._exchange_contract.functions.getLimitOrderIds(
-            self._w3.eth.default_account,  # trader
-            market_contract.address,  # market
-            False,  # isBid
-        ).call()
-        self._logger.debug(f"Ask orderIds {order_ids}")
-        for order_id in order_ids:
-            self.cancel_limit_order(symbol=symbol, side_int=-1, order_id=order_id)
-
-    def cancel_limit_order(self, symbol: str, side_int: int, order_id: str):
-        self._logger.debug(
-            f"cancel_limit_order start {symbol=}, {side_int=}, {order_id=}"
+        if open_orders is None and snapshot is not None:
+            open_orders = snapshot.open_orders
+        if open_orders is None:
+            open_orders_config = PerpdexOpenOrdersConfig(
+                market_contract_abi_json_filepaths=(
+                    config.market_contract_abi_json_filepaths
+                ),
+                exchange_contract_abi_json_filepath=(
+                    config.exchange_contract_abi_json_filepath
+                ),
+            )
+            open_orders = PerpdexOpenOrders(
+                w3,
+                async_w3,
+                open_orders_config,
+                receipt_tracker=receipt_tracker,
+                registry=registry,
+            )
+        self._open_orders = open_orders
+
+        # PerpdexExchange deployments that inherit Multicall can batch
+        # cancelLimitOrder / createLimitOrder into one tx
+        self._multicall_enabled = config.use_multicall and any(
+            abi.get("name") == "multicall" for abi in self._exchange_contract.abi
         )
-        market_contract = self._symbol_to_market_contract[symbol]
 
-        method_call = self._exchange_contract.functions.cancelLimitOrder(
-            dict(
-                market=market_contract.address,
-                isBid=side_int < 0 if self._config.inverse else side_int > 0,
-                orderId=order_id,
-                deadline=_get_deadline(),
-            )
+        if nonce_manager is None:
+            nonce_manager = NonceManager(async_w3, async_w3.eth.default_account)
+        self._nonce_manager = nonce_manager
+
+        # tx_hash -> (tx with nonce, time sent) of txs not yet mined
+        self._sent_txs: dict = {}
+
+    async def replace_all_orders(self, symbol: str, orders: list):
+        """cancel all resting orders and post `orders`
+
+        orders: list of dict(side_int=, size=, price=)
+        """
+        ask_order_ids, bid_order_ids = await asyncio.gather(
+            self._get_limit_order_ids(symbol=symbol, is_bid=False),
+            self._get_limit_order_ids(symbol=symbol, is_bid=True),
         )
+        self._logger.debug("Ask orderIds %s", ask_order_ids)
+        self._logger.debug("Bid orderIds %s", bid_order_ids)
 
-        try:
-            self._transact_with_retry(method_call, 3, "will retry cancel_limit_order")
-            self._logger.debug("cancel_limit_order finish")
-        except web3.exceptions.ContractLogicError as e:
-            if "OBL_CO: already fully executed" in str(e):
-                self._logger.info(f"{order_id=} is already fully filled")
-                self._logger.debug("cancel_limit_order skip")
-            elif "MOBL_CLO: enough mm" in str(e):
-                self._logger.info(f"{order_id=} is not my order")
-                self._logger.debug("cancel_limit_order skip")
-            elif "RBTL_R: key not exist" in str(e):
-                self._logger.info(f"{order_id=} does not exist")
-                self._logger.debug("cancel_limit_order skip")
+        await self.cancel_and_post_limit_orders(
+            symbol=symbol,
+            cancel_orders=[
+                dict(side_int=self._side_int(False), order_id=order_id)
+                for order_id in ask_order_ids
+            ]
+            + [
+                dict(side_int=self._side_int(True), order_id=order_id)
+                for order_id in bid_order_ids
+            ],
+            orders=orders,
+        )
+
+    async def cancel_and_post_limit_orders(
+        self, symbol: str, cancel_orders: list, orders: list
+    ):
+        """cancel `cancel_orders` and post `orders`
+
+        cancel_orders: list of dict(side_int=, order_id=)
+        orders: list of dict(side_int=, size=, price=)
+
+        Sent as one atomic multicall tx when the exchange supports it,
+        otherwise as individual txs submitted in one burst.
+        """
+        orders = [order for order in orders if order["size"] != 0]
+        if len(cancel_orders) + len(orders) == 0:
+            return
+
+        if self._multicall_enabled and len(cancel_orders) + len(orders) > 1:
+            method_call = self._exchange_contract.functions.multicall(
+                [
+                    HexBytes(encode_method_call(call))
+                    for call in [
+                        self._cancel_limit_order_call(symbol=symbol, **cancel_order)
+                        for cancel_order in cancel_orders
+                    ]
+                    + [
+                        self._create_limit_order_call(symbol=symbol, **order)
+                        for order in orders
+                    ]
+                ]
+            )
+            try:
+                # cancels must land before the market moves through them
+                tx = await self._prepare_transaction(
+                    method_call,
+                    urgency=URGENCY_HIGH if len(cancel_orders) > 0 else URGENCY_NORMAL,
+                )
+            except web3.exceptions.ContractLogicError as e:
+                # e.g. one of the orders was filled in the meantime.
+                # individual txs can skip such cancels
+                self._logger.info("multicall reverts e=%r. fallback to single txs", e)
+                RETRIES.labels("multicall_fallback").inc()
             else:
-                raise e
+                tx_hash = await self._send_transaction(
+                    tx, retry_message="will retry multicall"
+                )
+                receipt = await self._wait_for_receipt(tx_hash)
+                if receipt["status"] != 0:
+                    self._logger.debug(
+                        "cancel_and_post_limit_orders finish (multicall)"
+                    )
+                    return
+                # e.g. an order was filled after the simulation, or there was
+                # none (learned gas limit). single txs skip such cancels
+                self._logger.info("multicall reverted. fallback to single txs")
+                RETRIES.labels("multicall_fallback").inc()
 
-    def post_limit_order(self, symbol: str, side_int: int, size: float, price: float):
-        self._logger.info(
-            "post_limit_order symbol {} side_int {} size {} price {} isBid {}".format(
-                symbol, side_int, size, price, side_int > 0
+        txs = await asyncio.gather(
+            *[
+                self._prepare_cancel_transaction(symbol=symbol, **cancel_order)
+                for cancel_order in cancel_orders
+            ],
+            *[
+                self._prepare_transaction(
+                    self._create_limit_order_call(symbol=symbol, **order)
+                )
+                for order in orders
+            ],
+        )
+        tx_hashes = await self._send_transactions([tx for tx in txs if tx is not None])
+        await asyncio.gather(
+            *[self._wait_for_receipt(tx_hash) for tx_hash in tx_hashes]
+        )
+        self._logger.debug("cancel_and_post_limit_orders finish")
+
+    async def get_open_orders(self, symbol: str) -> list:
+        """resting orders as list of dict(order_id=, side_int=, size=, price=)
+
+        size and price are None for orders not created by this orderer
+        (e.g. before a restart)
+        """
+        ask_order_ids, bid_order_ids = await asyncio.gather(
+            self._get_limit_order_ids(symbol=symbol, is_bid=False),
+            self._get_limit_order_ids(symbol=symbol, is_bid=True),
+        )
+
+        market = self._symbol_to_market_contract[symbol].address
+        if self._snapshot is not None and self._snapshot.open_orders is None:
+            # the snapshot read the ids. let the book forget filled orders
+            self._open_orders.reconcile(
+                self._snapshot.block_number,
+                {(market, False): ask_order_ids, (market, True): bid_order_ids},
             )
+
+        open_orders = []
+        for is_bid, order_ids in [(False, ask_order_ids), (True, bid_order_ids)]:
+            for order_id in order_ids:
+                order = self._open_orders.order(market, is_bid, order_id)
+                size = price = None
+                if order is not None and order["base"] is not None:
+                    size = order["base"] / (10**DECIMALS)
+                    price = order["price_x96"] / Q96
+                    if self._config.inverse:
+                        price = 1 / price
+                open_orders.append(
+                    dict(
+                        order_id=order_id,
+                        side_int=self._side_int(is_bid),
+                        size=size,
+                        price=price,
+                    )
+                )
+        return open_orders
+
+    async def cancel_all_orders(self, symbol: str):
+        await asyncio.gather(
+            self.cancel_all_ask_orders(symbol=symbol),
+            self.cancel_all_bid_orders(symbol=symbol),
         )
-        if size == 0:
-            self._logger.debug(f"{size=} is zero. will skip")
 
-        assert side_int != 0
+    async def cancel_all_bid_orders(self, symbol: str):
+        order_ids = await self._get_limit_order_ids(symbol=symbol, is_bid=True)
+        self._logger.debug("Bid orderIds %s", order_ids)
+        await asyncio.gather(
+            *[
+                self.cancel_limit_order(
+                    symbol=symbol, side_int=self._side_int(True), order_id=order_id
+                )
+                for order_id in order_ids
+            ]
+        )
 
-        if symbol not in self._symbol_to_market_contract:
-            raise ValueError(f"market address not initialized: {symbol=}")
+    async def cancel_all_ask_orders(self, symbol: str):
+        order_ids = await self._get_limit_order_ids(symbol=symbol, is_bid=False)
+        self._logger.debug("Ask orderIds %s", order_ids)
+        await asyncio.gather(
+            *[
+                self.cancel_limit_order(
+                    symbol=symbol, side_int=self._side_int(False), order_id=order_id
+                )
+                for order_id in order_ids
+            ]
+        )
 
-        # get market address from symbol string
-        market_contract = self._symbol_to_market_contract[symbol]
+    async def cancel_limit_order(self, symbol: str, side_int: int, order_id: str):
+        self._logger.debug(
+            "cancel_limit_order start symbol=%s, side_int=%s, order_id=%s",
+            symbol,
+            side_int,
+            order_id,
+        )
+        tx = await self._prepare_cancel_transaction(
+            symbol=symbol, side_int=side_int, order_id=order_id
+        )
+        if tx is None:
+            return
 
-        # calculate amount with decimals from size
-        amount = int(size * (10**DECIMALS))
-        price = 1 / price if self._config.inverse else price
-        priceX96 = int(price * Q96)
+        tx_hash = await self._send_transaction(
+            tx, retry_message="will retry cancel_limit_order"
+        )
+        await self._wait_for_receipt(tx_hash)
+        self._logger.debug("cancel_limit_order finish")
 
-        method_call = self._exchange_contract.functions.createLimitOrder(
-            dict(
-                market=market_contract.address,
-                isBid=side_int < 0 if self._config.inverse else side_int > 0,
-                base=amount,
-                priceX96=priceX96,
-                deadline=_get_deadline(),
-                limitOrderType=0,  # PostOnly
-            )
+    async def post_limit_order(
+        self, symbol: str, side_int: int, size: float, price: float
+    ):
+        self._logger.info(
+            "post_limit_order symbol %s side_int %s size %s price %s isBid %s",
+            symbol,
+            side_int,
+            size,
+            price,
+            side_int > 0,
         )
+        if size == 0:
+            self._logger.debug("size=%s is zero. will skip", size)
+            return
 
-        self._transact_with_retry(method_call, 3, "will retry post_limit_order")
+        method_call = self._create_limit_order_call(
+            symbol=symbol, side_int=side_int, size=size, price=price
+        )
+        await self._transact_with_retry(method_call, 3, "will retry post_limit_order")
         self._logger.debug("post_limit_order finish")
 
-    def post_market_order(self, symbol: str, side_int: int, size: float):
+    async def post_market_order(self, symbol: str, side_int: int, size: float):
         self._logger.info(
-            "post_market_order symbol {} side_int {} size {}".format(
-                symbol, side_int, size
-            )
+            "post_market_order symbol %s side_int %s size %s", symbol, side_int, size
         )
 
         assert side_int != 0
@@ -181,8 +758,13 @@ class PerpdexOrderer:
 
         # get market address from symbol string
         market_contract = self._symbol_to_market_contract[symbol]
-        share_price = market_contract.functions.getShareMarkPriceX96().call() / Q96
-        self._logger.debug("share_price {}".format(share_price))
+        share_price = (
+            await async_call(
+                self._async_w3, market_contract.functions.getShareMarkPriceX96()
+            )
+            / Q96
+        )
+        self._logger.debug("share_price %s", share_price)
 
         # calculate amount with decimals from size
         amount = int(size * (10**DECIMALS))
@@ -199,14 +781,12 @@ class PerpdexOrderer:
                 )
 
             self._logger.debug(
-                "amount {} opposite_amount_bound {}".format(
-                    amount, opposite_amount_bound
-                )
+                "amount %s opposite_amount_bound %s", amount, opposite_amount_bound
             )
 
             method_call = self._exchange_contract.functions.trade(
                 dict(
-                    trader=self._w3.eth.default_account,
+                    trader=self._async_w3.eth.default_account,
                     market=market_contract.address,
                     isBaseToQuote=(side_int < 0),
                     isExactInput=(side_int < 0),  # same as isBaseToQuote
@@ -217,36 +797,322 @@ class PerpdexOrderer:
             )
 
             try:
-                method_call.estimateGas()
+                # the amount is halved while the trade reverts
+                tx = await self._prepare_transaction(method_call, simulate=True)
             except Exception as e:
                 if i == retry_count - 1:
                     raise
                 amount = int(amount / 2)
-                self._logger.debug(f"estimateGas raises {e=} retrying")
+                self._logger.debug("estimateGas raises e=%r retrying", e)
+                RETRIES.labels("market_order_amount").inc()
                 continue
 
-            tx_hash = method_call.transact(self._config.tx_options)
-            self._w3.eth.wait_for_transaction_receipt(tx_hash)
+            tx_hash = await self._send_transaction(tx)
+            await self._wait_for_receipt(tx_hash)
             break
 
-    def _transact_with_retry(
+    async def _transact_with_retry(
         self, method_call, retry_num: int, retry_message: str = ""
+    ):
+        tx = await self._prepare_transaction(method_call)
+        tx_hash = await self._send_transaction(
+            tx, retry_num=retry_num, retry_message=retry_message
+        )
+        await self._wait_for_receipt(tx_hash)
+
+    async def _wait_for_receipt(self, tx_hash):
+        # tx_hash and the hashes of its replacements (replace-by-fee)
+        tx_hashes = [tx_hash]
+        try:
+            with STAGE_SECONDS.labels("wait_for_receipt").time():
+                receipt = await self._wait_for_mined(tx_hashes)
+        finally:
+            sent_txs = {h: self._sent_txs.pop(h, (None, None)) for h in tx_hashes}
+        # the mined tx may be a replacement, sent later with other fees
+        mined_tx_hash = HexBytes(receipt["transactionHash"])
+        tx, sent_at = sent_txs.get(mined_tx_hash, (None, None))
+        if self._tx_builder is not None and tx is not None:
+            self._tx_builder.observe(tx, receipt)
+        if self._recorder is not None:
+            self._recorder.record(
+                "tx",
+                tx_hash=mined_tx_hash.hex(),
+                status=receipt["status"],
+                block_number=receipt["blockNumber"],
+                gas_used=receipt["gasUsed"],
+                latency_sec=None if sent_at is None else time.time() - sent_at,
+                replacements=len(tx_hashes) - 1,
+            )
+        return receipt
+
+    async def _wait_for_mined(self, tx_hashes: list):
+        """receipt of tx_hashes[0] or of a replacement appended to `tx_hashes`"""
+        tx_hash = tx_hashes[0]
+        if self._fee_oracle is None or tx_hash not in self._sent_txs:
+            return await self._receipt_tracker.wait(
+                tx_hash, timeout=self._config.receipt_timeout_sec
+            )
+
+        tx, _ = self._sent_txs[tx_hash]
+        deadline = time.monotonic() + self._config.receipt_timeout_sec
+        try:
+            while True:
+                timeout = min(
+                    self._config.replace_after_sec, deadline - time.monotonic()
+                )
+                if timeout <= 0:
+                    raise web3.exceptions.TimeExhausted(
+                        f"{HexBytes(tx_hash).hex()} is not in the chain after "
+                        f"{len(tx_hashes) - 1} replacements"
+                    )
+                # any of the replaced txs may be the one mined
+                done, _ = await asyncio.wait(
+                    [self._receipt_tracker.track(h) for h in tx_hashes],
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if len(done) > 0:
+                    return done.pop().result()
+                if len(tx_hashes) - 1 < self._config.max_replacements:
+                    tx = await self._replace_by_fee(tx, tx_hashes)
+        finally:
+            for h in tx_hashes:
+                self._receipt_tracker.untrack(h)
+
+    async def _replace_by_fee(self, tx: dict, tx_hashes: list) -> dict:
+        """send `tx` again with bumped fees and append the hash to `tx_hashes`"""
+        replacement_tx = await self._fee_oracle.bump(tx)
+        if all(
+            replacement_tx.get(key) == tx.get(key)
+            for key in ["gasPrice", "maxFeePerGas", "maxPriorityFeePerGas"]
+        ):
+            # at max_fee_per_gas. a resend would be rejected as underpriced
+            return tx
+        try:
+            sent_at = time.time()
+            with STAGE_SECONDS.labels("transact").time():
+                replacement_tx_hash = await self._submit(replacement_tx)
+        except ValueError as e:
+            if not _is_replacement_rejected(e):
+                raise e
+            # mined meanwhile or bump too small. keep waiting and retry
+            self._logger.info("replacement rejected e=%r", e)
+            return tx
+        RETRIES.labels("replace_by_fee").inc()
+        self._logger.info("replaced %s by %s", tx_hashes[-1], replacement_tx_hash)
+        self._sent_txs[replacement_tx_hash] = (replacement_tx, sent_at)
+        if self._recorder is not None:
+            self._recorder.record(
+                "tx_replacement",
+                tx_hash=HexBytes(tx_hashes[-1]).hex(),
+                replacement_tx_hash=HexBytes(replacement_tx_hash).hex(),
+                nonce=replacement_tx["nonce"],
+                max_fee_per_gas=replacement_tx.get("maxFeePerGas"),
+                gas_price=replacement_tx.get("gasPrice"),
+            )
+        tx_hashes.append(replacement_tx_hash)
+        return replacement_tx
+
+    async def _get_limit_order_ids(self, symbol: str, is_bid: bool) -> list:
+        market_contract = self._symbol_to_market_contract[symbol]
+        if self._snapshot is not None:
+            return self._snapshot.limit_order_ids(market_contract.address, is_bid)
+        await self._open_orders.update()
+        return self._open_orders.order_ids(market_contract.address, is_bid)
+
+    def _create_limit_order_call(
+        self, symbol: str, side_int: int, size: float, price: float
+    ):
+        assert side_int != 0
+
+        if symbol not in self._symbol_to_market_contract:
+            raise ValueError(f"market address not initialized: {symbol=}")
+
+        # get market address from symbol string
+        market_contract = self._symbol_to_market_contract[symbol]
+
+        # calculate amount with decimals from size
+        amount = int(size * (10**DECIMALS))
+        price = 1 / price if self._config.inverse else price
+        priceX96 = int(price * Q96)
+
+        return self._exchange_contract.functions.createLimitOrder(
+            dict(
+                market=market_contract.address,
+                isBid=self._is_bid(side_int),
+                base=amount,
+                priceX96=priceX96,
+                deadline=_get_deadline(),
+                limitOrderType=0,  # PostOnly
+            )
+        )
+
+    def _cancel_limit_order_call(self, symbol: str, side_int: int, order_id: str):
+        market_contract = self._symbol_to_market_contract[symbol]
+
+        return self._exchange_contract.functions.cancelLimitOrder(
+            dict(
+                market=market_contract.address,
+                isBid=self._is_bid(side_int),
+                orderId=order_id,
+                deadline=_get_deadline(),
+            )
+        )
+
+    async def _prepare_cancel_transaction(
+        self, symbol: str, side_int: int, order_id: str
+    ) -> Optional[dict]:
+        method_call = self._cancel_limit_order_call(
+            symbol=symbol, side_int=side_int, order_id=order_id
+        )
+
+        try:
+            # simulated to skip orders that are gone instead of reverting
+            return await self._prepare_transaction(
+                method_call, urgency=URGENCY_HIGH, simulate=True
+            )
+        except web3.exceptions.ContractLogicError as e:
+            if "OBL_CO: already fully executed" in str(e):
+                self._logger.info("order_id=%s is already fully filled", order_id)
+                self._logger.debug("cancel_limit_order skip")
+                CANCEL_SKIPS.labels("already_filled").inc()
+            elif "MOBL_CLO: enough mm" in str(e):
+                self._logger.info("order_id=%s is not my order", order_id)
+                self._logger.debug("cancel_limit_order skip")
+                CANCEL_SKIPS.labels("not_my_order").inc()
+            elif "RBTL_R: key not exist" in str(e):
+                self._logger.info("order_id=%s does not exist", order_id)
+                self._logger.debug("cancel_limit_order skip")
+                CANCEL_SKIPS.labels("not_exist").inc()
+            else:
+                raise e
+        return None
+
+    async def _prepare_transaction(
+        self, method_call, urgency: str = URGENCY_NORMAL, simulate: bool = False
+    ) -> dict:
+        # simulate: estimate gas even when the gas limit is learned, so that a
+        # reverting call raises ContractLogicError here.
+        # estimate gas before a nonce is allocated so that a reverting call
+        # does not leave a nonce gap
+        tx = to_transaction(
+            method_call,
+            self._config.tx_options,
+            self._async_w3.eth.default_account,
+        )
+        if "gas" not in tx and self._tx_builder is not None and not simulate:
+            gas = self._tx_builder.gas_limit(tx)
+            if gas is not None:
+                tx["gas"] = gas
+        if "gas" not in tx:
+            tx["gas"] = await self._async_w3.eth.estimate_gas(tx)
+        if self._fee_oracle is not None:
+            fees = await self._fee_oracle.fees(urgency)
+            if "maxFeePerGas" in fees:
+                # the static gasPrice of tx_options would make it a legacy tx
+                tx.pop("gasPrice", None)
+            tx.update(fees)
+        return tx
+
+    async def _send_transactions(self, txs: list) -> list:
+        # nonces are allocated in list order, so the burst is mined in that order
+        nonces = [await self._nonce_manager.allocate() for _ in txs]
+        results = await asyncio.gather(
+            *[
+                self._send_transaction(tx, nonce=nonce)
+                for tx, nonce in zip(txs, nonces)
+            ],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if len(errors) > 0:
+            # the nonces of failed sends are filled, so the sent txs get mined.
+            # wait for them so that none is left behind untracked
+            await asyncio.gather(
+                *[
+                    self._wait_for_receipt(tx_hash)
+                    for tx_hash in results
+                    if not isinstance(tx_hash, BaseException)
+                ],
+                return_exceptions=True,
+            )
+            raise errors[0]
+        return results
+
+    async def _send_transaction(
+        self,
+        tx: dict,
+        nonce: int = None,
+        retry_num: int = 3,
+        retry_message: str = "",
     ):
         while retry_num > 0:
+            if nonce is None:
+                nonce = await self._nonce_manager.allocate()
             try:
-                tx_hash = method_call.transact(self._config.tx_options)
-                self._w3.eth.wait_for_transaction_receipt(tx_hash)
-                break
+                sent_at = time.time()
+                tx = dict(tx, nonce=nonce)
+                with STAGE_SECONDS.labels("transact").time():
+                    tx_hash = await self._submit(tx)
+                self._sent_txs[tx_hash] = (tx, sent_at)
+                return tx_hash
             except ValueError as e:
-                # nonce too low
-                if "nonce too low" in str(e):
-                    self._logger.error(e)
-                    retry_num -= 1
-                    if retry_num == 0:
-                        raise e
-                    self._logger.info(f"{retry_num=}. {retry_message}")
-                else:
+                if not _is_nonce_error(e):
+                    # e.g. insufficient funds. the nonce was not consumed
+                    await self._release_nonce(nonce)
                     raise e
+                # the nonce conflicts with the node (taken on chain)
+                self._nonce_manager.done(nonce)
+                await self._nonce_manager.resync()
+                nonce = None
+                self._logger.error(e)
+                NONCE_ERRORS.inc()
+                RETRIES.labels("nonce").inc()
+                retry_num -= 1
+                if retry_num == 0:
+                    raise e
+                self._logger.info("retry_num=%s. %s", retry_num, retry_message)
+            finally:
+                if nonce is not None:
+                    self._nonce_manager.done(nonce)
+
+    async def _release_nonce(self, nonce: int):
+        """give back an unsent nonce, or fill it when later ones are in use"""
+        if self._nonce_manager.release(nonce):
+            return
+        # later txs (e.g. of the same burst) are stuck until the nonce is used.
+        # a 0 value transfer to ourselves uses it
+        address = self._async_w3.eth.default_account
+        tx = dict(
+            self._config.tx_options,
+            **{"from": address, "to": address, "value": 0, "gas": 21000},
+            nonce=nonce,
+        )
+        if self._fee_oracle is not None:
+            fees = await self._fee_oracle.fees(URGENCY_HIGH)
+            if "maxFeePerGas" in fees:
+                tx.pop("gasPrice", None)
+            tx.update(fees)
+        try:
+            tx_hash = await self._submit(tx)
+        except ValueError as e:
+            self._logger.error("failed to fill nonce gap nonce=%s e=%r", nonce, e)
+            self._nonce_manager.done(nonce)
+            await self._nonce_manager.resync()
+            return
+        RETRIES.labels("nonce_gap").inc()
+        self._logger.info("filled nonce gap nonce=%s tx_hash=%s", nonce, tx_hash)
+
+    async def _submit(self, tx: dict):
+        if self._tx_builder is not None:
+            return await self._tx_builder.send(tx)
+        return await self._async_w3.eth.send_transaction(tx)
+
+    def _is_bid(self, side_int: int) -> bool:
+        return side_int < 0 if self._config.inverse else side_int > 0
+
+    def _side_int(self, is_bid: bool) -> int:
+        return (-1 if is_bid else 1) if self._config.inverse else (1 if is_bid else -1)
 
 
 @dataclass
@@ -257,43 +1123,247 @@ class PerpdexPositionGetterConfig:
 
 
 class PerpdexPositionGetter:
-    def __init__(self, w3, config: PerpdexPositionGetterConfig):
+    def __init__(
+        self,
+        w3,
+        config: PerpdexPositionGetterConfig,
+        snapshot: PerpdexStateSnapshot = None,
+        cache: TTLCache = None,
+        registry: ContractRegistry = None,
+    ):
         self._w3 = w3
         self._config = config
+        self._snapshot = snapshot
+        if cache is None:
+            # positions change with every fill, so no caching by default
+            cache = TTLCache(ttl_sec=0)
+        self._cache = cache
 
-        self._market_contract = get_contract_from_abi_json(
-            w3,
-            config.market_contract_abi_json_filepath,
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self._market_contract = registry.contract(
+            config.market_contract_abi_json_filepath
         )
-        self._exchange_contract = get_contract_from_abi_json(
-            w3,
-            config.exchange_contract_abi_json_filepath,
+        self._exchange_contract = registry.contract(
+            config.exchange_contract_abi_json_filepath
         )
 
     def current_position(self) -> float:
-        base_share = self._exchange_contract.functions.getPositionShare(
-            self._w3.eth.default_account,
-            self._market_contract.address,
-        ).call()
+        if self._snapshot is not None:
+            base_share = self._snapshot.position_share(self._market_contract.address)
+        else:
+            base_share = self._cache.get(
+                ("getPositionShare", self._market_contract.address),
+                self._exchange_contract.functions.getPositionShare(
+                    self._w3.eth.default_account,
+                    self._market_contract.address,
+                ).call,
+            )
         pos = base_share / (10**DECIMALS)
         if self._config.inverse:
             return -pos
         return pos
 
     def unit_leverage_lot(self) -> float:
-        account_value = self._exchange_contract.functions.getTotalAccountValue(
-            self._w3.eth.default_account,
-        ).call() / (10**DECIMALS)
+        if self._snapshot is not None:
+            account_value = self._snapshot.total_account_value() / (10**DECIMALS)
+            share_price = (
+                self._snapshot.share_mark_price_x96(self._market_contract.address) / Q96
+            )
+            return account_value / share_price
+
+        account_value = self._cache.get(
+            ("getTotalAccountValue",),
+            self._exchange_contract.functions.getTotalAccountValue(
+                self._w3.eth.default_account,
+            ).call,
+        ) / (10**DECIMALS)
         share_price = (
-            self._market_contract.functions.getShareMarkPriceX96().call() / Q96
+            self._cache.get(
+                ("getShareMarkPriceX96", self._market_contract.address),
+                self._market_contract.functions.getShareMarkPriceX96().call,
+            )
+            / Q96
         )
         return account_value / share_price
 
 
+@dataclass
+class PerpdexRequoteTriggerConfig:
+    market_contract_abi_json_filepaths: list
+    exchange_contract_abi_json_filepath: str
+    inverse: bool
+    mark_price_change_rate: float = 0.001
+    fill_event_names: list = field(default_factory=lambda: ["LimitOrderSettled"])
+
+
+class PerpdexRequoteTrigger:
+    """Fires when a mark price moves past a threshold or our orders are filled
+
+    Market logs (trades) mark the market as dirty and the mark prices of
+    dirty markets are read at most once per new block header. Exchange logs with one of
+    `fill_event_names` whose topics include our address fire immediately.
+    """
+
+    def __init__(
+        self,
+        w3,
+        async_w3,
+        subscriber: WebsocketSubscriber,
+        config: PerpdexRequoteTriggerConfig,
+        registry: ContractRegistry = None,
+    ):
+        self._async_w3 = async_w3
+        self._subscriber = subscriber
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        if registry is None:
+            registry = ContractRegistry(w3)
+        self._market_contracts = {}
+        for filepath in config.market_contract_abi_json_filepaths:
+            contract = registry.contract(filepath)
+            self._market_contracts[contract.address] = contract
+        exchange_contract = registry.contract(
+            config.exchange_contract_abi_json_filepath
+        )
+        self._fill_topics = {
+            HexBytes(event_abi_to_log_topic(abi)).hex()
+            for abi in exchange_contract.abi
+            if abi.get("type") == "event" and abi.get("name") in config.fill_event_names
+        }
+        self._trader_topic = "0x" + "00" * 12 + async_w3.eth.default_account[2:].lower()
+
+        subscriber.subscribe(["newHeads"], self._on_new_head)
+        subscriber.subscribe(
+            ["logs", {"address": list(self._market_contracts.keys())}],
+            self._on_market_log,
+        )
+        subscriber.subscribe(
+            ["logs", {"address": exchange_contract.address}],
+            self._on_exchange_log,
+        )
+
+        # number of the newest block header
+        self.block_number: Optional[int] = None
+        self._triggered = asyncio.Event()
+        self._new_head = asyncio.Event()
+        self._dirty_markets = set(self._market_contracts.keys())
+        # market address -> mark price
+        self._mark_prices: dict = {}
+        self._quoted_mark_prices: dict = {}
+
+    async def run(self):
+        # when one ends the other is cancelled, so that a restart of run does
+        # not leave a websocket connection behind
+        tasks = [
+            asyncio.ensure_future(self._subscriber.run()),
+            asyncio.ensure_future(self._check_mark_price_loop()),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def wait(self, timeout: float) -> bool:
+        """wait for a trigger. returns False on timeout (heartbeat)"""
+        try:
+            await asyncio.wait_for(self._triggered.wait(), timeout)
+            triggered = True
+        except asyncio.TimeoutError:
+            triggered = False
+        self._triggered.clear()
+        self._quoted_mark_prices = dict(self._mark_prices)
+        return triggered
+
+    def _on_new_head(self, result: dict):
+        if "number" in result:
+            self.block_number = int(result["number"], 16)
+        self._new_head.set()
+
+    def _on_market_log(self, result: dict):
+        address = web3.Web3.toChecksumAddress(result["address"])
+        self._dirty_markets.add(address)
+
+    def _on_exchange_log(self, result: dict):
+        topics = result.get("topics", [])
+        if len(topics) == 0 or topics[0] not in self._fill_topics:
+            return
+        if self._trader_topic in topics[1:]:
+            self._logger.debug("fill log %s", result.get("transactionHash"))
+            self._triggered.set()
+
+    async def _check_mark_price_loop(self):
+        while True:
+            await self._new_head.wait()
+            self._new_head.clear()
+            if len(self._dirty_markets) == 0:
+                continue
+            addresses = list(self._dirty_markets)
+            self._dirty_markets.clear()
+
+            try:
+                price_x96s = await asyncio.gather(
+                    *[
+                        async_call(self._async_w3, self._mark_price_call(address))
+                        for address in addresses
+                    ]
+                )
+            except Exception as e:
+                # read again with the next block
+                self._logger.warning("mark price read failed e=%r", e)
+                self._dirty_markets.update(addresses)
+                continue
+            for address, price_x96 in zip(addresses, price_x96s):
+                mark_price = price_x96 / Q96
+                if self._config.inverse:
+                    mark_price = 1 / mark_price
+                self._mark_prices[address] = mark_price
+                self._check_mark_price_change(address)
+
+    def _mark_price_call(self, address: str):
+        return self._market_contracts[address].functions.getMarkPriceX96()
+
+    def _check_mark_price_change(self, address: str):
+        mark_price = self._mark_prices[address]
+        quoted_mark_price = self._quoted_mark_prices.get(address)
+        if quoted_mark_price is None:
+            self._quoted_mark_prices[address] = mark_price
+            return
+
+        change_rate = abs(mark_price - quoted_mark_price) / quoted_mark_price
+        if change_rate >= self._config.mark_price_change_rate:
+            self._logger.debug(
+                "mark price moved address=%s change_rate=%.6f", address, change_rate
+            )
+            self._triggered.set()
+
+
 def _get_deadline():
     return int(time.time()) + 2 * 60
 
 
+def _has_event(contract, event_name: str) -> bool:
+    return any(
+        abi.get("type") == "event" and abi.get("name") == event_name
+        for abi in contract.abi
+    )
+
+
+def _is_nonce_error(e: ValueError) -> bool:
+    # "already known" is not a conflict. the send layer (TxBuilder, signing
+    # middleware) returns the hash of the tx the node already holds
+    return "nonce too low" in str(e)
+
+
+def _is_replacement_rejected(e: ValueError) -> bool:
+    return _is_nonce_error(e) or "replacement transaction underpriced" in str(e)
+
+
 def _calc_opposite_amount_bound(is_long, share, share_price, slippage):
     opposite_amount_center = share * share_price
     if is_long:
@@ -0,0 +1,79 @@
+import math
+from collections import deque
+
+
+class RollingMeanStd:
+    """Rolling mean / sample std (ddof=1) updated in O(1) per value
+
+    Welford's algorithm with the sliding-window update for evicted values.
+    `push` adds a closed bar, `peek` evaluates a still-forming bar as the
+    newest value of the window without changing the state.
+    """
+
+    def __init__(self, window: int):
+        self._window = window
+        self._values = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, x: float):
+        self._mean, self._m2 = self._updated(x)
+        if len(self._values) == self._window:
+            self._values.popleft()
+        self._values.append(x)
+
+    def peek(self, x: float) -> tuple:
+        """returns (mean, std) of the window ending with x"""
+        n = min(len(self._values) + 1, self._window)
+        if n < self._window:
+            return math.nan, math.nan
+        mean, m2 = self._updated(x)
+        return mean, math.sqrt(max(m2, 0.0) / (n - 1))
+
+    def _updated(self, x: float) -> tuple:
+        n = len(self._values)
+        if n < self._window:
+            delta = x - self._mean
+            mean = self._mean + delta / (n + 1)
+            return mean, self._m2 + delta * (x - mean)
+
+        y = self._values[0]
+        mean = self._mean + (x - y) / n
+        return mean, self._m2 + (x - y) * (x - mean + y - self._mean)
+
+
+class WilderATR:
+    """ATR with Wilder's smoothing updated in O(1) per bar
+
+    Same definition as talib.ATR: the first value is the simple mean of the
+    first `timeperiod` true ranges, then atr = (atr * (n - 1) + tr) / n.
+    """
+
+    def __init__(self, timeperiod: int):
+        self._timeperiod = timeperiod
+        self._prev_close = None
+        self._tr_sum = 0.0
+        self._tr_count = 0
+        self._atr = math.nan
+
+    def push(self, hi: float, lo: float, cl: float):
+        self._atr, self._tr_sum, self._tr_count = self._updated(hi, lo)
+        self._prev_close = cl
+
+    def peek(self, hi: float, lo: float) -> float:
+        atr, _, _ = self._updated(hi, lo)
+        return atr
+
+    def _updated(self, hi: float, lo: float) -> tuple:
+        if self._prev_close is None:
+            # the first bar has no true range
+            return self._atr, self._tr_sum, self._tr_count
+
+        tr = max(hi - lo, abs(hi - self._prev_close), abs(lo - self._prev_close))
+        n = self._timeperiod
+        if self._tr_count < n:
+            tr_sum = self._tr_sum + tr
+            tr_count = self._tr_count + 1
+            atr = tr_sum / n if tr_count == n else math.nan
+            return atr, tr_sum, tr_count
+        return (self._atr * (n - 1) + tr) / n, self._tr_sum, self._tr_count
@@ -0,0 +1,101 @@
+import atexit
+import json
+import logging
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# attributes of every LogRecord. the rest are `extra` fields
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()) | {
+    "message",
+    "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line with the `extra` fields of the record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = dict(
+            time=record.created,
+            level=record.levelname,
+            name=record.name,
+            message=record.getMessage(),
+        )
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """passes at most `max_per_sec` records per call site and second
+
+    Only records at or below `max_level` are limited. The number of dropped
+    records is attached to the next passing one as `suppressed`.
+    """
+
+    def __init__(self, max_per_sec: int, max_level: int = logging.DEBUG):
+        super().__init__()
+        self._max_per_sec = max_per_sec
+        self._max_level = max_level
+        # (pathname, lineno) -> [window start, count, suppressed]
+        self._sites: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self._max_level:
+            return True
+
+        now = time.monotonic()
+        site = self._sites.get((record.pathname, record.lineno))
+        if site is None or now - site[0] >= 1.0:
+            suppressed = 0 if site is None else site[2]
+            site = [now, 0, 0]
+            self._sites[(record.pathname, record.lineno)] = site
+            if suppressed > 0:
+                record.suppressed = suppressed
+        if site[1] >= self._max_per_sec:
+            site[2] += 1
+            return False
+        site[1] += 1
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """enqueues records unformatted so that formatting happens on the listener
+
+    Log args must not be mutated after the call (they are formatted later).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # tracebacks hold frames. render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def start_queue_logging(max_debug_per_sec: int = None) -> QueueListener:
+    """move the handlers of the root logger behind a queue
+
+    The trading loop only enqueues records; formatting and I/O run on the
+    listener thread. Call after logging.config.dictConfig.
+    """
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    q = queue.SimpleQueue()
+    handler = LazyQueueHandler(q)
+    if max_debug_per_sec is not None:
+        handler.addFilter(RateLimitFilter(max_debug_per_sec))
+    for h in handlers:
+        root.removeHandler(h)
+    root.addHandler(handler)
+
+    listener = QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,14 +1,23 @@
+import asyncio
+import math
 from dataclasses import dataclass
 from logging import getLogger
 
+import numpy as np
 import pandas as pd
-import talib
+
+from .indicators import RollingMeanStd, WilderATR
+from .metrics import STAGE_SECONDS
 
 
 class IOhlcvGetter:
     def get_ohlcv_df(self) -> pd.DataFrame:
         ...
 
+    def get_ohlcv_arrays(self) -> dict:
+        """dict of numpy arrays with keys timestamp, op, hi, lo, cl, volume"""
+        ...
+
 
 @dataclass
 class NormMakePriceCalculatorConfig:
@@ -27,14 +36,24 @@ class NormMakePriceCalculator:
 
         self._logger = getLogger(__class__.__name__)
 
+        self._rolling = RollingMeanStd(config.timeperiod)
+        self._last_closed_ts = None
+
     def ask_bid_prices(self) -> dict:
-        ohlcv_df = self._ohlcv_getter.get_ohlcv_df()
-        u = ohlcv_df["cl"].rolling(self._config.timeperiod).mean()
-        s = ohlcv_df["cl"].rolling(self._config.timeperiod).std()
+        ohlcv = self._ohlcv_getter.get_ohlcv_arrays()
+        ts = ohlcv["timestamp"]
+        cl = ohlcv["cl"]
+
+        # the last bar is still forming. consume only newly closed bars
+        for i in _new_closed_bar_indices(ts, self._last_closed_ts):
+            self._rolling.push(cl[i])
+            self._last_closed_ts = ts[i]
+
+        u, s = self._rolling.peek(cl[-1])
         diff = s * self._config.diff_k
         ask_price = u + diff
         bid_price = u - diff
-        return ask_price.values[-1], bid_price.values[-1]
+        return ask_price, bid_price
 
 
 class IPriceGetter:
@@ -88,15 +107,22 @@ class ATRMakePriceCalculator:
 
         self._logger = getLogger(__class__.__name__)
 
+        self._atr = WilderATR(config.timeperiod)
+        self._last_closed_ts = None
+
     def ask_bid_prices(self) -> tuple:
-        ohlcv_df = self._ohlcv_getter.get_ohlcv_df()
-        ATRs = talib.ATR(
-            ohlcv_df["hi"],
-            ohlcv_df["lo"],
-            ohlcv_df["cl"],
-            timeperiod=self._config.timeperiod,
-        )
-        ATR = ATRs[-1]
+        ohlcv = self._ohlcv_getter.get_ohlcv_arrays()
+        ts = ohlcv["timestamp"]
+        hi = ohlcv["hi"]
+        lo = ohlcv["lo"]
+        cl = ohlcv["cl"]
+
+        # the last bar is still forming. consume only newly closed bars
+        for i in _new_closed_bar_indices(ts, self._last_closed_ts):
+            self._atr.push(hi[i], lo[i], cl[i])
+            self._last_closed_ts = ts[i]
+
+        ATR = self._atr.peek(hi[-1], lo[-1])
         diff = ATR * self._config.diff_k
         ask_price = ATR + diff
         bid_price = ATR - diff
@@ -126,7 +152,7 @@ class SimpleMakeSizeCalculator:
 
     def ask_bid_sizes(self) -> tuple:
         pos = self._position_getter.current_position()
-        self._logger.debug(f"{pos=:.8f}")
+        self._logger.debug("pos=%.8f", pos)
         # ask size
         if pos < 0:
             # short position
@@ -156,12 +182,134 @@ class IMakeSizeCalculator:
 
 
 class IMaker:
-    def post_limit_order(
+    async def post_limit_order(
         self, symbol: str, side_int: int, size: float, price: float
     ) -> str:
         ...
 
-    def cancel_all_orders(self, symbol: str):
+    async def cancel_all_orders(self, symbol: str):
+        ...
+
+    async def replace_all_orders(self, symbol: str, orders: list):
+        ...
+
+    async def get_open_orders(self, symbol: str) -> list:
+        ...
+
+    async def cancel_and_post_limit_orders(
+        self, symbol: str, cancel_orders: list, orders: list
+    ):
+        ...
+
+
+@dataclass
+class QuoteReconcilerConfig:
+    price_tolerance: float = 0.0
+    size_tolerance: float = 0.0
+
+
+class QuoteReconciler:
+    """Diffs resting orders against target quotes
+
+    orders are dict(order_id=, side_int=, size=, price=) (order_id only for
+    resting orders). A resting order is kept when it matches a target of the
+    same side within the tolerances, so unchanged legs keep queue priority.
+    """
+
+    def __init__(self, config: QuoteReconcilerConfig):
+        self._config = config
+
+        self._logger = getLogger(__class__.__name__)
+
+    def reconcile(self, open_orders: list, target_orders: list) -> tuple:
+        cancel_orders = []
+        new_orders = []
+        for side_int in [-1, 1]:
+            side_open_orders = [o for o in open_orders if o["side_int"] == side_int]
+            side_target_orders = [
+                o for o in target_orders if o["side_int"] == side_int and o["size"] > 0
+            ]
+            for target_order in side_target_orders:
+                matched = self._find_match(target_order, side_open_orders)
+                if matched is None:
+                    new_orders.append(target_order)
+                else:
+                    side_open_orders.remove(matched)
+            cancel_orders += [
+                dict(side_int=o["side_int"], order_id=o["order_id"])
+                for o in side_open_orders
+            ]
+        return cancel_orders, new_orders
+
+    def _find_match(self, target_order: dict, open_orders: list):
+        for open_order in open_orders:
+            # unknown orders (price is None) are never matched
+            if open_order["price"] is None:
+                continue
+            if _is_close(
+                open_order["price"],
+                target_order["price"],
+                self._config.price_tolerance,
+            ) and _is_close(
+                open_order["size"],
+                target_order["size"],
+                self._config.size_tolerance,
+            ):
+                return open_order
+        return None
+
+
+@dataclass
+class QuoteLadderConfig:
+    levels: int = 1
+    # price step between levels relative to the level 0 price
+    spacing_rate: float = 0.001
+    # size of level i is proportional to size_decay ** i
+    size_decay: float = 1.0
+
+
+class QuoteLadder:
+    """Spreads the quote of each side over `levels` prices
+
+    Level 0 is the calculated price and the levels step away from it by
+    `spacing_rate`. The calculated size is split over the levels, so the
+    total size per side does not change with the depth.
+    """
+
+    def __init__(self, config: QuoteLadderConfig):
+        self._config = config
+
+        levels = np.arange(config.levels)
+        self._offsets = levels * config.spacing_rate
+        weights = config.size_decay**levels
+        self._weights = weights / weights.sum()
+
+    def target_orders(
+        self, ask_price: float, bid_price: float, ask_size: float, bid_size: float
+    ) -> list:
+        """orders as list of dict(side_int=, size=, price=) of both sides"""
+        ask_prices = ask_price * (1 + self._offsets)
+        bid_prices = bid_price * (1 - self._offsets)
+        ask_sizes = ask_size * self._weights
+        bid_sizes = bid_size * self._weights
+        return [
+            # bid(short) orders
+            dict(side_int=-1, size=size, price=price)
+            for size, price in zip(ask_sizes.tolist(), ask_prices.tolist())
+        ] + [
+            # ask(long) orders
+            dict(side_int=1, size=size, price=price)
+            for size, price in zip(bid_sizes.tolist(), bid_prices.tolist())
+        ]
+
+
+class IStateUpdater:
+    async def update(self):
+        ...
+
+
+class IRecorder:
+    def record(self, table: str, **values):
         ...
 
 
@@ -179,48 +327,142 @@ class MarketMaker:
         maker: IMaker,
         price_getter: IPriceGetter,
         config: MarketMakerConfig,
+        quote_reconciler: QuoteReconciler = None,
+        state_updater: IStateUpdater = None,
+        recorder: IRecorder = None,
+        quote_ladder: QuoteLadder = None,
     ):
         self._make_price_calculator = make_price_calculator
         self._make_size_calculator = make_size_calculator
         self._maker = maker
         self._ticker = price_getter
         self._config = config
+        self._quote_reconciler = quote_reconciler
+        self._state_updater = state_updater
+        self._recorder = recorder
+        self._quote_ladder = quote_ladder
 
         self._logger = getLogger(__class__.__name__)
 
     async def execute(self):
-        ask_price, bid_price = self._make_price_calculator.ask_bid_prices()
-        ask_size, bid_size = self._make_size_calculator.ask_bid_sizes()
+        if self._state_updater is not None:
+            # read on-chain state once for the getters used below
+            with STAGE_SECONDS.labels("state_update").time():
+                await self._state_updater.update()
+
+        with STAGE_SECONDS.labels("price_calc").time():
+            ask_price, bid_price = self._make_price_calculator.ask_bid_prices()
+        with STAGE_SECONDS.labels("size_calc").time():
+            ask_size, bid_size = self._make_size_calculator.ask_bid_sizes()
 
         ltp = self._ticker.last_price()
-        self._logger.debug(f"{ltp=}")
-        self._logger.debug(f"(ask_price, ask_size) = ({ask_price}, {ask_size})")
-        self._logger.debug(f"(bid_price, bid_size) = ({bid_price}, {bid_size})")
+        # lazy %-formatting. these run every cycle
+        self._logger.debug("ltp=%s", ltp)
+        self._logger.debug("(ask_price, ask_size) = (%s, %s)", ask_price, ask_size)
+        self._logger.debug("(bid_price, bid_size) = (%s, %s)", bid_price, bid_size)
 
         ask_price = max(ltp + 1, ask_price)
         bid_price = min(ltp - 1, bid_price)
         self._logger.debug("best priced")
-        self._logger.debug(f"(ask_price, ask_size) = ({ask_price}, {ask_size})")
-        self._logger.debug(f"(bid_price, bid_size) = ({bid_price}, {bid_size})")
-
-        # cancel order
-        self._maker.cancel_all_orders(symbol=self._config.symbol)
-
-        if self._config.inverse:
-            # bid(short) order
-            self._maker.post_limit_order(
+        self._logger.debug("(ask_price, ask_size) = (%s, %s)", ask_price, ask_size)
+        self._logger.debug("(bid_price, bid_size) = (%s, %s)", bid_price, bid_size)
+        if self._recorder is not None:
+            self._recorder.record(
+                "quote",
                 symbol=self._config.symbol,
-                side_int=-1,
-                size=ask_size,
-                price=ask_price,
+                # sizes can be int 0. keep the columns float
+                mark_price=float(ltp),
+                ask_price=float(ask_price),
+                bid_price=float(bid_price),
+                ask_size=float(ask_size),
+                bid_size=float(bid_size),
             )
 
-            # ask(long) order
-            self._maker.post_limit_order(
-                symbol=self._config.symbol,
-                side_int=1,
-                size=bid_size,
-                price=bid_price,
+        if not self._config.inverse:
+            raise NotImplementedError
+        if self._quote_ladder is not None:
+            # all levels go out in the one cancel-and-post batch below
+            target_orders = self._quote_ladder.target_orders(
+                ask_price, bid_price, ask_size, bid_size
             )
         else:
-            raise NotImplementedError
+            target_orders = [
+                # bid(short) order
+                dict(side_int=-1, size=ask_size, price=ask_price),
+                # ask(long) order
+                dict(side_int=1, size=bid_size, price=bid_price),
+            ]
+
+        if self._quote_reconciler is None:
+            # cancel orders and post new ones in one burst
+            with STAGE_SECONDS.labels("send_orders").time():
+                await self._maker.replace_all_orders(
+                    symbol=self._config.symbol,
+                    orders=target_orders,
+                )
+            return
+
+        with STAGE_SECONDS.labels("get_open_orders").time():
+            open_orders = await self._maker.get_open_orders(symbol=self._config.symbol)
+        cancel_orders, new_orders = self._quote_reconciler.reconcile(
+            open_orders, target_orders
+        )
+        self._logger.debug("cancel_orders=%s, new_orders=%s", cancel_orders, new_orders)
+        if len(cancel_orders) == 0 and len(new_orders) == 0:
+            self._logger.debug("quotes unchanged")
+            return
+
+        with STAGE_SECONDS.labels("send_orders").time():
+            await self._maker.cancel_and_post_limit_orders(
+                symbol=self._config.symbol,
+                cancel_orders=cancel_orders,
+                orders=new_orders,
+            )
+
+
+class MultiMarketMaker:
+    """Quotes several markets in one cycle
+
+    The shared state (e.g. one snapshot of all markets) is read once and
+    then all markets are quoted concurrently. Market makers should be built
+    without their own state_updater.
+    """
+
+    def __init__(
+        self,
+        market_makers: list,
+        state_updater: IStateUpdater = None,
+    ):
+        self._market_makers = market_makers
+        self._state_updater = state_updater
+
+        self._logger = getLogger(__class__.__name__)
+
+    async def execute(self):
+        if self._state_updater is not None:
+            with STAGE_SECONDS.labels("state_update").time():
+                await self._state_updater.update()
+
+        # a failing market does not cancel the others mid-burst
+        results = await asyncio.gather(
+            *[market_maker.execute() for market_maker in self._market_makers],
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for error in errors:
+            self._logger.error(error)
+        if len(errors) > 0:
+            raise errors[0]
+
+
+def _is_close(a: float, b: float, abs_tol: float) -> bool:
+    # rel_tol absorbs the rounding of the priceX96 / base round trip on chain
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=abs_tol)
+
+
+def _new_closed_bar_indices(ts: np.ndarray, last_closed_ts) -> range:
+    # all bars except the last (forming) one that are newer than last_closed_ts
+    start = (
+        0 if last_closed_ts is None else np.searchsorted(ts, last_closed_ts, "right")
+    )
+    return range(start, len(ts) - 1)
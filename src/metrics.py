@@ -0,0 +1,68 @@
+from prometheus_client import Counter, Histogram, start_http_server
+
+# price/size calcs take microseconds, receipts take seconds
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "mm_stage_seconds",
+    "time spent in a stage of the trading cycle",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+RPC_SECONDS = Histogram(
+    "mm_rpc_seconds",
+    "JSON-RPC request latency",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+RETRIES = Counter(
+    "mm_retries_total",
+    "retried or fallen back operations",
+    ["reason"],
+)
+NONCE_ERRORS = Counter(
+    "mm_nonce_errors_total",
+    "nonce too low errors",
+)
+CANCEL_SKIPS = Counter(
+    "mm_cancel_skips_total",
+    "cancelLimitOrder skipped because the order is gone",
+    ["reason"],
+)
+
+
+def start_metrics_server(port: int):
+    """serve /metrics on a daemon thread"""
+    start_http_server(port)
+
+
+def rpc_metrics_middleware(make_request, w3):
+    def middleware(method, params):
+        with RPC_SECONDS.labels(method).time():
+            return make_request(method, params)
+
+    return middleware
+
+
+async def async_rpc_metrics_middleware(make_request, w3):
+    async def middleware(method, params):
+        with RPC_SECONDS.labels(method).time():
+            return await make_request(method, params)
+
+    return middleware
@@ -0,0 +1,59 @@
+import numpy as np
+
+OHLCV_COLUMNS = ["timestamp", "op", "hi", "lo", "cl", "volume"]
+
+
+class OhlcvRingBuffer:
+    """Latest `capacity` bars in preallocated numpy arrays
+
+    Columns are stored as rows of one (6, 2 * capacity) array so that every
+    column is a contiguous slice. Bars are appended at the end and the
+    window start moves forward; the window is copied back to the front only
+    when the end of the buffer is reached, so appends are amortized O(1).
+
+    `arrays()` returns views that are valid until the next `update()`.
+    """
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._data = np.zeros((len(OHLCV_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def last_timestamp(self):
+        if len(self) == 0:
+            return None
+        return int(self._data[0, self._end - 1])
+
+    def update(self, bars):
+        """bars: iterable of [timestamp, op, hi, lo, cl, volume] in time order
+
+        A bar with the same timestamp as the last stored bar replaces it
+        (the still-forming bar), older bars are ignored.
+        """
+        for bar in bars:
+            last_timestamp = self.last_timestamp()
+            if last_timestamp is not None and bar[0] < last_timestamp:
+                continue
+            if last_timestamp is None or bar[0] > last_timestamp:
+                self._append_slot()
+            self._data[:, self._end - 1] = bar
+
+    def arrays(self) -> dict:
+        return {
+            column: self._data[i, self._start : self._end]
+            for i, column in enumerate(OHLCV_COLUMNS)
+        }
+
+    def _append_slot(self):
+        if self._end == self._data.shape[1]:
+            n = len(self)
+            self._data[:, :n] = self._data[:, self._start : self._end]
+            self._start = 0
+            self._end = n
+        self._end += 1
+        if len(self) > self._capacity:
+            self._start += 1
@@ -0,0 +1,213 @@
+import asyncio
+import glob
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+
+import pandas as pd
+import pyarrow as pa
+
+
+# column types of the recorded tables. every column is nullable, so a
+# failed read recorded as None does not break the table
+SCHEMAS = {
+    "quote": pa.schema(
+        [
+            ("timestamp", pa.float64()),
+            ("symbol", pa.string()),
+            ("mark_price", pa.float64()),
+            ("ask_price", pa.float64()),
+            ("bid_price", pa.float64()),
+            ("ask_size", pa.float64()),
+            ("bid_size", pa.float64()),
+        ]
+    ),
+    "snapshot": pa.schema(
+        [
+            ("timestamp", pa.float64()),
+            ("block_number", pa.int64()),
+            ("market", pa.string()),
+            ("mark_price", pa.float64()),
+            ("position", pa.float64()),
+        ]
+    ),
+    "tx": pa.schema(
+        [
+            ("timestamp", pa.float64()),
+            ("tx_hash", pa.string()),
+            ("status", pa.int64()),
+            ("block_number", pa.int64()),
+            ("gas_used", pa.int64()),
+            ("latency_sec", pa.float64()),
+            ("replacements", pa.int64()),
+        ]
+    ),
+    "tx_replacement": pa.schema(
+        [
+            ("timestamp", pa.float64()),
+            ("tx_hash", pa.string()),
+            ("replacement_tx_hash", pa.string()),
+            ("nonce", pa.int64()),
+            ("max_fee_per_gas", pa.int64()),
+            ("gas_price", pa.int64()),
+        ]
+    ),
+}
+
+
+@dataclass
+class RecorderConfig:
+    dirpath: str
+    flush_interval_sec: float = 1.0
+    # table -> pa.Schema. tables without one are fixed by their first rows
+    schemas: dict = field(default_factory=lambda: dict(SCHEMAS))
+
+
+class Recorder:
+    """Appends records to hourly Arrow IPC stream files
+
+    `record` only appends to an in-memory buffer. `run` (a Bot service)
+    hands the buffer to a worker thread every flush_interval_sec, so the
+    trading loop never waits on disk. Records of a table go to
+    {dirpath}/{table}/{YYYYmmddHH}_{started}_{n}.arrows by the UTC hour of
+    their timestamp. The stream format stays readable up to the last
+    complete batch if the process dies.
+    """
+
+    def __init__(self, config: RecorderConfig):
+        self._config = config
+        self._logger = getLogger(__class__.__name__)
+
+        self._started = int(time.time())
+        self._buffer: list = []
+        # table -> (hour, sink, writer, schema)
+        self._writers: dict = {}
+        # table -> schemas inferred from the first rows
+        self._inferred_schemas: dict = {}
+        # files opened so far, so that a reopened table gets a new file
+        self._file_count = 0
+        # (table, column) not in the schema, warned once
+        self._dropped_columns: set = set()
+        # a cancelled run() may still be writing on the worker thread
+        self._lock = threading.Lock()
+
+    def record(self, table: str, **values):
+        self._buffer.append((table, dict(timestamp=time.time(), **values)))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(self._config.flush_interval_sec)
+                records, self._buffer = self._buffer, []
+                if len(records) > 0:
+                    await loop.run_in_executor(None, self._write, records)
+        finally:
+            records, self._buffer = self._buffer, []
+            self._write(records)
+            self.close()
+
+    def close(self):
+        with self._lock:
+            for table in list(self._writers):
+                self._close_writer(table)
+
+    def _write(self, records: list):
+        # (table, hour) -> rows, in record order
+        groups: dict = {}
+        for table, row in records:
+            hour = time.strftime("%Y%m%d%H", time.gmtime(row["timestamp"]))
+            groups.setdefault((table, hour), []).append(row)
+
+        with self._lock:
+            for (table, hour), rows in groups.items():
+                try:
+                    writer, schema = self._get_writer(table, hour, rows)
+                    self._warn_dropped_columns(table, schema, rows)
+                    writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                except Exception as e:
+                    # drop this batch only. the next one starts a new file
+                    self._logger.error(
+                        "failed to record %s rows of table=%s e=%r",
+                        len(rows),
+                        table,
+                        e,
+                    )
+                    self._close_writer(table)
+                    self._inferred_schemas.pop(table, None)
+
+    def _get_writer(self, table: str, hour: str, rows: list) -> tuple:
+        if table in self._writers:
+            writer_hour, _, writer, schema = self._writers[table]
+            if writer_hour == hour:
+                return writer, schema
+            self._close_writer(table)
+
+        schema = self._schema(table, rows)
+        dirpath = os.path.join(self._config.dirpath, table)
+        os.makedirs(dirpath, exist_ok=True)
+        self._file_count += 1
+        filepath = os.path.join(
+            dirpath, f"{hour}_{self._started}_{self._file_count}.arrows"
+        )
+        sink = pa.OSFile(filepath, "wb")
+        writer = pa.ipc.new_stream(sink, schema)
+        self._writers[table] = (hour, sink, writer, schema)
+        self._logger.debug("recording table=%s to %s", table, filepath)
+        return writer, schema
+
+    def _schema(self, table: str, rows: list) -> pa.Schema:
+        schema = self._config.schemas.get(table)
+        if schema is None:
+            schema = self._inferred_schemas.get(table)
+        if schema is None:
+            schema = pa.RecordBatch.from_pylist(rows).schema
+            self._inferred_schemas[table] = schema
+        return schema
+
+    def _close_writer(self, table: str):
+        _, sink, writer, _ = self._writers.pop(table, (None, None, None, None))
+        for closable in [writer, sink]:
+            if closable is None:
+                continue
+            try:
+                closable.close()
+            except Exception as e:
+                self._logger.warning("failed to close table=%s e=%r", table, e)
+
+    def _warn_dropped_columns(self, table: str, schema: pa.Schema, rows: list):
+        for row in rows:
+            for column in row:
+                if (
+                    schema.get_field_index(column) < 0
+                    and (table, column) not in self._dropped_columns
+                ):
+                    self._dropped_columns.add((table, column))
+                    self._logger.warning(
+                        "column=%s is not in the schema of table=%s", column, table
+                    )
+
+
+def read_records(dirpath: str, table: str) -> pd.DataFrame:
+    """all records of a table written by Recorder, in time order"""
+    dfs = []
+    for filepath in sorted(glob.glob(os.path.join(dirpath, table, "*.arrows"))):
+        batches = []
+        with pa.OSFile(filepath, "rb") as source:
+            try:
+                for batch in pa.ipc.open_stream(source):
+                    batches.append(batch)
+            except pa.ArrowInvalid:
+                # truncated by a crash. keep the complete batches
+                pass
+        if len(batches) > 0:
+            dfs.append(pa.Table.from_batches(batches).to_pandas())
+    if len(dfs) == 0:
+        return pd.DataFrame()
+    return (
+        pd.concat(dfs, ignore_index=True)
+        .sort_values("timestamp", kind="stable")
+        .reset_index(drop=True)
+    )
@@ -1,39 +1,286 @@
 import os
+from dataclasses import dataclass
+
+import yaml
+from eth_account import Account
 
 from . import market_maker as mm
 from .bot import Bot, BotConfig
-from .contracts.utils import get_tx_options, get_w3
+from .contracts.multicall import MULTICALL3_ADDRESS
+from .contracts.fee_oracle import FeeOracle, FeeOracleConfig
+from .contracts.nonce_manager import NonceManager
+from .contracts.receipt_tracker import ReceiptTracker
+from .contracts.registry import ContractRegistry, ContractRegistryConfig
+from .contracts.tx_builder import TxBuilder
+from .contracts.utils import get_async_w3, get_tx_options, get_w3
+from .contracts.ws_subscriber import WebsocketSubscriber
 from .exchanges import binance, perpdex
+from .recorder import Recorder, RecorderConfig
+from .supervisor import Supervisor, SupervisorConfig
+
+
+@dataclass
+class MarketConfig:
+    market: str
+    inverse: bool = False
+    unit_lot_size: float = 0.01
+    price_diff: float = 1
+    quote_price_tolerance: float = 0.0
+    quote_size_tolerance: float = 0.0
+    # price levels per side. the sizes are split over the levels
+    ladder_levels: int = 1
+    ladder_spacing_rate: float = 0.001
+    ladder_size_decay: float = 1.0
+
+
+def load_market_configs() -> list:
+    """per-market configs from PERPDEX_MARKETS_CONFIG (yaml) or env vars
+
+    PERPDEX_MARKETS_CONFIG file format:
+        markets:
+          - market: USD
+            inverse: true
+            unit_lot_size: 10
+          - market: BTC
+            ...
+    """
+    config_filepath = os.getenv("PERPDEX_MARKETS_CONFIG")
+    if config_filepath is None:
+        return [
+            MarketConfig(
+                market=os.getenv("PERPDEX_MARKET", "ETH"),
+                inverse=bool(os.getenv("PERPDEX_MARKET_INVERSE", 0)),
+                unit_lot_size=float(os.getenv("UNIT_LOT_SIZE", "0.01")),
+                quote_price_tolerance=float(os.getenv("QUOTE_PRICE_TOLERANCE", "0")),
+                quote_size_tolerance=float(os.getenv("QUOTE_SIZE_TOLERANCE", "0")),
+                ladder_levels=int(os.getenv("LADDER_LEVELS", "1")),
+                ladder_spacing_rate=float(os.getenv("LADDER_SPACING_RATE", "0.001")),
+                ladder_size_decay=float(os.getenv("LADDER_SIZE_DECAY", "1")),
+            )
+        ]
+
+    with open(config_filepath, encoding="UTF-8") as f:
+        y = yaml.safe_load(f.read())
+    return [MarketConfig(**market) for market in y["markets"]]
+
 
+def load_web3_provider_uris() -> tuple:
+    """(sync, async, websocket) provider uris from env vars
+
+    WEB3_PROVIDER_URI: http(s) or wss uri of the sync provider
+    WEB3_HTTP_PROVIDER_URI: http(s) uri of the async provider (several comma
+        separated uris for a provider pool). defaults to WEB3_PROVIDER_URI
+    WEB3_WS_PROVIDER_URI: wss uri for event-driven requoting. defaults to
+        WEB3_PROVIDER_URI if it is a wss uri, None otherwise
+    """
+    web3_provider_uri = os.environ["WEB3_PROVIDER_URI"]
+    is_ws = web3_provider_uri.startswith("wss://")
+
+    web3_http_provider_uri = os.getenv("WEB3_HTTP_PROVIDER_URI")
+    if web3_http_provider_uri is None:
+        if is_ws:
+            raise ValueError(
+                "WEB3_HTTP_PROVIDER_URI (http(s) uri) is required"
+                " when WEB3_PROVIDER_URI is a websocket uri"
+            )
+        web3_http_provider_uri = web3_provider_uri
+    for uri in web3_http_provider_uri.split(","):
+        if not uri.startswith("http"):
+            raise ValueError(
+                "WEB3_HTTP_PROVIDER_URI must be http(s) uris: {}".format(uri)
+            )
+
+    web3_ws_provider_uri = os.getenv("WEB3_WS_PROVIDER_URI")
+    if web3_ws_provider_uri is None and is_ws:
+        web3_ws_provider_uri = web3_provider_uri
+    return web3_provider_uri, web3_http_provider_uri, web3_ws_provider_uri
+
+
+def create_market_maker_bot(max_restarts: int = None) -> Bot:
+    """max_restarts: restarts of a failed bot loop. None for no limit"""
+    (
+        web3_provider_uri,
+        web3_http_provider_uri,
+        web3_ws_provider_uri,
+    ) = load_web3_provider_uris()
 
-def create_market_maker_bot() -> Bot:
     # setup perpdex contract infos
     web3_network_name = os.environ["WEB3_NETWORK_NAME"]
     _w3 = get_w3(
         network_name=web3_network_name,
-        web3_provider_uri=os.environ["WEB3_PROVIDER_URI"],
+        web3_provider_uri=web3_provider_uri,
+        user_private_key=os.environ["USER_PRIVATE_KEY"],
+    )
+    _async_w3 = get_async_w3(
+        network_name=web3_network_name,
+        web3_provider_uri=web3_http_provider_uri,
         user_private_key=os.environ["USER_PRIVATE_KEY"],
     )
-    perpdex_market_name = os.getenv("PERPDEX_MARKET", "ETH")
-    perpdex_is_inverse = bool(os.getenv("PERPDEX_MARKET_INVERSE", 0))
+    market_configs = load_market_configs()
     abi_json_dirpath = os.getenv(
         "PERPDEX_CONTRACT_ABI_JSON_DIRPATH",
         "/app/deps/perpdex-contract/deployments/" + web3_network_name,
     )
-    _market_contract_filepath = os.path.join(
-        abi_json_dirpath, "PerpdexMarket{}.json".format(perpdex_market_name)
-    )
+    _market_contract_filepaths = [
+        os.path.join(
+            abi_json_dirpath, "PerpdexMarket{}.json".format(market_config.market)
+        )
+        for market_config in market_configs
+    ]
     _exchange_contract_filepath = os.path.join(abi_json_dirpath, "PerpdexExchange.json")
+    # contract objects and immutable metadata (symbols) shared by all
+    # components. the index file saves the metadata RPCs on restart. it is
+    # kept out of the (possibly read-only) deployments submodule.
+    # CONTRACT_REGISTRY_INDEX_FILEPATH= (empty) keeps it in memory only
+    registry_index_filepath = os.getenv(
+        "CONTRACT_REGISTRY_INDEX_FILEPATH",
+        os.path.join(
+            ".cache", "contract_registry_index_{}.json".format(web3_network_name)
+        ),
+    )
+    registry = ContractRegistry(
+        _w3,
+        ContractRegistryConfig(index_filepath=registry_index_filepath or None),
+    )
     tx_options = get_tx_options(web3_network_name)
+    multicall_address = os.getenv("MULTICALL3_ADDRESS", MULTICALL3_ADDRESS)
 
-    # init dependencies
-    perpdex_pos_getter = perpdex.PerpdexPositionGetter(
+    # requote on mark price change or fill when a websocket endpoint is given
+    subscriber = (
+        None
+        if web3_ws_provider_uri is None
+        else WebsocketSubscriber(web3_ws_provider_uri)
+    )
+
+    trigger = None
+    if subscriber is not None:
+        trigger = perpdex.PerpdexRequoteTrigger(
+            w3=_w3,
+            async_w3=_async_w3,
+            subscriber=subscriber,
+            config=perpdex.PerpdexRequoteTriggerConfig(
+                market_contract_abi_json_filepaths=_market_contract_filepaths,
+                exchange_contract_abi_json_filepath=_exchange_contract_filepath,
+                # relative change rate is (almost) the same for inverse prices
+                inverse=market_configs[0].inverse,
+                mark_price_change_rate=float(
+                    os.getenv("REQUOTE_MARK_PRICE_CHANGE_RATE", "0.001")
+                ),
+            ),
+            registry=registry,
+        )
+
+    # init dependencies shared by all markets
+    recorder_dirpath = os.getenv("RECORDER_DIRPATH")
+    recorder = (
+        None
+        if recorder_dirpath is None
+        else Recorder(config=RecorderConfig(dirpath=recorder_dirpath))
+    )
+    receipt_tracker = ReceiptTracker(_async_w3)
+    # orderers find it through the snapshot
+    open_orders = perpdex.PerpdexOpenOrders(
         w3=_w3,
-        config=perpdex.PerpdexPositionGetterConfig(
-            market_contract_abi_json_filepath=_market_contract_filepath,
+        async_w3=_async_w3,
+        config=perpdex.PerpdexOpenOrdersConfig(
+            market_contract_abi_json_filepaths=_market_contract_filepaths,
+            exchange_contract_abi_json_filepath=_exchange_contract_filepath,
+        ),
+        receipt_tracker=receipt_tracker,
+        subscriber=subscriber,
+        registry=registry,
+    )
+    perpdex_snapshot = perpdex.PerpdexStateSnapshot(
+        w3=_w3,
+        async_w3=_async_w3,
+        config=perpdex.PerpdexStateSnapshotConfig(
+            market_contract_abi_json_filepaths=_market_contract_filepaths,
             exchange_contract_abi_json_filepath=_exchange_contract_filepath,
-            inverse=perpdex_is_inverse,
+            # set MULTICALL3_ADDRESS= (empty) on chains without Multicall3
+            multicall_address=multicall_address or None,
         ),
+        recorder=recorder,
+        open_orders=open_orders,
+        registry=registry,
+        # pins reads without multicall to the newHeads block of the trigger
+        block_number_getter=None if trigger is None else lambda: trigger.block_number,
+    )
+    nonce_manager = NonceManager(_async_w3, _async_w3.eth.default_account)
+    # USE_FEE_ORACLE=0 keeps the static fees of tx_options
+    fee_oracle = (
+        FeeOracle(_async_w3, FeeOracleConfig())
+        if bool(int(os.getenv("USE_FEE_ORACLE", "1")))
+        else None
+    )
+    # USE_TX_BUILDER=0 signs with the middleware (chain id, gas and gas price
+    # are read before each send)
+    tx_builder = (
+        TxBuilder(_async_w3, Account.from_key(os.environ["USER_PRIVATE_KEY"]))
+        if bool(int(os.getenv("USE_TX_BUILDER", "1")))
+        else None
+    )
+
+    # init mm
+    market_maker = mm.MultiMarketMaker(
+        market_makers=[
+            _create_market_maker(
+                w3=_w3,
+                async_w3=_async_w3,
+                market_config=market_config,
+                market_contract_filepath=market_contract_filepath,
+                exchange_contract_filepath=_exchange_contract_filepath,
+                tx_options=tx_options,
+                snapshot=perpdex_snapshot,
+                nonce_manager=nonce_manager,
+                fee_oracle=fee_oracle,
+                receipt_tracker=receipt_tracker,
+                registry=registry,
+                tx_builder=tx_builder,
+                recorder=recorder,
+            )
+            for market_config, market_contract_filepath in zip(
+                market_configs, _market_contract_filepaths
+            )
+        ],
+        state_updater=perpdex_snapshot,
+    )
+
+    return Bot(
+        market_maker=market_maker,
+        config=BotConfig(
+            trade_loop_sec=60,
+            balance_loop_sec=60.0,
+        ),
+        trigger=trigger,
+        services=[] if recorder is None else [recorder],
+        supervisor=Supervisor(config=SupervisorConfig(max_restarts=max_restarts)),
+    )
+
+
+def _create_market_maker(
+    w3,
+    async_w3,
+    market_config: MarketConfig,
+    market_contract_filepath: str,
+    exchange_contract_filepath: str,
+    tx_options: dict,
+    snapshot: perpdex.PerpdexStateSnapshot,
+    nonce_manager: NonceManager,
+    fee_oracle: FeeOracle,
+    receipt_tracker: ReceiptTracker,
+    registry: ContractRegistry,
+    tx_builder: TxBuilder,
+    recorder: Recorder,
+) -> mm.MarketMaker:
+    perpdex_pos_getter = perpdex.PerpdexPositionGetter(
+        w3=w3,
+        config=perpdex.PerpdexPositionGetterConfig(
+            market_contract_abi_json_filepath=market_contract_filepath,
+            exchange_contract_abi_json_filepath=exchange_contract_filepath,
+            inverse=market_config.inverse,
+        ),
+        snapshot=snapshot,
+        registry=registry,
     )
     # binance_exchange = ccxt.binance({"options": {"defaultType": "spot"}})
     # binance_ohlcv_getter = binance.BinanceRestOhlcv(
@@ -41,27 +288,46 @@ def create_market_maker_bot() -> Bot:
     #     symbol=os.getenv("BINANCE_SPOT_SYMBOL", "ETH/USDT"),
     #     timeframe="1m",
     # )
+    # # streaming alternative (add to Bot services)
+    # binance_ohlcv_getter = binance.BinanceWebsocketFeed(
+    #     rest_ohlcv=binance_ohlcv_getter,
+    #     config=binance.BinanceWebsocketFeedConfig(
+    #         symbol=os.getenv("BINANCE_SPOT_SYMBOL", "ETH/USDT").replace("/", ""),
+    #         interval="1m",
+    #     ),
+    # )
+    # orderers of all markets share one nonce sequence of the account and
+    # one receipt polling loop
     perpdex_maker = perpdex.PerpdexOrderer(
-        w3=_w3,
+        w3=w3,
+        async_w3=async_w3,
         config=perpdex.PerpdexOrdererConfig(
-            market_contract_abi_json_filepaths=[_market_contract_filepath],
-            exchange_contract_abi_json_filepath=_exchange_contract_filepath,
-            inverse=perpdex_is_inverse,
+            market_contract_abi_json_filepaths=[market_contract_filepath],
+            exchange_contract_abi_json_filepath=exchange_contract_filepath,
+            inverse=market_config.inverse,
             tx_options=tx_options,
         ),
+        nonce_manager=nonce_manager,
+        snapshot=snapshot,
+        recorder=recorder,
+        fee_oracle=fee_oracle,
+        receipt_tracker=receipt_tracker,
+        registry=registry,
+        tx_builder=tx_builder,
     )
 
     perpdex_ticker = perpdex.PerpdexContractTicker(
-        w3=_w3,
+        w3=w3,
         config=perpdex.PerpdexContractTickerConfig(
-            market_contract_abi_json_filepath=_market_contract_filepath,
+            market_contract_abi_json_filepath=market_contract_filepath,
             update_limit_sec=0.5,
-            inverse=perpdex_is_inverse,
+            inverse=market_config.inverse,
         ),
+        snapshot=snapshot,
+        registry=registry,
     )
 
-    # init mm
-    market_maker = mm.MarketMaker(
+    return mm.MarketMaker(
         # make_price_calculator=mm.NormMakePriceCalculator(
         #     ohlcv_getter=binance_ohlcv_getter,
         #     config=mm.NormMakePriceCalculatorConfig(
@@ -72,26 +338,35 @@ def create_market_maker_bot() -> Bot:
         make_price_calculator=mm.SimpleMakePriceCalculator(
             ticker=perpdex_ticker,
             config=mm.SimpleMakePriceCalculatorConfig(
-                diff=1,
+                diff=market_config.price_diff,
             ),
         ),
         make_size_calculator=mm.SimpleMakeSizeCalculator(
             position_getter=perpdex_pos_getter,
             config=mm.SimpleMakeSizeCalculatorConfig(
-                unit_lot_size=float(os.getenv("UNIT_LOT_SIZE", "0.01")),
+                unit_lot_size=market_config.unit_lot_size,
             ),
         ),
         maker=perpdex_maker,
         price_getter=perpdex_ticker,
         config=mm.MarketMakerConfig(
-            symbol=perpdex_market_name,
-            inverse=perpdex_is_inverse,
+            symbol=market_config.market,
+            inverse=market_config.inverse,
         ),
-    )
-    return Bot(
-        market_maker=market_maker,
-        config=BotConfig(
-            trade_loop_sec=60,
-            balance_loop_sec=60.0,
+        quote_reconciler=mm.QuoteReconciler(
+            config=mm.QuoteReconcilerConfig(
+                price_tolerance=market_config.quote_price_tolerance,
+                size_tolerance=market_config.quote_size_tolerance,
+            ),
+        ),
+        recorder=recorder,
+        quote_ladder=None
+        if market_config.ladder_levels <= 1
+        else mm.QuoteLadder(
+            config=mm.QuoteLadderConfig(
+                levels=market_config.ladder_levels,
+                spacing_rate=market_config.ladder_spacing_rate,
+                size_decay=market_config.ladder_size_decay,
+            )
         ),
     )
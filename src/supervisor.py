@@ -0,0 +1,126 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Callable, Optional
+
+from .metrics import RETRIES
+
+
+@dataclass
+class SupervisorConfig:
+    # delay of the first restart. doubled (backoff_multiplier) per failure
+    initial_backoff_sec: float = 0.01
+    backoff_multiplier: float = 2.0
+    max_backoff_sec: float = 30.0
+    # a component that ran this long restarts with initial_backoff_sec again
+    # and its restart count starts over
+    reset_after_sec: float = 60.0
+    # consecutive restarts of a component (each ended within reset_after_sec)
+    # until the supervisor gives up. None for no limit
+    max_restarts: Optional[int] = None
+
+
+@dataclass
+class _Component:
+    name: str
+    factory: Callable
+    task: Optional[asyncio.Task] = None
+    started_at: float = 0.0
+    failures: int = 0
+    restarts: int = 0
+    restart_handle: Optional[asyncio.TimerHandle] = None
+
+
+class Supervisor:
+    """Runs long-lived coroutines and restarts the ones that end
+
+    A component is a coroutine function meant to run forever. Its task is
+    watched with a done-callback, so a crash is noticed at once and only
+    that component is restarted (with exponential backoff), while objects
+    shared with the others (providers, contracts, open orders, nonces) stay
+    as they are.
+    """
+
+    def __init__(self, config: SupervisorConfig = None):
+        self._config = config or SupervisorConfig()
+        self._logger = getLogger(__class__.__name__)
+
+        self._components: dict = {}  # name -> _Component
+        self._stopping = False
+        self._gave_up = asyncio.Event()
+
+    def start(self, name: str, factory: Callable):
+        """run `factory()` as component `name`"""
+        component = _Component(name=name, factory=factory)
+        self._components[name] = component
+        self._start(component)
+
+    def health_check(self) -> bool:
+        return not self._stopping and not self._gave_up.is_set()
+
+    async def wait(self):
+        """wait until a component crashes more than max_restarts times in a row"""
+        await self._gave_up.wait()
+
+    async def stop(self):
+        self._stopping = True
+        for component in self._components.values():
+            if component.restart_handle is not None:
+                component.restart_handle.cancel()
+            task = component.task
+            if task is None or task.done():
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                self._logger.debug("%s raised on stop e=%r", component.name, e)
+            self._logger.debug("stopped %s", component.name)
+
+    def _start(self, component: _Component):
+        component.restart_handle = None
+        component.started_at = time.monotonic()
+        component.task = asyncio.create_task(component.factory())
+        component.task.add_done_callback(lambda task: self._on_done(component, task))
+
+    def _on_done(self, component: _Component, task: asyncio.Task):
+        if self._stopping or task is not component.task:
+            return
+
+        error = None if task.cancelled() else task.exception()
+        self._logger.error(
+            "%s ended error=%r",
+            component.name,
+            error,
+            exc_info=error,
+        )
+
+        if time.monotonic() - component.started_at >= self._config.reset_after_sec:
+            # ran healthy. only consecutive crashes count
+            component.failures = 0
+            component.restarts = 0
+        component.failures += 1
+        max_restarts = self._config.max_restarts
+        if max_restarts is not None and component.restarts >= max_restarts:
+            self._logger.error(
+                "%s gave up after max_restarts=%s", component.name, max_restarts
+            )
+            self._gave_up.set()
+            return
+
+        backoff_sec = min(
+            self._config.initial_backoff_sec
+            * self._config.backoff_multiplier ** (component.failures - 1),
+            self._config.max_backoff_sec,
+        )
+        self._logger.warning(
+            "restarting %s in backoff_sec=%s", component.name, backoff_sec
+        )
+        component.restarts += 1
+        RETRIES.labels("restart_" + component.name).inc()
+        component.restart_handle = asyncio.get_running_loop().call_later(
+            backoff_sec, self._start, component
+        )
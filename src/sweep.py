@@ -0,0 +1,179 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from logging import getLogger
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from . import market_maker as mm
+from .backtest import Backtester, BacktestConfig, ReplayFeed, SimulatedExchange
+from .ohlcv import OHLCV_COLUMNS
+
+PRICE_CALCULATORS = {
+    "simple": (mm.SimpleMakePriceCalculator, mm.SimpleMakePriceCalculatorConfig),
+    "norm": (mm.NormMakePriceCalculator, mm.NormMakePriceCalculatorConfig),
+    "atr": (mm.ATRMakePriceCalculator, mm.ATRMakePriceCalculatorConfig),
+}
+
+
+@dataclass
+class SweepConfig:
+    """grid of calculator configs, e.g. (yaml)
+
+    price_calculator: norm
+    price_params:
+      timeperiod: [50, 100, 200]
+      diff_k: [0.1, 0.2, 0.5]
+    size_params:
+      unit_lot_size: [0.01, 0.1]
+    samples: 20  # random search over the grid. omit for the full grid
+    """
+
+    price_calculator: str = "norm"
+    price_params: dict = field(default_factory=dict)
+    size_params: dict = field(default_factory=dict)
+    inverse: bool = True
+    maker_fee_rate: float = 0.0
+    samples: Optional[int] = None
+    seed: int = 0
+
+
+def load_sweep_config(filepath: str) -> SweepConfig:
+    with open(filepath, encoding="UTF-8") as f:
+        return SweepConfig(**yaml.safe_load(f.read()))
+
+
+def load_ohlcv(filepath: str) -> dict:
+    """recorded bars (csv or parquet) with OHLCV_COLUMNS"""
+    if filepath.endswith(".parquet"):
+        df = pd.read_parquet(filepath, columns=OHLCV_COLUMNS)
+    else:
+        df = pd.read_csv(filepath, usecols=OHLCV_COLUMNS)
+    return {column: df[column].to_numpy(dtype=np.float64) for column in OHLCV_COLUMNS}
+
+
+def param_sets(config: SweepConfig) -> list:
+    """list of (price_params, size_params) dicts"""
+    price_names = list(config.price_params.keys())
+    size_names = list(config.size_params.keys())
+    grid = list(
+        itertools.product(*config.price_params.values(), *config.size_params.values())
+    )
+    if config.samples is not None and config.samples < len(grid):
+        grid = random.Random(config.seed).sample(grid, config.samples)
+    return [
+        (
+            dict(zip(price_names, values[: len(price_names)])),
+            dict(zip(size_names, values[len(price_names) :])),
+        )
+        for values in grid
+    ]
+
+
+def run_sweep(ohlcv: dict, config: SweepConfig, workers: int = None) -> pd.DataFrame:
+    """backtest every param set in a process pool, ranked by pnl
+
+    Bars are copied once into shared memory; tasks carry only the params.
+    """
+    logger = getLogger(__name__)
+    workers = workers or os.cpu_count()
+    data = np.stack([ohlcv[column] for column in OHLCV_COLUMNS]).astype(np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=data.nbytes)
+    try:
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+        params = param_sets(config)
+        logger.info("sweep %s param sets", len(params))
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(shm.name, data.shape, config),
+        ) as executor:
+            rows = list(
+                executor.map(
+                    _run_one,
+                    params,
+                    chunksize=max(1, len(params) // (4 * workers)),
+                )
+            )
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return (
+        pd.DataFrame(rows)
+        .sort_values("pnl", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+# per worker process state set by _init_worker
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_ohlcv: dict = {}
+_worker_config: Optional[SweepConfig] = None
+
+
+def _init_worker(shm_name: str, shape: tuple, config: SweepConfig):
+    global _worker_shm, _worker_ohlcv, _worker_config
+    # silence the debug logs of millions of simulated cycles
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # attached, not copied. the parent unlinks the segment
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_ohlcv = {column: data[i] for i, column in enumerate(OHLCV_COLUMNS)}
+    _worker_config = config
+
+
+def _run_one(params: tuple) -> dict:
+    price_params, size_params = params
+    result = asyncio.run(
+        _backtest(_worker_ohlcv, _worker_config, price_params, size_params)
+    )
+    return dict(
+        **{f"price.{k}": v for k, v in price_params.items()},
+        **{f"size.{k}": v for k, v in size_params.items()},
+        **result.summary(),
+    )
+
+
+async def _backtest(
+    ohlcv: dict, config: SweepConfig, price_params: dict, size_params: dict
+):
+    feed = ReplayFeed(ohlcv)
+    exchange = SimulatedExchange(maker_fee_rate=config.maker_fee_rate)
+    calculator_class, calculator_config_class = PRICE_CALCULATORS[
+        config.price_calculator
+    ]
+    calculator_config = calculator_config_class(**price_params)
+    if config.price_calculator == "simple":
+        make_price_calculator = calculator_class(ticker=feed, config=calculator_config)
+    else:
+        make_price_calculator = calculator_class(
+            ohlcv_getter=feed, config=calculator_config
+        )
+    market_maker = mm.MarketMaker(
+        make_price_calculator=make_price_calculator,
+        make_size_calculator=mm.SimpleMakeSizeCalculator(
+            position_getter=exchange,
+            config=mm.SimpleMakeSizeCalculatorConfig(**size_params),
+        ),
+        maker=exchange,
+        price_getter=feed,
+        config=mm.MarketMakerConfig(symbol="SWEEP", inverse=config.inverse),
+        quote_reconciler=mm.QuoteReconciler(mm.QuoteReconcilerConfig()),
+    )
+    # indicators need timeperiod closed bars before they quote
+    warmup_bars = price_params.get("timeperiod", 0) + 1
+    return await Backtester(
+        feed=feed,
+        exchange=exchange,
+        config=BacktestConfig(warmup_bars=warmup_bars),
+    ).run(market_maker)
@@ -0,0 +1,291 @@
+import itertools
+
+import pytest
+import rlp
+from eth_abi import encode_abi
+from eth_account import Account
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncBaseProvider
+
+from src import market_maker as mm
+from src.contracts.multicall import MULTICALL3_ABI, MULTICALL3_ADDRESS
+from src.contracts.receipt_tracker import ReceiptTracker
+from src.contracts.tx_builder import TxBuilder
+from src.exchanges import perpdex
+from tests.perpdex_fakes import (
+    EXCHANGE_ABI,
+    EXCHANGE_ADDRESS,
+    MARKET_ABI,
+    MARKET_ADDRESS,
+    MULTICALL_ABI,
+    ORDER_EVENT_ABI,
+    VIEW_ABI,
+    FakeSyncProvider,
+    write_abi_json_filepaths,
+)
+
+Q96 = perpdex.Q96
+# orders, multicall, snapshot reads and order events
+LOCAL_CHAIN_EXCHANGE_ABI = EXCHANGE_ABI + [MULTICALL_ABI] + VIEW_ABI + ORDER_EVENT_ABI
+
+# PerpdexExchange storage writes dominate the gas of an order. a flat
+# estimate per order keeps the calldata part comparable between changes
+ORDER_GAS = 50000
+
+
+def _intrinsic_gas(data: bytes) -> int:
+    return 21000 + sum(16 if b else 4 for b in data)
+
+
+class LocalChain(AsyncBaseProvider):
+    """In-process stand-in of a dev node with the perpdex contracts
+
+    Serves the JSON-RPC methods the bot uses and keeps the order book of
+    the account, so that quotes, cancels and LimitOrderCreated logs behave
+    like on chain. Counts requests by method.
+    """
+
+    def __init__(self, trader: str):
+        self.trader = trader
+        # 1000 as inverse price
+        self.mark_price_x96 = Q96 // 1000
+        self.rpc_counts: dict = {}
+        # contract function -> count of reads, also inside multicalls
+        self.call_counts: dict = {}
+        self.gas_used = 0
+        self.tx_count = 0
+
+        self._w3 = Web3()
+        self._exchange = self._w3.eth.contract(
+            address=EXCHANGE_ADDRESS, abi=LOCAL_CHAIN_EXCHANGE_ABI
+        )
+        self._market = self._w3.eth.contract(address=MARKET_ADDRESS, abi=MARKET_ABI)
+        self._multicall3 = self._w3.eth.contract(
+            address=Web3.toChecksumAddress(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI
+        )
+        self._order_ids = itertools.count(1)
+        # isBid -> [orderId]
+        self._orders = {False: [], True: []}
+        self._receipts: dict = {}
+        self._block_number = 1
+
+    async def make_request(self, method, params):
+        self.rpc_counts[method] = self.rpc_counts.get(method, 0) + 1
+        if method == "eth_call":
+            result = "0x" + self._call(params[0]).hex()
+        elif method == "eth_sendTransaction":
+            result = self._send_transaction(params[0])
+        elif method == "eth_sendRawTransaction":
+            # legacy tx: nonce, gasPrice, gas, to, value, data, v, r, s
+            data = rlp.decode(bytes.fromhex(params[0][2:]))[5]
+            result = self._send_transaction({"data": "0x" + data.hex()})
+        elif method == "eth_getTransactionReceipt":
+            result = self._receipts[params[0]]
+        elif method == "eth_estimateGas":
+            data = bytes.fromhex(params[0]["data"][2:])
+            result = hex(_intrinsic_gas(data) + ORDER_GAS)
+        else:
+            result = {
+                "eth_chainId": "0x7a69",
+                "eth_blockNumber": hex(self._block_number),
+                "eth_gasPrice": "0x1",
+                "eth_getTransactionCount": hex(self.tx_count),
+            }[method]
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    def _call(self, tx: dict) -> bytes:
+        data = bytes.fromhex(tx["data"][2:])
+        to = Web3.toChecksumAddress(tx["to"])
+        if to == self._multicall3.address:
+            func, args = self._multicall3.decode_function_input(data)
+            if func.fn_name == "getBlockNumber":
+                return encode_abi(["uint256"], [self._block_number])
+            return encode_abi(
+                ["(bool,bytes)[]"],
+                [
+                    [
+                        (True, self._call({"to": target, "data": "0x" + call.hex()}))
+                        for target, _, call in args["calls"]
+                    ]
+                ],
+            )
+
+        contract = self._exchange if to == EXCHANGE_ADDRESS else self._market
+        func, args = contract.decode_function_input(data)
+        self.call_counts[func.fn_name] = self.call_counts.get(func.fn_name, 0) + 1
+        if func.fn_name == "getLimitOrderIds":
+            return encode_abi(["uint40[]"], [self._orders[args["isBid"]]])
+        return encode_abi(
+            [o["type"] for o in func.abi["outputs"]],
+            [
+                {
+                    "symbol": "ETH",
+                    "getMarkPriceX96": self.mark_price_x96,
+                    "getShareMarkPriceX96": self.mark_price_x96,
+                    "getPositionShare": 0,
+                    "getTotalAccountValue": 10**21,
+                }[func.fn_name]
+            ],
+        )
+
+    def _send_transaction(self, tx: dict) -> str:
+        data = bytes.fromhex(tx["data"][2:])
+        func, args = self._exchange.decode_function_input(data)
+        calls = args["data"] if func.fn_name == "multicall" else [data]
+
+        logs = []
+        for call in calls:
+            func, args = self._exchange.decode_function_input(call)
+            # structs are decoded as tuples
+            components = func.abi["inputs"][0]["components"]
+            params = dict(zip([c["name"] for c in components], args["params"]))
+            if func.fn_name == "cancelLimitOrder":
+                self._orders[params["isBid"]].remove(params["orderId"])
+                logs.append(self._limit_order_canceled_log(params, len(logs)))
+                continue
+            order_id = next(self._order_ids)
+            self._orders[params["isBid"]].append(order_id)
+            logs.append(self._limit_order_created_log(params, order_id, len(logs)))
+
+        self._block_number += 1
+        self.tx_count += 1
+        gas_used = _intrinsic_gas(data) + ORDER_GAS * len(calls)
+        self.gas_used += gas_used
+        tx_hash = "0x" + self.tx_count.to_bytes(32, "big").hex()
+        self._receipts[tx_hash] = {
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "blockHash": "0x" + self._block_number.to_bytes(32, "big").hex(),
+            "blockNumber": hex(self._block_number),
+            "from": self.trader,
+            "to": EXCHANGE_ADDRESS,
+            "status": "0x1",
+            "gasUsed": hex(gas_used),
+            "cumulativeGasUsed": hex(gas_used),
+            "effectiveGasPrice": "0x1",
+            "contractAddress": None,
+            "logs": [dict(log, transactionHash=tx_hash) for log in logs],
+            "logsBloom": "0x" + "00" * 256,
+        }
+        return tx_hash
+
+    def _limit_order_created_log(self, params: dict, order_id: int, index: int):
+        return self._log(
+            "LimitOrderCreated",
+            [self.trader, params["market"]],
+            ["bool", "uint256", "uint256", "uint8", "uint256"],
+            [params["isBid"], params["base"], params["priceX96"], 0, order_id],
+            index,
+        )
+
+    def _limit_order_canceled_log(self, params: dict, index: int):
+        return self._log(
+            "LimitOrderCanceled",
+            [self.trader, params["market"], "0x" + "00" * 20],
+            ["bool", "uint256"],
+            [params["isBid"], params["orderId"]],
+            index,
+        )
+
+    def _log(self, name, indexed_addresses, types, values, index):
+        event_abi = self._exchange.events[name]().abi
+        return {
+            "address": EXCHANGE_ADDRESS,
+            "topics": ["0x" + event_abi_to_log_topic(event_abi).hex()]
+            + [
+                "0x" + encode_abi(["address"], [address]).hex()
+                for address in indexed_addresses
+            ],
+            "data": "0x" + encode_abi(types, values).hex(),
+            "blockNumber": hex(self._block_number),
+            "blockHash": "0x" + self._block_number.to_bytes(32, "big").hex(),
+            "transactionIndex": "0x0",
+            "logIndex": hex(index),
+            "removed": False,
+        }
+
+
+@pytest.fixture
+def local_chain_market_maker(tmp_path, request):
+    """(MarketMaker, LocalChain) wired like resolver.create_market_maker_bot
+
+    Parametrize indirectly with the number of ladder levels (default 1).
+    """
+    ladder_levels = getattr(request, "param", 1)
+    market_filepath, exchange_filepath = write_abi_json_filepaths(
+        tmp_path, LOCAL_CHAIN_EXCHANGE_ABI
+    )
+
+    account = Account.create()
+    chain = LocalChain(trader=account.address)
+    async_w3 = Web3(chain, modules={"eth": (AsyncEth,)}, middlewares=[])
+    async_w3.eth.default_account = account.address
+    w3 = Web3(FakeSyncProvider())
+    w3.eth.default_account = account.address
+
+    receipt_tracker = ReceiptTracker(async_w3)
+    snapshot = perpdex.PerpdexStateSnapshot(
+        w3=w3,
+        async_w3=async_w3,
+        config=perpdex.PerpdexStateSnapshotConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+        ),
+        open_orders=perpdex.PerpdexOpenOrders(
+            w3=w3,
+            async_w3=async_w3,
+            config=perpdex.PerpdexOpenOrdersConfig(
+                market_contract_abi_json_filepaths=[market_filepath],
+                exchange_contract_abi_json_filepath=exchange_filepath,
+            ),
+            receipt_tracker=receipt_tracker,
+        ),
+    )
+    ticker = perpdex.PerpdexContractTicker(
+        w3=w3,
+        config=perpdex.PerpdexContractTickerConfig(
+            market_contract_abi_json_filepath=market_filepath, inverse=True
+        ),
+        snapshot=snapshot,
+    )
+    market_maker = mm.MarketMaker(
+        make_price_calculator=mm.SimpleMakePriceCalculator(
+            ticker=ticker,
+            config=mm.SimpleMakePriceCalculatorConfig(diff=1),
+        ),
+        make_size_calculator=mm.SimpleMakeSizeCalculator(
+            position_getter=perpdex.PerpdexPositionGetter(
+                w3=w3,
+                config=perpdex.PerpdexPositionGetterConfig(
+                    market_contract_abi_json_filepath=market_filepath,
+                    exchange_contract_abi_json_filepath=exchange_filepath,
+                    inverse=True,
+                ),
+                snapshot=snapshot,
+            ),
+            config=mm.SimpleMakeSizeCalculatorConfig(unit_lot_size=0.01),
+        ),
+        maker=perpdex.PerpdexOrderer(
+            w3=w3,
+            async_w3=async_w3,
+            config=perpdex.PerpdexOrdererConfig(
+                market_contract_abi_json_filepaths=[market_filepath],
+                exchange_contract_abi_json_filepath=exchange_filepath,
+                inverse=True,
+                tx_options={"gasPrice": 1},
+            ),
+            snapshot=snapshot,
+            receipt_tracker=receipt_tracker,
+            tx_builder=TxBuilder(async_w3, account),
+        ),
+        price_getter=ticker,
+        config=mm.MarketMakerConfig(symbol="ETH", inverse=True),
+        quote_reconciler=mm.QuoteReconciler(mm.QuoteReconcilerConfig()),
+        state_updater=snapshot,
+        quote_ladder=None
+        if ladder_levels <= 1
+        else mm.QuoteLadder(mm.QuoteLadderConfig(levels=ladder_levels)),
+    )
+    return market_maker, chain
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+
+def _requote(loop, market_maker, chain, rounds):
+    # move the mark price so that both legs are replaced
+    chain.mark_price_x96 = chain.mark_price_x96 * 1001 // 1000
+    loop.run_until_complete(market_maker.execute())
+    rounds.append(None)
+
+
+def _execute(loop, market_maker, rounds):
+    loop.run_until_complete(market_maker.execute())
+    rounds.append(None)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.mark.parametrize("local_chain_market_maker", [1, 5], indirect=True)
+def test_bench_market_maker_execute_requote(benchmark, loop, local_chain_market_maker):
+    market_maker, chain = local_chain_market_maker
+    # initial quotes
+    loop.run_until_complete(market_maker.execute())
+    chain.rpc_counts = {}
+    tx_count = chain.tx_count
+    gas_used = chain.gas_used
+
+    # counted, as --benchmark-disable runs it only once
+    rounds = []
+    benchmark.pedantic(
+        _requote, args=(loop, market_maker, chain, rounds), rounds=50, warmup_rounds=0
+    )
+
+    requotes = len(rounds)
+    rpc_per_requote = sum(chain.rpc_counts.values()) / requotes
+    txs_per_requote = (chain.tx_count - tx_count) / requotes
+    gas_per_requote = (chain.gas_used - gas_used) / requotes
+    benchmark.extra_info.update(
+        rpc_per_requote=rpc_per_requote,
+        rpc_counts=chain.rpc_counts,
+        txs_per_requote=txs_per_requote,
+        gas_per_requote=gas_per_requote,
+    )
+    # snapshot eth_call, send and receipt. the nonce is local, gas limits are
+    # learned from the first txs of each batch size and cancels and creates of
+    # all levels of both sides go in one multicall tx
+    assert txs_per_requote == 1
+    assert chain.rpc_counts["eth_call"] / requotes == 1
+    estimates = chain.rpc_counts.get("eth_estimateGas", 0)
+    assert estimates <= 2
+    assert "eth_chainId" not in chain.rpc_counts
+    assert sum(chain.rpc_counts.values()) - estimates == 3 * requotes
+
+
+def test_bench_market_maker_execute_unchanged(
+    benchmark, loop, local_chain_market_maker
+):
+    market_maker, chain = local_chain_market_maker
+    loop.run_until_complete(market_maker.execute())
+    chain.rpc_counts = {}
+    chain.call_counts = {}
+    tx_count = chain.tx_count
+
+    rounds = []
+    benchmark.pedantic(
+        _execute, args=(loop, market_maker, rounds), rounds=50, warmup_rounds=0
+    )
+
+    # unchanged quotes cost one snapshot read and no tx
+    assert chain.tx_count == tx_count
+    assert chain.rpc_counts == {"eth_call": len(rounds)}
+    # without a log subscription (plain HTTP) fills of our orders are only
+    # seen in the order ids, read in the same snapshot eth_call
+    assert chain.call_counts["getLimitOrderIds"] == 2 * len(rounds)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src import market_maker as mm
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 200
+
+
+class AdvancingOhlcvGetter:
+    """serves `history` bars, then one more bar per call"""
+
+    def __init__(self, history: int):
+        n = history + ROUNDS + 1
+        rng = np.random.default_rng(0)
+        cl = 1000 + np.cumsum(rng.normal(0, 1, n))
+        self._ohlcv = dict(
+            timestamp=np.arange(n) * 60000.0,
+            op=cl,
+            hi=cl + rng.uniform(0, 2, n),
+            lo=cl - rng.uniform(0, 2, n),
+            cl=cl,
+            volume=np.ones(n),
+        )
+        self._end = history
+
+    def get_ohlcv_arrays(self) -> dict:
+        self._end += 1
+        return {k: v[: self._end] for k, v in self._ohlcv.items()}
+
+
+class FixedTicker:
+    def last_price(self):
+        return 1000.0
+
+
+@pytest.mark.parametrize("history", [200, 2000, 20000])
+@pytest.mark.parametrize(
+    "calculator_class,config",
+    [
+        (mm.NormMakePriceCalculator, mm.NormMakePriceCalculatorConfig(200, 0.2)),
+        (mm.ATRMakePriceCalculator, mm.ATRMakePriceCalculatorConfig(200, 0.2)),
+    ],
+)
+def test_bench_ohlcv_price_calculator(benchmark, calculator_class, config, history):
+    calculator = calculator_class(
+        ohlcv_getter=AdvancingOhlcvGetter(history), config=config
+    )
+    # consume the history once. rounds measure one new bar each
+    calculator.ask_bid_prices()
+
+    ask_price, bid_price = benchmark.pedantic(
+        calculator.ask_bid_prices, rounds=ROUNDS, warmup_rounds=0
+    )
+
+    assert np.isfinite(ask_price) and np.isfinite(bid_price)
+
+
+def test_bench_simple_price_calculator(benchmark):
+    calculator = mm.SimpleMakePriceCalculator(
+        ticker=FixedTicker(), config=mm.SimpleMakePriceCalculatorConfig(diff=1)
+    )
+
+    assert benchmark(calculator.ask_bid_prices) == (1001.0, 999.0)
@@ -0,0 +1,30 @@
+from src.contracts.cache import TTLCache
+
+
+def test_ttl_cache_hits_within_ttl():
+    cache = TTLCache(ttl_sec=60)
+    values = iter([1, 2])
+
+    assert cache.get("key", lambda: next(values)) == 1
+    assert cache.get("key", lambda: next(values)) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_ttl_cache_zero_ttl_always_fetches():
+    cache = TTLCache(ttl_sec=0)
+    values = iter([1, 2])
+
+    assert cache.get("key", lambda: next(values)) == 1
+    assert cache.get("key", lambda: next(values)) == 2
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_ttl_cache_invalidates_on_new_block():
+    block_number = 1
+    cache = TTLCache(ttl_sec=60, block_number_getter=lambda: block_number)
+    values = iter([1, 2])
+
+    assert cache.get("key", lambda: next(values)) == 1
+    assert cache.get("key", lambda: next(values)) == 1
+    block_number = 2
+    assert cache.get("key", lambda: next(values)) == 2
@@ -0,0 +1,121 @@
+import pytest
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncBaseProvider
+
+from src.contracts.fee_oracle import (
+    URGENCY_HIGH,
+    URGENCY_LOW,
+    URGENCY_NORMAL,
+    FeeOracle,
+    FeeOracleConfig,
+)
+
+
+class FakeProvider(AsyncBaseProvider):
+    def __init__(self, base_fees, rewards):
+        self.base_fees = base_fees
+        self.rewards = rewards
+        self.methods = []
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        if method == "eth_feeHistory":
+            if self.base_fees is None:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "error": {"code": -32601, "message": "method not found"},
+                }
+            result = {
+                "oldestBlock": "0x1",
+                "baseFeePerGas": [hex(f) for f in self.base_fees],
+                "gasUsedRatio": [0.5] * len(self.rewards),
+                "reward": [[hex(r) for r in rewards] for rewards in self.rewards],
+            }
+        else:
+            result = {"eth_gasPrice": hex(100)}[method]
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+def _create_oracle(provider, **kwargs):
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    return FeeOracle(async_w3, FeeOracleConfig(**kwargs))
+
+
+@pytest.mark.asyncio
+async def test_fee_oracle_eip1559_fees_by_urgency():
+    provider = FakeProvider(
+        base_fees=[90, 100, 110],
+        rewards=[[1, 5, 20], [3, 7, 40]],
+    )
+    oracle = _create_oracle(provider)
+
+    assert await oracle.fees(URGENCY_LOW) == {
+        "maxFeePerGas": 222,
+        "maxPriorityFeePerGas": 2,
+    }
+    assert await oracle.fees(URGENCY_NORMAL) == {
+        "maxFeePerGas": 226,
+        "maxPriorityFeePerGas": 6,
+    }
+    assert await oracle.fees(URGENCY_HIGH) == {
+        "maxFeePerGas": 250,
+        "maxPriorityFeePerGas": 30,
+    }
+    # history is reused within update_interval_sec
+    assert provider.methods == ["eth_feeHistory"]
+
+
+@pytest.mark.asyncio
+async def test_fee_oracle_max_fee_cap():
+    provider = FakeProvider(base_fees=[100], rewards=[[1, 5, 20]])
+    oracle = _create_oracle(provider, max_fee_per_gas=150)
+
+    assert await oracle.fees(URGENCY_HIGH) == {
+        "maxFeePerGas": 150,
+        "maxPriorityFeePerGas": 20,
+    }
+
+
+@pytest.mark.asyncio
+async def test_fee_oracle_legacy_fallback():
+    provider = FakeProvider(base_fees=None, rewards=[])
+    oracle = _create_oracle(provider, update_interval_sec=0)
+
+    assert await oracle.fees(URGENCY_NORMAL) == {"gasPrice": 110}
+    assert await oracle.fees(URGENCY_HIGH) == {"gasPrice": 125}
+    # eth_feeHistory is not retried
+    assert provider.methods == ["eth_feeHistory", "eth_gasPrice", "eth_gasPrice"]
+
+
+@pytest.mark.asyncio
+async def test_fee_oracle_bump():
+    provider = FakeProvider(base_fees=[100], rewards=[[1, 5, 20]])
+    oracle = _create_oracle(provider)
+
+    # each field is the higher of +12.5% and the current high urgency fee
+    tx = dict(nonce=3, maxFeePerGas=200, maxPriorityFeePerGas=2)
+    assert await oracle.bump(tx) == dict(
+        nonce=3, maxFeePerGas=225, maxPriorityFeePerGas=20
+    )
+
+    # +12.5% is above the current fees
+    tx = dict(nonce=3, maxFeePerGas=400, maxPriorityFeePerGas=40)
+    assert await oracle.bump(tx) == dict(
+        nonce=3, maxFeePerGas=450, maxPriorityFeePerGas=45
+    )
+
+
+@pytest.mark.asyncio
+async def test_fee_oracle_bump_max_fee_cap():
+    provider = FakeProvider(base_fees=[100], rewards=[[1, 5, 20]])
+    oracle = _create_oracle(provider, max_fee_per_gas=300)
+
+    tx = dict(nonce=3, maxFeePerGas=280, maxPriorityFeePerGas=40)
+    assert await oracle.bump(tx) == dict(
+        nonce=3, maxFeePerGas=300, maxPriorityFeePerGas=45
+    )
+    # at the cap
+    tx = dict(nonce=3, maxFeePerGas=300, maxPriorityFeePerGas=300)
+    assert await oracle.bump(tx) == tx
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.contracts.nonce_manager import NonceManager
+
+
+class FakeEth:
+    def __init__(self, pending_nonce: int):
+        self.pending_nonce = pending_nonce
+        self.call_count = 0
+
+    async def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == "pending"
+        self.call_count += 1
+        await asyncio.sleep(0.01)
+        return self.pending_nonce
+
+
+@pytest.mark.asyncio
+async def test_nonce_manager_allocates_sequential_nonces_locally():
+    eth = FakeEth(pending_nonce=5)
+    nonce_manager = NonceManager(SimpleNamespace(eth=eth), "0x" + "11" * 20)
+
+    nonces = await asyncio.gather(*[nonce_manager.allocate() for _ in range(4)])
+
+    assert sorted(nonces) == [5, 6, 7, 8]
+    assert eth.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_nonce_manager_resync():
+    eth = FakeEth(pending_nonce=5)
+    nonce_manager = NonceManager(SimpleNamespace(eth=eth), "0x" + "11" * 20)
+    assert await nonce_manager.allocate() == 5
+    assert await nonce_manager.allocate() == 6
+    nonce_manager.done(5)
+    nonce_manager.done(6)
+
+    # nonce 6 was never sent (gap)
+    eth.pending_nonce = 6
+    await nonce_manager.resync()
+    assert await nonce_manager.allocate() == 6
+
+    # txs were sent from another process (conflict)
+    eth.pending_nonce = 10
+    await nonce_manager.resync()
+    assert await nonce_manager.allocate() == 10
+
+
+@pytest.mark.asyncio
+async def test_nonce_manager_release():
+    nonce_manager = NonceManager(SimpleNamespace(eth=FakeEth(5)), "0x" + "11" * 20)
+    assert await nonce_manager.allocate() == 5
+    assert await nonce_manager.allocate() == 6
+
+    # 5 is a gap behind 6
+    assert not nonce_manager.release(5)
+    assert nonce_manager.release(6)
+    assert await nonce_manager.allocate() == 6
+
+
+@pytest.mark.asyncio
+async def test_nonce_manager_resync_keeps_nonces_of_other_senders():
+    eth = FakeEth(pending_nonce=5)
+    nonce_manager = NonceManager(SimpleNamespace(eth=eth), "0x" + "11" * 20)
+    sent = []
+    conflicted = asyncio.Event()
+
+    async def slow_sender():
+        # holds 5 while the other sender resyncs
+        nonce = await nonce_manager.allocate()
+        await conflicted.wait()
+        sent.append(nonce)
+        nonce_manager.done(nonce)
+
+    async def conflicting_sender():
+        await asyncio.sleep(0)
+        nonce = await nonce_manager.allocate()
+        # rejected as too low (e.g. by a lagging node). the pending count
+        # does not include the unsent 5
+        nonce_manager.done(nonce)
+        await nonce_manager.resync()
+        conflicted.set()
+        nonce = await nonce_manager.allocate()
+        sent.append(nonce)
+        nonce_manager.done(nonce)
+
+    await asyncio.gather(slow_sender(), conflicting_sender())
+
+    assert sorted(sent) == [5, 7]
+
+    # nothing in flight. a gap can be rewound to
+    eth.pending_nonce = 6
+    await nonce_manager.resync()
+    assert await nonce_manager.allocate() == 6
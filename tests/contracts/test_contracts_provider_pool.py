@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from web3 import Web3
+from web3.eth import AsyncEth
+
+from src.contracts.provider_pool import AsyncProviderPool, ProviderPoolConfig
+
+
+class LocalNode:
+    """HTTP JSON-RPC stand-in of a node"""
+
+    def __init__(self, block_number: int, delay_sec: float = 0):
+        self.block_number = block_number
+        self.delay_sec = delay_sec
+        self.down = False
+        self.send_error = None
+        self.methods = []
+        self._runner = None
+        self.uri = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.uri = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle(self, request):
+        data = await request.json()
+        self.methods.append(data["method"])
+        await asyncio.sleep(self.delay_sec)
+        if self.down:
+            return web.Response(status=503)
+        response = {"jsonrpc": "2.0", "id": data["id"]}
+        if data["method"] == "eth_sendRawTransaction" and self.send_error:
+            response["error"] = {"code": -32000, "message": self.send_error}
+        elif data["method"] == "eth_sendRawTransaction":
+            response["result"] = "0x" + "ab" * 32
+        else:
+            response["result"] = hex(self.block_number)
+        return web.Response(text=json.dumps(response))
+
+
+@pytest_asyncio.fixture
+async def nodes():
+    nodes = [LocalNode(block_number=1, delay_sec=0.03), LocalNode(block_number=2)]
+    for node in nodes:
+        await node.start()
+    yield nodes
+    for node in nodes:
+        await node.stop()
+
+
+def _create_w3(nodes, **kwargs):
+    pool = AsyncProviderPool(
+        ProviderPoolConfig(endpoint_uris=[node.uri for node in nodes], **kwargs)
+    )
+    return pool, Web3(pool, modules={"eth": (AsyncEth,)}, middlewares=[])
+
+
+@pytest.mark.asyncio
+async def test_provider_pool_routes_reads_to_fastest_node(nodes):
+    slow, fast = nodes
+    pool, w3 = _create_w3(nodes)
+
+    block_numbers = [await w3.eth.block_number for _ in range(10)]
+
+    # each node is tried once, then the faster one is kept
+    assert len(slow.methods) == 1
+    assert block_numbers[1:] == [2] * 9
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_provider_pool_fails_over_ejects_and_probes(nodes):
+    slow, fast = nodes
+    fast.down = True
+    pool, w3 = _create_w3(nodes, max_failures=2, probe_interval_sec=0.05)
+
+    assert [await w3.eth.block_number for _ in range(4)] == [1] * 4
+    # ejected after 2 failures
+    assert len(fast.methods) == 2
+
+    fast.down = False
+    await asyncio.sleep(0.06)
+    # starts the probe
+    await w3.eth.block_number
+    await asyncio.sleep(0.02)
+    assert await w3.eth.block_number == 2
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_provider_pool_broadcasts_transactions(nodes):
+    slow, fast = nodes
+    fast.send_error = "already known"
+    pool, w3 = _create_w3(nodes)
+
+    tx_hash = await w3.eth.send_raw_transaction("0x1234")
+
+    assert tx_hash.hex() == "0x" + "ab" * 32
+    assert slow.methods == fast.methods == ["eth_sendRawTransaction"]
+    await pool.close()
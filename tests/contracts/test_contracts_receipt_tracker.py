@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+import web3
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncBaseProvider
+
+from src.contracts.receipt_tracker import ReceiptTracker, ReceiptTrackerConfig
+
+
+def _tx_hash(i: int) -> str:
+    return "0x" + i.to_bytes(32, "big").hex()
+
+
+def _receipt(tx_hash: str, block_number: int) -> dict:
+    return {
+        "transactionHash": tx_hash,
+        "blockHash": "0x" + block_number.to_bytes(32, "big").hex(),
+        "blockNumber": hex(block_number),
+        "status": "0x1",
+        "logs": [],
+        "gasUsed": "0x1",
+        "cumulativeGasUsed": "0x1",
+        "contractAddress": None,
+        "from": "0x" + "11" * 20,
+        "to": "0x" + "11" * 20,
+        "transactionIndex": "0x0",
+        "logsBloom": "0x" + "00" * 256,
+    }
+
+
+class FakeChain(AsyncBaseProvider):
+    def __init__(self):
+        self.block_number = 1
+        # tx_hash -> block number
+        self.mined: dict = {}
+        self.methods = []
+
+    def mine(self, tx_hashes):
+        self.block_number += 1
+        for tx_hash in tx_hashes:
+            self.mined[tx_hash] = self.block_number
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        if method == "eth_blockNumber":
+            result = hex(self.block_number)
+        else:
+            block_number = self.mined.get(params[0])
+            result = None if block_number is None else _receipt(params[0], block_number)
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+def _create_tracker(chain):
+    return ReceiptTracker(
+        Web3(chain, modules={"eth": (AsyncEth,)}, middlewares=[]),
+        ReceiptTrackerConfig(poll_interval_sec=0.01),
+    )
+
+
+@pytest.mark.asyncio
+async def test_receipt_tracker_polls_pending_txs_once_per_block():
+    chain = FakeChain()
+    tracker = _create_tracker(chain)
+    receipts = []
+    tracker.add_receipt_handler(receipts.append)
+
+    tx_hashes = [_tx_hash(i) for i in range(1, 6)]
+    futures = [tracker.track(tx_hash) for tx_hash in tx_hashes]
+    await asyncio.sleep(0.1)
+    # polled when tracked and on the first block seen, then only the block
+    # number until a new block
+    assert chain.methods.count("eth_getTransactionReceipt") == 10
+    assert all(not future.done() for future in futures)
+
+    chain.mine(tx_hashes[:3])
+    await asyncio.sleep(0.05)
+    chain.mine(tx_hashes[3:])
+    results = await asyncio.gather(*futures)
+
+    assert [r["blockNumber"] for r in results] == [2, 2, 2, 3, 3]
+    assert len(receipts) == 5
+    # 5 more on block 2 and the 2 left on block 3
+    assert chain.methods.count("eth_getTransactionReceipt") == 17
+
+
+@pytest.mark.asyncio
+async def test_receipt_tracker_wait_timeout():
+    chain = FakeChain()
+    tracker = _create_tracker(chain)
+
+    with pytest.raises(web3.exceptions.TimeExhausted):
+        await tracker.wait(_tx_hash(1), timeout=0.05)
+
+    # no longer polled
+    await asyncio.sleep(0.02)
+    count = len(chain.methods)
+    chain.mine([])
+    await asyncio.sleep(0.05)
+    assert len(chain.methods) == count
@@ -0,0 +1,69 @@
+import json
+
+from eth_abi import encode_abi
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from src.contracts.registry import ContractRegistry, ContractRegistryConfig
+
+SYMBOL_ABI = [
+    {
+        "name": "symbol",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "string"}],
+    }
+]
+
+
+class FakeProvider(BaseProvider):
+    def __init__(self):
+        self.methods = []
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": "0x" + encode_abi(["string"], ["ETH"]).hex(),
+        }
+
+
+def _write_abi_json(tmp_path):
+    filepath = tmp_path / "PerpdexMarketETH.json"
+    filepath.write_text(
+        json.dumps(
+            {
+                "address": Web3.toChecksumAddress("0x" + "bb" * 20),
+                "abi": SYMBOL_ABI,
+            }
+        )
+    )
+    return str(filepath)
+
+
+def test_contract_registry_shares_contracts(tmp_path):
+    filepath = _write_abi_json(tmp_path)
+    registry = ContractRegistry(Web3(FakeProvider()))
+
+    assert registry.contract(filepath) is registry.contract(filepath)
+
+
+def test_contract_registry_index_saves_symbol_rpc(tmp_path):
+    filepath = _write_abi_json(tmp_path)
+    config = ContractRegistryConfig(
+        index_filepath=str(tmp_path / "cache" / "index.json")
+    )
+
+    provider = FakeProvider()
+    registry = ContractRegistry(Web3(provider), config)
+    assert registry.symbol(registry.contract(filepath)) == "ETH"
+    assert registry.symbol(registry.contract(filepath)) == "ETH"
+    assert provider.methods.count("eth_call") == 1
+
+    # restart
+    provider = FakeProvider()
+    registry = ContractRegistry(Web3(provider), config)
+    assert registry.symbol(registry.contract(filepath)) == "ETH"
+    assert "eth_call" not in provider.methods
@@ -0,0 +1,86 @@
+import pytest
+from eth_account import Account
+from eth_utils import keccak
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncBaseProvider
+
+from src.contracts.tx_builder import TxBuilder, TxBuilderConfig
+
+TO = Web3.toChecksumAddress("0x" + "aa" * 20)
+
+
+class FakeProvider(AsyncBaseProvider):
+    def __init__(self, send_error=None):
+        self.methods = []
+        self.raw_transactions = []
+        self.send_error = send_error
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        if method == "eth_sendRawTransaction" and self.send_error is not None:
+            return {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "error": {"code": -32000, "message": self.send_error},
+            }
+        if method == "eth_sendRawTransaction":
+            self.raw_transactions.append(params[0])
+            result = "0x" + len(self.raw_transactions).to_bytes(32, "big").hex()
+        else:
+            result = {"eth_chainId": "0x7a69", "eth_gasPrice": "0x1"}[method]
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+def _tx(data: str, nonce: int = 0):
+    return {"to": TO, "data": data, "nonce": nonce, "gas": 100000, "gasPrice": 1}
+
+
+def test_tx_builder_learns_gas_limit_per_method():
+    builder = TxBuilder(None, Account.create(), TxBuilderConfig(gas_margin=1.5))
+    create = "0x11111111" + "00" * 64
+    assert builder.gas_limit(_tx(create)) is None
+
+    builder.observe(_tx(create), {"status": 1, "gasUsed": 1000})
+    builder.observe(_tx(create), {"status": 1, "gasUsed": 1200})
+    assert builder.gas_limit(_tx(create)) == 1800
+    # other selector or calldata size (e.g. multicall batch size)
+    assert builder.gas_limit(_tx("0x22222222" + "00" * 64)) is None
+    assert builder.gas_limit(_tx(create + "00" * 32)) is None
+
+    # possibly out of gas. estimate again
+    builder.observe(_tx(create), {"status": 0, "gasUsed": 1800})
+    assert builder.gas_limit(_tx(create)) is None
+
+
+@pytest.mark.asyncio
+async def test_tx_builder_sends_raw_transactions_only():
+    provider = FakeProvider()
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    account = Account.create()
+    builder = TxBuilder(async_w3, account)
+
+    for nonce in range(3):
+        await builder.send(dict(_tx("0x11111111", nonce), **{"from": account.address}))
+
+    # chain id once
+    assert provider.methods == ["eth_chainId"] + ["eth_sendRawTransaction"] * 3
+    signed = account.sign_transaction(dict(_tx("0x11111111", 2), chainId=0x7A69))
+    assert provider.raw_transactions[-1] == signed.rawTransaction.hex()
+
+
+@pytest.mark.asyncio
+async def test_tx_builder_returns_hash_of_already_known_tx():
+    provider = FakeProvider(send_error="already known")
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    account = Account.create()
+    builder = TxBuilder(async_w3, account, TxBuilderConfig(chain_id=0x7A69))
+
+    tx_hash = await builder.send(_tx("0x11111111"))
+
+    signed = account.sign_transaction(dict(_tx("0x11111111"), chainId=0x7A69))
+    assert tx_hash == keccak(signed.rawTransaction) == signed.hash
+
+    provider.send_error = "insufficient funds"
+    with pytest.raises(ValueError, match="insufficient funds"):
+        await builder.send(_tx("0x11111111", nonce=1))
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from src.contracts.ws_subscriber import WebsocketSubscriber
+
+
+@pytest.mark.asyncio
+async def test_websocket_subscriber_dispatches_and_resubscribes():
+    connection_count = 0
+
+    async def handler(ws, *args):
+        nonlocal connection_count
+        connection_count += 1
+        request = json.loads(await ws.recv())
+        assert request["method"] == "eth_subscribe"
+        await ws.send(
+            json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": "0x1"})
+        )
+        await ws.send(
+            json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "method": "eth_subscription",
+                    "params": {"subscription": "0x1", "result": {"number": "0x10"}},
+                }
+            )
+        )
+        # drop the connection to force a reconnect
+
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    results = []
+    subscriber = WebsocketSubscriber(f"ws://127.0.0.1:{port}", reconnect_sec=0.01)
+    subscriber.subscribe(["newHeads"], results.append)
+    task = asyncio.create_task(subscriber.run())
+    try:
+        for _ in range(100):
+            if len(results) >= 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        server.close()
+        await server.wait_closed()
+
+    assert results[:2] == [{"number": "0x10"}, {"number": "0x10"}]
+    assert connection_count >= 2
@@ -1,4 +1,9 @@
+import asyncio
+import json
+
 import ccxt
+import pytest
+import websockets
 from src.exchanges import binance
 import pandas as pd
 
@@ -13,3 +18,108 @@ def test_binance_get_ohlcv_df():
     df = o.get_ohlcv_df()
     assert type(df) is pd.DataFrame
     assert len(df) > 0
+
+
+class FakeCcxtExchange:
+    def __init__(self, bars):
+        self.bars = bars
+        self.since_list = []
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None):
+        self.since_list.append(since)
+        return [bar for bar in self.bars if since is None or bar[0] >= since]
+
+
+def test_binance_get_ohlcv_arrays_fetches_incrementally():
+    exchange = FakeCcxtExchange(
+        [[0, 1, 1, 1, 1, 1], [60000, 2, 2, 2, 2, 1]],
+    )
+    o = binance.BinanceRestOhlcv(
+        ccxt_exchange=exchange,
+        symbol="BTCUSDT",
+        timeframe="1m",
+    )
+    o.get_ohlcv_arrays()
+
+    # forming bar was updated and a new bar opened
+    exchange.bars = [
+        [0, 1, 1, 1, 1, 1],
+        [60000, 2, 3, 2, 3, 2],
+        [120000, 3, 3, 3, 3, 1],
+    ]
+    arrays = o.get_ohlcv_arrays()
+
+    assert exchange.since_list == [None, 60000]
+    assert list(arrays["cl"]) == [1, 3, 3]
+
+
+@pytest.mark.asyncio
+async def test_binance_websocket_feed_with_backfill():
+    async def handler(ws, *args):
+        await ws.send(
+            json.dumps(
+                {
+                    "stream": "btcusdt@kline_1m",
+                    "data": {
+                        "e": "kline",
+                        "k": {
+                            "t": 120000,
+                            "o": "3",
+                            "h": "4",
+                            "l": "3",
+                            "c": "4",
+                            "v": "1",
+                            "x": False,
+                        },
+                    },
+                }
+            )
+        )
+        await ws.send(
+            json.dumps(
+                {
+                    "stream": "btcusdt@bookTicker",
+                    "data": {
+                        "u": 1,
+                        "s": "BTCUSDT",
+                        "b": "3.9",
+                        "B": "1",
+                        "a": "4.1",
+                        "A": "1",
+                    },
+                }
+            )
+        )
+        await ws.wait_closed()
+
+    server = await websockets.serve(handler, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    exchange = FakeCcxtExchange(
+        [[0, 1, 1, 1, 1, 1], [60000, 2, 2, 2, 2, 1], [120000, 3, 3, 3, 3, 1]]
+    )
+    feed = binance.BinanceWebsocketFeed(
+        rest_ohlcv=binance.BinanceRestOhlcv(
+            ccxt_exchange=exchange,
+            symbol="BTCUSDT",
+            timeframe="1m",
+        ),
+        config=binance.BinanceWebsocketFeedConfig(
+            symbol="BTCUSDT",
+            uri=f"ws://127.0.0.1:{port}",
+        ),
+    )
+    task = asyncio.create_task(feed.run())
+    try:
+        for _ in range(100):
+            if feed.bid_price() == 3.9:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        server.close()
+        await server.wait_closed()
+
+    assert exchange.since_list == [None]
+    assert list(feed.get_ohlcv_arrays()["cl"]) == [1, 2, 4]
+    assert (feed.bid_price(), feed.ask_price(), feed.last_price()) == (3.9, 4.1, 4)
@@ -0,0 +1,708 @@
+import asyncio
+
+import pytest
+import rlp
+import web3
+from eth_abi import encode_abi
+from eth_account import Account
+from eth_utils import big_endian_to_int
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.providers.async_base import AsyncBaseProvider
+
+from src.contracts.fee_oracle import FeeOracle, FeeOracleConfig
+from src.contracts.utils import async_construct_sign_and_send_raw_middleware
+from src.exchanges import perpdex
+from tests.perpdex_fakes import (
+    EXCHANGE_ABI,
+    MULTICALL_ABI,
+    ORDER_EVENT_ABI,
+    VIEW_ABI,
+    FakeSyncProvider,
+    write_abi_json_filepaths,
+)
+
+
+def _result(result):
+    return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+class FakeAsyncProvider(AsyncBaseProvider):
+    def __init__(self, order_ids):
+        self.order_ids = order_ids
+        self.methods = []
+        self.pending_receipts = 0
+        self.max_pending_receipts = 0
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        tx_count = self.methods.count("eth_sendRawTransaction")
+        await asyncio.sleep(0.01)
+        if method == "eth_call":
+            return _result("0x" + encode_abi(["uint40[]"], [self.order_ids]).hex())
+        if method == "eth_getTransactionReceipt":
+            self.pending_receipts += 1
+            self.max_pending_receipts = max(
+                self.max_pending_receipts, self.pending_receipts
+            )
+            await asyncio.sleep(0.2)
+            self.pending_receipts -= 1
+            return _result(
+                {
+                    "transactionHash": params[0],
+                    "blockHash": "0x" + "00" * 32,
+                    "blockNumber": "0x1",
+                    "status": "0x1",
+                    "logs": [],
+                    "gasUsed": "0x1",
+                    "cumulativeGasUsed": "0x1",
+                    "contractAddress": None,
+                    "from": "0x" + "11" * 20,
+                    "to": "0x" + "11" * 20,
+                    "transactionIndex": "0x0",
+                    "logsBloom": "0x" + "00" * 256,
+                }
+            )
+        return _result(
+            {
+                "eth_getTransactionCount": "0x5",
+                # a new block on every request
+                "eth_blockNumber": hex(len(self.methods)),
+                "eth_chainId": "0x1",
+                "eth_estimateGas": "0x5208",
+                "eth_gasPrice": "0x1",
+                "eth_sendRawTransaction": "0x" + tx_count.to_bytes(32, "big").hex(),
+            }[method]
+        )
+
+
+@pytest.fixture
+def abi_json_filepaths(tmp_path):
+    return write_abi_json_filepaths(tmp_path, EXCHANGE_ABI + VIEW_ABI)
+
+
+@pytest.fixture
+def multicall_abi_json_filepaths(tmp_path):
+    return write_abi_json_filepaths(tmp_path, EXCHANGE_ABI + [MULTICALL_ABI])
+
+
+class FakeRecorder:
+    def __init__(self):
+        self.records = []
+
+    def record(self, table, **values):
+        self.records.append((table, values))
+
+    def rows(self, table):
+        return [values for t, values in self.records if t == table]
+
+
+def _create_orderer(
+    abi_json_filepaths, provider, fee_oracle=None, recorder=None, **config_kwargs
+):
+    market_filepath, exchange_filepath = abi_json_filepaths
+    account = Account.create()
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    async_w3.eth.default_account = account.address
+    async_w3.middleware_onion.add(async_construct_sign_and_send_raw_middleware(account))
+    return perpdex.PerpdexOrderer(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        config=perpdex.PerpdexOrdererConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+            inverse=False,
+            **config_kwargs,
+        ),
+        fee_oracle=fee_oracle,
+        recorder=recorder,
+    )
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_cancel_all_orders_awaits_receipts_concurrently(
+    abi_json_filepaths,
+):
+    provider = FakeAsyncProvider(order_ids=[1, 2, 3])
+    orderer = _create_orderer(abi_json_filepaths, provider)
+
+    await orderer.cancel_all_orders(symbol="ETH")
+
+    # 3 bid + 3 ask orders
+    assert provider.methods.count("eth_sendRawTransaction") == 6
+    assert provider.max_pending_receipts > 1
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_replace_all_orders_sends_in_one_burst(
+    abi_json_filepaths,
+):
+    provider = FakeAsyncProvider(order_ids=[1, 2])
+    orderer = _create_orderer(abi_json_filepaths, provider)
+
+    await orderer.replace_all_orders(
+        symbol="ETH",
+        orders=[
+            dict(side_int=-1, size=0.1, price=1010),
+            dict(side_int=1, size=0.1, price=990),
+        ],
+    )
+
+    # 2 bid + 2 ask cancels and 2 posts
+    assert provider.methods.count("eth_sendRawTransaction") == 6
+    # nonce is fetched once and then allocated locally
+    assert provider.methods.count("eth_getTransactionCount") == 1
+    # every tx is sent before the first receipt is polled
+    last_send = len(provider.methods) - provider.methods[::-1].index(
+        "eth_sendRawTransaction"
+    )
+    assert "eth_getTransactionReceipt" not in provider.methods[:last_send]
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_replace_all_orders_with_multicall(
+    multicall_abi_json_filepaths,
+):
+    provider = FakeAsyncProvider(order_ids=[1, 2])
+    orderer = _create_orderer(multicall_abi_json_filepaths, provider)
+
+    await orderer.replace_all_orders(
+        symbol="ETH",
+        orders=[
+            dict(side_int=-1, size=0.1, price=1010),
+            dict(side_int=1, size=0.1, price=990),
+        ],
+    )
+
+    # 4 cancels and 2 posts in one tx
+    assert provider.methods.count("eth_sendRawTransaction") == 1
+    assert provider.methods.count("eth_estimateGas") == 1
+
+
+class FakeStuckProvider(FakeAsyncProvider):
+    """mines the `mined_on`-th tx sent with a nonce (None: never)
+
+    Later txs of a mined nonce are rejected, so the number of replacements
+    does not depend on timing.
+    """
+
+    def __init__(self, order_ids, mined_on):
+        super().__init__(order_ids)
+        self.mined_on = mined_on
+        self.raw_txs = []
+        self.mined_hashes = set()
+
+    async def make_request(self, method, params):
+        if method == "eth_feeHistory":
+            self.methods.append(method)
+            return _result(
+                {
+                    "oldestBlock": "0x1",
+                    "baseFeePerGas": ["0x64", "0x64"],
+                    "gasUsedRatio": [0.5],
+                    "reward": [["0x1", "0x2", "0x3"]],
+                }
+            )
+        if method == "eth_sendRawTransaction":
+            self.methods.append(method)
+            nonce = _decode_eip1559_tx(params[0])["nonce"]
+            nonce_count = sum(
+                _decode_eip1559_tx(raw_tx)["nonce"] == nonce for raw_tx in self.raw_txs
+            )
+            if self.mined_on is not None and nonce_count >= self.mined_on:
+                return {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "error": {"code": -32000, "message": "nonce too low"},
+                }
+            self.raw_txs.append(params[0])
+            tx_hash = "0x" + len(self.raw_txs).to_bytes(32, "big").hex()
+            if nonce_count + 1 == self.mined_on:
+                self.mined_hashes.add(tx_hash)
+            return _result(tx_hash)
+        if method == "eth_getTransactionReceipt" and params[0] not in self.mined_hashes:
+            self.methods.append(method)
+            return _result(None)
+        return await super().make_request(method, params)
+
+
+def _decode_eip1559_tx(raw_tx: str) -> dict:
+    data = bytes.fromhex(raw_tx[2:])
+    assert data[0] == 2
+    fields = rlp.decode(data[1:])
+    return dict(
+        nonce=big_endian_to_int(fields[1]),
+        maxPriorityFeePerGas=big_endian_to_int(fields[2]),
+        maxFeePerGas=big_endian_to_int(fields[3]),
+    )
+
+
+def _create_stuck_orderer(abi_json_filepaths, provider, **config_kwargs):
+    fee_oracle = FeeOracle(
+        Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[]),
+        FeeOracleConfig(),
+    )
+    return _create_orderer(
+        abi_json_filepaths,
+        provider,
+        fee_oracle=fee_oracle,
+        replace_after_sec=0.05,
+        **config_kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_replaces_stuck_tx_by_fee(abi_json_filepaths):
+    provider = FakeStuckProvider(order_ids=[1], mined_on=3)
+    recorder = FakeRecorder()
+    orderer = _create_stuck_orderer(abi_json_filepaths, provider, recorder=recorder)
+
+    await orderer.cancel_all_orders(symbol="ETH")
+
+    # 1 bid + 1 ask cancel, each replaced twice with the same nonce and
+    # higher fees
+    txs = [_decode_eip1559_tx(raw_tx) for raw_tx in provider.raw_txs]
+    assert len(txs) == 6
+    for nonce in [5, 6]:
+        nonce_txs = [tx for tx in txs if tx["nonce"] == nonce]
+        assert len(nonce_txs) == 3
+        for stuck_tx, tx in zip(nonce_txs, nonce_txs[1:]):
+            assert tx["maxFeePerGas"] > stuck_tx["maxFeePerGas"]
+            assert tx["maxPriorityFeePerGas"] > stuck_tx["maxPriorityFeePerGas"]
+
+    # recorded with the hash of the mined replacement
+    tx_rows = recorder.rows("tx")
+    assert {row["tx_hash"] for row in tx_rows} == provider.mined_hashes
+    assert [row["replacements"] for row in tx_rows] == [2, 2]
+    replacement_rows = recorder.rows("tx_replacement")
+    assert len(replacement_rows) == 4
+    assert {
+        row["replacement_tx_hash"] for row in replacement_rows
+    } >= provider.mined_hashes
+    assert len(orderer._sent_txs) == 0
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_gives_up_on_tx_never_mined(abi_json_filepaths):
+    provider = FakeStuckProvider(order_ids=[1], mined_on=None)
+    orderer = _create_stuck_orderer(
+        abi_json_filepaths, provider, max_replacements=2, receipt_timeout_sec=0.5
+    )
+
+    with pytest.raises(web3.exceptions.TimeExhausted):
+        await orderer.cancel_limit_order(symbol="ETH", side_int=1, order_id=1)
+
+    assert len(provider.raw_txs) == 3
+    assert len(orderer._sent_txs) == 0
+
+
+class FakeRejectingProvider(FakeAsyncProvider):
+    """rejects the (legacy) tx of `rejected_nonce` once with `message`"""
+
+    def __init__(self, order_ids, rejected_nonce, message="insufficient funds"):
+        super().__init__(order_ids)
+        self.rejected_nonce = rejected_nonce
+        self.message = message
+        self.sent_txs = []
+
+    async def make_request(self, method, params):
+        if method == "eth_sendRawTransaction":
+            # nonce, gasPrice, gas, to, value, data, v, r, s
+            fields = rlp.decode(bytes.fromhex(params[0][2:]))
+            tx = dict(
+                nonce=big_endian_to_int(fields[0]),
+                to=Web3.toChecksumAddress(fields[3]),
+                value=big_endian_to_int(fields[4]),
+            )
+            if tx["nonce"] == self.rejected_nonce:
+                self.rejected_nonce = None
+                self.methods.append(method)
+                return {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "error": {"code": -32000, "message": self.message},
+                }
+            self.sent_txs.append(tx)
+        return await super().make_request(method, params)
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_fills_nonce_gap_of_failed_send(abi_json_filepaths):
+    provider = FakeRejectingProvider(order_ids=[], rejected_nonce=5)
+    orderer = _create_orderer(abi_json_filepaths, provider)
+    account = orderer._async_w3.eth.default_account
+
+    with pytest.raises(ValueError, match="insufficient funds"):
+        await orderer.replace_all_orders(
+            symbol="ETH",
+            orders=[
+                dict(side_int=-1, size=0.1, price=1010),
+                dict(side_int=1, size=0.1, price=990),
+            ],
+        )
+
+    # nonce 6 would be stuck behind the unused nonce 5
+    assert sorted(tx["nonce"] for tx in provider.sent_txs) == [5, 6]
+    filler = [tx for tx in provider.sent_txs if tx["nonce"] == 5][0]
+    assert filler["to"] == account and filler["value"] == 0
+    # no resync on a non-nonce error
+    assert provider.methods.count("eth_getTransactionCount") == 1
+
+
+@pytest.mark.asyncio
+async def test_perpdex_orderer_treats_already_known_as_sent(abi_json_filepaths):
+    # e.g. another node of the provider pool got the tx by gossip
+    provider = FakeRejectingProvider(
+        order_ids=[], rejected_nonce=5, message="already known"
+    )
+    orderer = _create_orderer(abi_json_filepaths, provider)
+
+    await orderer.replace_all_orders(
+        symbol="ETH",
+        orders=[
+            dict(side_int=-1, size=0.1, price=1010),
+            dict(side_int=1, size=0.1, price=990),
+        ],
+    )
+
+    # not sent again with a new nonce (a duplicated order)
+    assert provider.methods.count("eth_sendRawTransaction") == 2
+    assert [tx["nonce"] for tx in provider.sent_txs] == [6]
+    assert provider.methods.count("eth_getTransactionCount") == 1
+    assert provider.methods.count("eth_getTransactionReceipt") == 2
+
+
+class FakeSubscriber:
+    def __init__(self):
+        self.callbacks = {}
+        self.running = False
+
+    def subscribe(self, params, callback):
+        key = params[0] if params[0] == "newHeads" else params[1]["address"]
+        self.callbacks[tuple(key) if isinstance(key, list) else key] = callback
+
+    async def run(self):
+        self.running = True
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.running = False
+
+
+class FakeFlakyMarkPriceProvider(AsyncBaseProvider):
+    def __init__(self):
+        self.calls = 0
+
+    async def make_request(self, method, params):
+        assert method == "eth_call"
+        self.calls += 1
+        if self.calls == 1:
+            return {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "error": {"code": -32000, "message": "busy"},
+            }
+        return _result("0x" + encode_abi(["uint256"], [2 * perpdex.Q96]).hex())
+
+
+def _create_trigger(abi_json_filepaths, provider, subscriber):
+    market_filepath, exchange_filepath = abi_json_filepaths
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    async_w3.eth.default_account = Account.create().address
+    return perpdex.PerpdexRequoteTrigger(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        subscriber=subscriber,
+        config=perpdex.PerpdexRequoteTriggerConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+            inverse=False,
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_perpdex_requote_trigger_survives_rpc_errors(abi_json_filepaths):
+    provider = FakeFlakyMarkPriceProvider()
+    subscriber = FakeSubscriber()
+    trigger = _create_trigger(abi_json_filepaths, provider, subscriber)
+    task = asyncio.create_task(trigger.run())
+
+    for _ in range(2):
+        subscriber.callbacks["newHeads"]({})
+        await asyncio.sleep(0.01)
+    assert not task.done()
+    assert provider.calls == 2
+    assert trigger._mark_prices == {Web3.toChecksumAddress("0x" + "bb" * 20): 2.0}
+
+    # the subscriber does not outlive run (e.g. on a supervisor restart)
+    assert subscriber.running
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not subscriber.running
+
+
+@pytest.mark.asyncio
+async def test_perpdex_requote_trigger_fires_on_fill(abi_json_filepaths):
+    market_filepath, exchange_filepath = abi_json_filepaths
+    account = Account.create()
+    async_w3 = Web3(
+        FakeAsyncProvider(order_ids=[]), modules={"eth": (AsyncEth,)}, middlewares=[]
+    )
+    async_w3.eth.default_account = account.address
+    subscriber = FakeSubscriber()
+    trigger = perpdex.PerpdexRequoteTrigger(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        subscriber=subscriber,
+        config=perpdex.PerpdexRequoteTriggerConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+            inverse=False,
+        ),
+    )
+
+    # heartbeat
+    assert not await trigger.wait(timeout=0.01)
+
+    on_exchange_log = subscriber.callbacks[Web3.toChecksumAddress("0x" + "aa" * 20)]
+    settled_topic = Web3.keccak(text="LimitOrderSettled(address,address,int256)").hex()
+    # fill of another trader
+    on_exchange_log({"topics": [settled_topic, "0x" + "00" * 12 + "11" * 20]})
+    assert not await trigger.wait(timeout=0.01)
+
+    on_exchange_log(
+        {"topics": [settled_topic, "0x" + "00" * 12 + account.address[2:].lower()]}
+    )
+    assert await trigger.wait(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_perpdex_state_snapshot_pinned_to_new_head(abi_json_filepaths):
+    market_filepath, exchange_filepath = abi_json_filepaths
+    provider = FakeAsyncProvider(order_ids=[])
+    subscriber = FakeSubscriber()
+    trigger = _create_trigger(abi_json_filepaths, provider, subscriber)
+    snapshot = perpdex.PerpdexStateSnapshot(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=trigger._async_w3,
+        config=perpdex.PerpdexStateSnapshotConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+            multicall_address=None,
+        ),
+        block_number_getter=lambda: trigger.block_number,
+    )
+
+    # no header yet
+    await snapshot.update()
+    assert provider.methods.count("eth_blockNumber") == 1
+
+    subscriber.callbacks["newHeads"]({"number": "0x2a"})
+    await snapshot.update()
+    assert snapshot.block_number == 42
+    assert provider.methods.count("eth_blockNumber") == 1
+
+
+class FakeMulticallProvider(AsyncBaseProvider):
+    def __init__(self, return_data):
+        self.return_data = return_data
+        self.methods = []
+
+    async def make_request(self, method, params):
+        self.methods.append(method)
+        assert method == "eth_call"
+        return _result(
+            "0x"
+            + encode_abi(
+                ["(bool,bytes)[]"], [[(True, d) for d in self.return_data]]
+            ).hex()
+        )
+
+
+@pytest.mark.asyncio
+async def test_perpdex_state_snapshot_reads_all_in_one_call(abi_json_filepaths):
+    market_filepath, exchange_filepath = abi_json_filepaths
+    market = Web3.toChecksumAddress("0x" + "bb" * 20)
+    provider = FakeMulticallProvider(
+        [
+            encode_abi(["uint256"], [100]),  # block number
+            encode_abi(["int256"], [10 * 10**18]),  # total account value
+            encode_abi(["uint256"], [2 * perpdex.Q96]),  # mark price
+            encode_abi(["uint256"], [2 * perpdex.Q96]),  # share mark price
+            encode_abi(["int256"], [-(10**17)]),  # position share
+            encode_abi(["uint40[]"], [[1]]),  # ask order ids
+            encode_abi(["uint40[]"], [[2, 3]]),  # bid order ids
+        ]
+    )
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    async_w3.eth.default_account = Account.create().address
+    w3 = Web3(FakeSyncProvider())
+    snapshot = perpdex.PerpdexStateSnapshot(
+        w3=w3,
+        async_w3=async_w3,
+        config=perpdex.PerpdexStateSnapshotConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+        ),
+    )
+    ticker = perpdex.PerpdexContractTicker(
+        w3=w3,
+        config=perpdex.PerpdexContractTickerConfig(
+            market_contract_abi_json_filepath=market_filepath,
+        ),
+        snapshot=snapshot,
+    )
+    position_getter = perpdex.PerpdexPositionGetter(
+        w3=w3,
+        config=perpdex.PerpdexPositionGetterConfig(
+            market_contract_abi_json_filepath=market_filepath,
+            exchange_contract_abi_json_filepath=exchange_filepath,
+            inverse=False,
+        ),
+        snapshot=snapshot,
+    )
+
+    await snapshot.update()
+
+    assert provider.methods == ["eth_call"]
+    assert snapshot.block_number == 100
+    assert snapshot.limit_order_ids(market, is_bid=True) == (2, 3)
+    assert ticker.last_price() == 2
+    assert position_getter.current_position() == -0.1
+    assert position_getter.unit_leverage_lot() == 5
+
+
+def _ws_log(signature, addresses, types, values, block_number):
+    return {
+        "address": "0x" + "aa" * 20,
+        "topics": [Web3.keccak(text=signature).hex()]
+        + ["0x" + encode_abi(["address"], [a]).hex() for a in addresses],
+        "data": "0x" + encode_abi(types, values).hex(),
+        "blockNumber": hex(block_number),
+        "blockHash": "0x" + "00" * 32,
+        "transactionHash": "0x" + "00" * 32,
+        "transactionIndex": "0x0",
+        "logIndex": "0x0",
+        "removed": False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_perpdex_open_orders_kept_from_logs(tmp_path):
+    market_filepath, exchange_filepath = write_abi_json_filepaths(
+        tmp_path, EXCHANGE_ABI + VIEW_ABI + ORDER_EVENT_ABI
+    )
+    market = Web3.toChecksumAddress("0x" + "bb" * 20)
+    account = Account.create()
+    provider = FakeAsyncProvider(order_ids=[1, 2])
+    async_w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+    async_w3.eth.default_account = account.address
+    subscriber = FakeSubscriber()
+    open_orders = perpdex.PerpdexOpenOrders(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        config=perpdex.PerpdexOpenOrdersConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+        ),
+        subscriber=subscriber,
+    )
+    on_log = subscriber.callbacks[Web3.toChecksumAddress("0x" + "aa" * 20)]
+
+    # bootstrap
+    await open_orders.update()
+    assert open_orders.order_ids(market, is_bid=True) == [1, 2]
+    assert provider.methods.count("eth_call") == 2
+    await open_orders.update()
+    assert provider.methods.count("eth_call") == 2
+
+    on_log(
+        _ws_log(
+            "LimitOrderCreated(address,address,bool,uint256,uint256,uint8,uint256)",
+            [account.address, market],
+            ["bool", "uint256", "uint256", "uint8", "uint256"],
+            [True, 10**17, 2 * perpdex.Q96, 0, 5],
+            block_number=10,
+        )
+    )
+    on_log(
+        _ws_log(
+            "LimitOrderCanceled(address,address,address,bool,uint256)",
+            [account.address, market, "0x" + "00" * 20],
+            ["bool", "uint256"],
+            [True, 1],
+            block_number=11,
+        )
+    )
+    assert open_orders.order_ids(market, is_bid=True) == [2, 5]
+    assert open_orders.order(market, True, 5)["base"] == 10**17
+
+    # ids read at an older block neither revive the cancel nor drop the new order
+    open_orders.reconcile(9, {(market, True): [1, 2], (market, False): []})
+    assert open_orders.order_ids(market, is_bid=True) == [2, 5]
+    # order 2 was filled
+    open_orders.reconcile(12, {(market, True): [5], (market, False): []})
+    assert open_orders.order_ids(market, is_bid=True) == [5]
+
+    # a fill of ours makes it reconcile on the next update
+    assert not open_orders.needs_reconcile()
+    on_log(
+        _ws_log(
+            "LimitOrderSettled(address,address,int256)",
+            [account.address, market],
+            ["int256"],
+            [10**17],
+            block_number=13,
+        )
+    )
+    assert open_orders.needs_reconcile()
+
+
+def test_perpdex_open_orders_reconcile_every_update_without_subscriber(tmp_path):
+    market_filepath, exchange_filepath = write_abi_json_filepaths(
+        tmp_path, EXCHANGE_ABI + VIEW_ABI + ORDER_EVENT_ABI
+    )
+    market = Web3.toChecksumAddress("0x" + "bb" * 20)
+    async_w3 = Web3(FakeAsyncProvider(order_ids=[]), modules={"eth": (AsyncEth,)})
+    async_w3.eth.default_account = Account.create().address
+    open_orders = perpdex.PerpdexOpenOrders(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        config=perpdex.PerpdexOpenOrdersConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+        ),
+    )
+
+    # fills by other txs are in no receipt of ours
+    open_orders.reconcile(1, {(market, True): [], (market, False): []})
+    assert open_orders.needs_reconcile()
+
+
+def test_perpdex_open_orders_reconcile_every_update_without_created_event(
+    tmp_path,
+):
+    market_filepath, exchange_filepath = write_abi_json_filepaths(
+        tmp_path,
+        EXCHANGE_ABI
+        + VIEW_ABI
+        + [abi for abi in ORDER_EVENT_ABI if abi["name"] != "LimitOrderCreated"],
+    )
+    market = Web3.toChecksumAddress("0x" + "bb" * 20)
+    async_w3 = Web3(FakeAsyncProvider(order_ids=[]), modules={"eth": (AsyncEth,)})
+    async_w3.eth.default_account = Account.create().address
+    open_orders = perpdex.PerpdexOpenOrders(
+        w3=Web3(FakeSyncProvider()),
+        async_w3=async_w3,
+        config=perpdex.PerpdexOpenOrdersConfig(
+            market_contract_abi_json_filepaths=[market_filepath],
+            exchange_contract_abi_json_filepath=exchange_filepath,
+        ),
+        subscriber=FakeSubscriber(),
+    )
+
+    # orders posted since are in no log we can decode
+    open_orders.reconcile(1, {(market, True): [], (market, False): []})
+    assert open_orders.needs_reconcile()
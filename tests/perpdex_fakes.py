@@ -0,0 +1,184 @@
+"""Perpdex contract ABIs and fakes shared by the exchange tests and benchmarks"""
+import json
+
+from eth_abi import encode_abi
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+EXCHANGE_ADDRESS = Web3.toChecksumAddress("0x" + "aa" * 20)
+MARKET_ADDRESS = Web3.toChecksumAddress("0x" + "bb" * 20)
+
+EXCHANGE_ABI = [
+    {
+        "name": "cancelLimitOrder",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {
+                "name": "params",
+                "type": "tuple",
+                "components": [
+                    {"name": "market", "type": "address"},
+                    {"name": "isBid", "type": "bool"},
+                    {"name": "orderId", "type": "uint40"},
+                    {"name": "deadline", "type": "uint256"},
+                ],
+            }
+        ],
+        "outputs": [],
+    },
+    {
+        "name": "createLimitOrder",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {
+                "name": "params",
+                "type": "tuple",
+                "components": [
+                    {"name": "market", "type": "address"},
+                    {"name": "isBid", "type": "bool"},
+                    {"name": "base", "type": "uint256"},
+                    {"name": "priceX96", "type": "uint256"},
+                    {"name": "deadline", "type": "uint256"},
+                    {"name": "limitOrderType", "type": "uint8"},
+                ],
+            }
+        ],
+        "outputs": [{"name": "orderId", "type": "uint40"}],
+    },
+    {
+        "name": "getLimitOrderIds",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "trader", "type": "address"},
+            {"name": "market", "type": "address"},
+            {"name": "isBid", "type": "bool"},
+        ],
+        "outputs": [{"name": "", "type": "uint40[]"}],
+    },
+    {
+        "name": "LimitOrderSettled",
+        "type": "event",
+        "anonymous": False,
+        "inputs": [
+            {"name": "trader", "type": "address", "indexed": True},
+            {"name": "market", "type": "address", "indexed": True},
+            {"name": "base", "type": "int256", "indexed": False},
+        ],
+    },
+]
+
+VIEW_ABI = [
+    {
+        "name": "getPositionShare",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "trader", "type": "address"},
+            {"name": "market", "type": "address"},
+        ],
+        "outputs": [{"name": "", "type": "int256"}],
+    },
+    {
+        "name": "getTotalAccountValue",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "trader", "type": "address"}],
+        "outputs": [{"name": "", "type": "int256"}],
+    },
+]
+
+MULTICALL_ABI = {
+    "name": "multicall",
+    "type": "function",
+    "stateMutability": "nonpayable",
+    "inputs": [{"name": "data", "type": "bytes[]"}],
+    "outputs": [{"name": "results", "type": "bytes[]"}],
+}
+
+MARKET_ABI = [
+    {
+        "name": "symbol",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "string"}],
+    },
+    {
+        "name": "getMarkPriceX96",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "uint256"}],
+    },
+    {
+        "name": "getShareMarkPriceX96",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "uint256"}],
+    },
+]
+
+ORDER_EVENT_ABI = [
+    {
+        "name": "LimitOrderCreated",
+        "type": "event",
+        "anonymous": False,
+        "inputs": [
+            {"name": "trader", "type": "address", "indexed": True},
+            {"name": "market", "type": "address", "indexed": True},
+            {"name": "isBid", "type": "bool", "indexed": False},
+            {"name": "base", "type": "uint256", "indexed": False},
+            {"name": "priceX96", "type": "uint256", "indexed": False},
+            {"name": "limitOrderType", "type": "uint8", "indexed": False},
+            {"name": "orderId", "type": "uint256", "indexed": False},
+        ],
+    },
+    {
+        "name": "LimitOrderCanceled",
+        "type": "event",
+        "anonymous": False,
+        "inputs": [
+            {"name": "trader", "type": "address", "indexed": True},
+            {"name": "market", "type": "address", "indexed": True},
+            {"name": "liquidator", "type": "address", "indexed": True},
+            {"name": "isBid", "type": "bool", "indexed": False},
+            {"name": "orderId", "type": "uint256", "indexed": False},
+        ],
+    },
+]
+
+
+class FakeSyncProvider(BaseProvider):
+    # only used for the symbol() calls in constructors
+    def make_request(self, method, params):
+        return {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "result": "0x" + encode_abi(["string"], ["ETH"]).hex(),
+        }
+
+
+def write_abi_json_filepaths(tmp_path, exchange_abi):
+    exchange_filepath = tmp_path / "PerpdexExchange.json"
+    exchange_filepath.write_text(
+        json.dumps(
+            {
+                "address": EXCHANGE_ADDRESS,
+                "abi": exchange_abi,
+            }
+        )
+    )
+    market_filepath = tmp_path / "PerpdexMarketETH.json"
+    market_filepath.write_text(
+        json.dumps(
+            {
+                "address": MARKET_ADDRESS,
+                "abi": MARKET_ABI,
+            }
+        )
+    )
+    return str(market_filepath), str(exchange_filepath)
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from src import backtest
+from src import market_maker as mm
+
+
+def _ohlcv(cl):
+    cl = np.asarray(cl, dtype=np.float64)
+    return dict(
+        timestamp=np.arange(len(cl)) * 60000.0,
+        op=cl,
+        hi=cl + 2,
+        lo=cl - 2,
+        cl=cl,
+        volume=np.ones(len(cl)),
+    )
+
+
+def _create_market_maker(feed, exchange):
+    return mm.MarketMaker(
+        make_price_calculator=mm.NormMakePriceCalculator(
+            ohlcv_getter=feed,
+            config=mm.NormMakePriceCalculatorConfig(timeperiod=10, diff_k=0.5),
+        ),
+        make_size_calculator=mm.SimpleMakeSizeCalculator(
+            position_getter=exchange,
+            config=mm.SimpleMakeSizeCalculatorConfig(unit_lot_size=0.1),
+        ),
+        maker=exchange,
+        price_getter=feed,
+        config=mm.MarketMakerConfig(symbol="USD", inverse=True),
+        quote_reconciler=mm.QuoteReconciler(mm.QuoteReconcilerConfig()),
+    )
+
+
+async def _run(cl):
+    feed = backtest.ReplayFeed(_ohlcv(cl))
+    exchange = backtest.SimulatedExchange(maker_fee_rate=0.0001)
+    return await backtest.Backtester(
+        feed=feed,
+        exchange=exchange,
+        config=backtest.BacktestConfig(warmup_bars=10),
+    ).run(_create_market_maker(feed, exchange))
+
+
+@pytest.mark.asyncio
+async def test_backtester_is_deterministic():
+    cl = 1000 + 10 * np.sin(np.arange(500) / 10)
+
+    result = await _run(cl)
+    result2 = await _run(cl)
+
+    assert len(result.position) == len(cl) - 10
+    assert len(result.fills) > 0
+    # the size calculator keeps the position within one lot
+    assert result.summary()["max_abs_position"] <= 0.1 + 1e-9
+    np.testing.assert_array_equal(result.equity, result2.equity)
+    assert result.fills.equals(result2.fills)
+
+
+@pytest.mark.asyncio
+async def test_simulated_exchange_post_only_and_matching():
+    exchange = backtest.SimulatedExchange()
+    exchange.set_price(100)
+
+    # crossing orders are rejected
+    assert await exchange.post_limit_order("USD", 1, 1, 101) is None
+    assert await exchange.post_limit_order("USD", -1, 1, 99) is None
+    assert exchange.rejected_count == 2
+
+    await exchange.post_limit_order("USD", 1, 1, 99)
+    await exchange.post_limit_order("USD", -1, 2, 103)
+    exchange.match(0, hi=102, lo=98)
+
+    assert exchange.current_position() == 1
+    assert exchange.cash == -99
+    assert [o["side_int"] for o in await exchange.get_open_orders("USD")] == [-1]
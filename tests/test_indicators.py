@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import market_maker as mm
+from src.indicators import RollingMeanStd, WilderATR
+
+
+def _random_ohlcv_df(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cl = 1000 + np.cumsum(rng.normal(0, 1, n))
+    hi = cl + rng.uniform(0, 2, n)
+    lo = cl - rng.uniform(0, 2, n)
+    return pd.DataFrame(
+        dict(
+            timestamp=np.arange(n) * 60_000,
+            op=cl,
+            hi=hi,
+            lo=lo,
+            cl=cl,
+            volume=np.ones(n),
+        )
+    )
+
+
+def test_rolling_mean_std_matches_pandas():
+    values = _random_ohlcv_df(300)["cl"].values
+    rolling = RollingMeanStd(20)
+    for x in values[:-1]:
+        rolling.push(x)
+
+    mean, std = rolling.peek(values[-1])
+
+    expected = pd.Series(values).rolling(20)
+    assert mean == pytest.approx(expected.mean().values[-1])
+    assert std == pytest.approx(expected.std().values[-1])
+
+
+def test_wilder_atr_matches_talib():
+    talib = pytest.importorskip("talib")
+    df = _random_ohlcv_df(300)
+    atr = WilderATR(14)
+    for hi, lo, cl in zip(df["hi"].values[:-1], df["lo"].values[:-1], df["cl"]):
+        atr.push(hi, lo, cl)
+
+    expected = talib.ATR(df["hi"], df["lo"], df["cl"], timeperiod=14)
+    assert atr.peek(df["hi"].values[-1], df["lo"].values[-1]) == pytest.approx(
+        expected.values[-1]
+    )
+
+
+class FakeOhlcvGetter:
+    def __init__(self, df):
+        self.df = df
+
+    def get_ohlcv_arrays(self):
+        return {column: self.df[column].values for column in self.df}
+
+
+def test_norm_make_price_calculator_consumes_only_new_bars():
+    df = _random_ohlcv_df(300)
+    ohlcv_getter = FakeOhlcvGetter(df.iloc[:200])
+    calculator = mm.NormMakePriceCalculator(
+        ohlcv_getter=ohlcv_getter,
+        config=mm.NormMakePriceCalculatorConfig(timeperiod=20, diff_k=2.0),
+    )
+    calculator.ask_bid_prices()
+
+    # sliding window of bars as returned by an exchange api
+    ohlcv_getter.df = df.iloc[100:300]
+    ask_price, bid_price = calculator.ask_bid_prices()
+
+    u = df["cl"].rolling(20).mean().values[-1]
+    s = df["cl"].rolling(20).std().values[-1]
+    assert ask_price == pytest.approx(u + 2.0 * s)
+    assert bid_price == pytest.approx(u - 2.0 * s)
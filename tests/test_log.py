@@ -0,0 +1,41 @@
+import json
+import logging
+
+from src.log import JsonFormatter, RateLimitFilter
+
+
+def _record(lineno, msg="hot %s", args=(1,), level=logging.DEBUG):
+    return logging.LogRecord("x", level, "src/x.py", lineno, msg, args, None)
+
+
+def test_rate_limit_filter_limits_per_call_site(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("src.log.time.monotonic", lambda: now[0])
+    rate_limit = RateLimitFilter(max_per_sec=2)
+
+    assert [rate_limit.filter(_record(1)) for _ in range(5)] == [
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+    # other call sites and levels are not affected
+    assert rate_limit.filter(_record(2))
+    assert rate_limit.filter(_record(1, level=logging.INFO))
+
+    now[0] = 1.0
+    record = _record(1)
+    assert rate_limit.filter(record)
+    assert record.suppressed == 3
+
+
+def test_json_formatter_includes_extra_fields():
+    record = _record(1, msg="snapshot updated block_number=%s", args=(5,))
+    record.block_number = 5
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data["message"] == "snapshot updated block_number=5"
+    assert data["level"] == "DEBUG"
+    assert data["block_number"] == 5
@@ -0,0 +1,187 @@
+import pytest
+
+from src import market_maker as mm
+
+
+def test_quote_reconciler_keeps_unchanged_orders():
+    reconciler = mm.QuoteReconciler(
+        mm.QuoteReconcilerConfig(price_tolerance=0.5, size_tolerance=0.001)
+    )
+    open_orders = [
+        dict(order_id=1, side_int=-1, size=0.1, price=1010.2),
+        dict(order_id=2, side_int=1, size=0.1, price=990),
+    ]
+    target_orders = [
+        dict(side_int=-1, size=0.1, price=1010),
+        dict(side_int=1, size=0.1, price=990),
+    ]
+
+    assert reconciler.reconcile(open_orders, target_orders) == ([], [])
+
+
+def test_quote_reconciler_replaces_moved_legs():
+    reconciler = mm.QuoteReconciler(mm.QuoteReconcilerConfig())
+    open_orders = [
+        dict(order_id=1, side_int=-1, size=0.1, price=1010),
+        dict(order_id=2, side_int=1, size=0.1, price=990),
+        # unknown order
+        dict(order_id=3, side_int=1, size=None, price=None),
+    ]
+    target_orders = [
+        dict(side_int=-1, size=0.1, price=1010),
+        dict(side_int=1, size=0.2, price=990),
+    ]
+
+    cancel_orders, new_orders = reconciler.reconcile(open_orders, target_orders)
+
+    assert cancel_orders == [
+        dict(side_int=1, order_id=2),
+        dict(side_int=1, order_id=3),
+    ]
+    assert new_orders == [dict(side_int=1, size=0.2, price=990)]
+
+
+def test_quote_reconciler_cancels_zero_size_target():
+    reconciler = mm.QuoteReconciler(mm.QuoteReconcilerConfig())
+    open_orders = [dict(order_id=1, side_int=-1, size=0.1, price=1010)]
+    target_orders = [dict(side_int=-1, size=0, price=1010)]
+
+    assert reconciler.reconcile(open_orders, target_orders) == (
+        [dict(side_int=-1, order_id=1)],
+        [],
+    )
+
+
+class FakePriceCalculator:
+    def ask_bid_prices(self):
+        return 1010, 990
+
+
+class FakeSizeCalculator:
+    def ask_bid_sizes(self):
+        return 0.1, 0.1
+
+
+class FakeTicker:
+    def last_price(self):
+        return 1000
+
+
+class FakeMaker:
+    def __init__(self, open_orders):
+        self.open_orders = open_orders
+        self.calls = []
+
+    async def get_open_orders(self, symbol):
+        return self.open_orders
+
+    async def cancel_and_post_limit_orders(self, symbol, cancel_orders, orders):
+        self.calls.append((cancel_orders, orders))
+
+
+@pytest.mark.asyncio
+async def test_market_maker_execute_sends_nothing_for_unchanged_quotes():
+    maker = FakeMaker(
+        open_orders=[
+            dict(order_id=1, side_int=-1, size=0.1, price=1010),
+            dict(order_id=2, side_int=1, size=0.1, price=990),
+        ]
+    )
+    market_maker = mm.MarketMaker(
+        make_price_calculator=FakePriceCalculator(),
+        make_size_calculator=FakeSizeCalculator(),
+        maker=maker,
+        price_getter=FakeTicker(),
+        config=mm.MarketMakerConfig(symbol="USD", inverse=True),
+        quote_reconciler=mm.QuoteReconciler(mm.QuoteReconcilerConfig()),
+    )
+
+    await market_maker.execute()
+
+    assert maker.calls == []
+
+
+def test_quote_ladder_target_orders():
+    ladder = mm.QuoteLadder(
+        mm.QuoteLadderConfig(levels=3, spacing_rate=0.01, size_decay=0.5)
+    )
+
+    orders = ladder.target_orders(
+        ask_price=1000, bid_price=900, ask_size=0.7, bid_size=1.4
+    )
+
+    assert [o["side_int"] for o in orders] == [-1, -1, -1, 1, 1, 1]
+    assert [o["price"] for o in orders] == pytest.approx(
+        [1000, 1010, 1020, 900, 891, 882]
+    )
+    assert [o["size"] for o in orders] == pytest.approx([0.4, 0.2, 0.1, 0.8, 0.4, 0.2])
+
+
+@pytest.mark.asyncio
+async def test_market_maker_execute_posts_ladder_in_one_batch():
+    maker = FakeMaker(
+        open_orders=[
+            dict(order_id=1, side_int=-1, size=0.05, price=1010),
+            dict(order_id=2, side_int=1, size=0.05, price=990),
+        ]
+    )
+    market_maker = mm.MarketMaker(
+        make_price_calculator=FakePriceCalculator(),
+        make_size_calculator=FakeSizeCalculator(),
+        maker=maker,
+        price_getter=FakeTicker(),
+        config=mm.MarketMakerConfig(symbol="USD", inverse=True),
+        quote_reconciler=mm.QuoteReconciler(
+            mm.QuoteReconcilerConfig(size_tolerance=1e-9)
+        ),
+        quote_ladder=mm.QuoteLadder(mm.QuoteLadderConfig(levels=2)),
+    )
+
+    await market_maker.execute()
+
+    # level 0 rests already. the level 1 orders go in one call
+    assert len(maker.calls) == 1
+    cancel_orders, orders = maker.calls[0]
+    assert cancel_orders == []
+    assert [o["side_int"] for o in orders] == [-1, 1]
+    assert [o["price"] for o in orders] == pytest.approx([1011.01, 989.01])
+    assert [o["size"] for o in orders] == pytest.approx([0.05, 0.05])
+
+
+class FakeStateUpdater:
+    def __init__(self):
+        self.update_count = 0
+
+    async def update(self):
+        self.update_count += 1
+
+
+class FakeMarketMaker:
+    def __init__(self, error=None):
+        self.error = error
+        self.execute_count = 0
+
+    async def execute(self):
+        self.execute_count += 1
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.mark.asyncio
+async def test_multi_market_maker_reads_state_once_and_quotes_all_markets():
+    state_updater = FakeStateUpdater()
+    market_makers = [
+        FakeMarketMaker(),
+        FakeMarketMaker(error=ValueError("revert")),
+        FakeMarketMaker(),
+    ]
+    multi_market_maker = mm.MultiMarketMaker(
+        market_makers=market_makers,
+        state_updater=state_updater,
+    )
+
+    with pytest.raises(ValueError):
+        await multi_market_maker.execute()
+
+    assert state_updater.update_count == 1
+    assert [m.execute_count for m in market_makers] == [1, 1, 1]
@@ -0,0 +1,22 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from src.metrics import async_rpc_metrics_middleware
+
+
+def _rpc_count(method):
+    return REGISTRY.get_sample_value("mm_rpc_seconds_count", {"method": method}) or 0
+
+
+@pytest.mark.asyncio
+async def test_async_rpc_metrics_middleware_observes_each_request():
+    async def make_request(method, params):
+        return {"result": "0x1"}
+
+    middleware = await async_rpc_metrics_middleware(make_request, None)
+    before = _rpc_count("eth_blockNumber")
+
+    assert await middleware("eth_blockNumber", []) == {"result": "0x1"}
+    await middleware("eth_blockNumber", [])
+
+    assert _rpc_count("eth_blockNumber") == before + 2
@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.ohlcv import OhlcvRingBuffer
+
+
+def _bar(ts, cl):
+    return [ts, cl, cl, cl, cl, 1.0]
+
+
+def test_ohlcv_ring_buffer_replaces_forming_bar():
+    store = OhlcvRingBuffer(capacity=10)
+    store.update([_bar(0, 1.0), _bar(60, 2.0)])
+    store.update([_bar(60, 3.0), _bar(120, 4.0)])
+    # older bars are ignored
+    store.update([_bar(0, 9.0)])
+
+    arrays = store.arrays()
+    assert list(arrays["timestamp"]) == [0, 60, 120]
+    assert list(arrays["cl"]) == [1.0, 3.0, 4.0]
+    assert store.last_timestamp() == 120
+
+
+def test_ohlcv_ring_buffer_keeps_latest_capacity_bars():
+    store = OhlcvRingBuffer(capacity=3)
+    for i in range(10):
+        store.update([_bar(i, float(i))])
+
+    arrays = store.arrays()
+    assert list(arrays["cl"]) == [7.0, 8.0, 9.0]
+    # views on the buffer, not copies
+    assert np.shares_memory(arrays["cl"], store.arrays()["cl"])
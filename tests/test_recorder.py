@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+import pytest
+
+from src.recorder import Recorder, RecorderConfig, read_records
+
+
+@pytest.mark.asyncio
+async def test_recorder_writes_in_background_and_flushes_on_stop(tmp_path):
+    recorder = Recorder(RecorderConfig(dirpath=str(tmp_path), flush_interval_sec=0.01))
+    task = asyncio.create_task(recorder.run())
+
+    recorder.record("quote", symbol="USD", ask_price=1.01, bid_price=0.99)
+    await asyncio.sleep(0.05)
+    assert len(read_records(str(tmp_path), "quote")) == 1
+
+    recorder.record("quote", symbol="USD", ask_price=1.02, bid_price=None)
+    recorder.record("tx", tx_hash="0x01", gas_used=21000)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    quotes = read_records(str(tmp_path), "quote")
+    assert list(quotes["ask_price"]) == [1.01, 1.02]
+    assert list(read_records(str(tmp_path), "tx")["gas_used"]) == [21000]
+
+
+def test_recorder_rolls_files_by_hour(tmp_path):
+    recorder = Recorder(RecorderConfig(dirpath=str(tmp_path)))
+    recorder._write(
+        [
+            ("quote", dict(timestamp=3599.0, mark_price=1.0)),
+            ("quote", dict(timestamp=3600.0, mark_price=2.0)),
+        ]
+    )
+    recorder.close()
+
+    assert len(os.listdir(tmp_path / "quote")) == 2
+    assert list(read_records(str(tmp_path), "quote")["mark_price"]) == [1.0, 2.0]
+
+
+def test_recorder_keeps_column_types_when_first_values_are_none(tmp_path):
+    recorder = Recorder(RecorderConfig(dirpath=str(tmp_path)))
+    # e.g. a failed sub-call of the snapshot multicall
+    recorder._write(
+        [("snapshot", dict(timestamp=1.0, block_number=1, mark_price=None))]
+    )
+    recorder._write([("snapshot", dict(timestamp=2.0, block_number=2, mark_price=2.0))])
+    recorder.close()
+
+    snapshots = read_records(str(tmp_path), "snapshot")
+    assert list(snapshots["block_number"]) == [1, 2]
+    assert snapshots["mark_price"].isna().tolist() == [True, False]
+
+
+def test_recorder_drops_only_the_broken_batch(tmp_path):
+    recorder = Recorder(RecorderConfig(dirpath=str(tmp_path)))
+    recorder._write([("tx", dict(timestamp=1.0, gas_used=21000))])
+    recorder._write([("tx", dict(timestamp=2.0, gas_used="not a number"))])
+    recorder._write([("tx", dict(timestamp=3.0, gas_used=42000))])
+    recorder.close()
+
+    assert list(read_records(str(tmp_path), "tx")["gas_used"]) == [21000, 42000]
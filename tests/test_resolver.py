@@ -0,0 +1,53 @@
+import pytest
+
+from src.resolver import create_market_maker_bot, load_web3_provider_uris
+
+
+@pytest.fixture
+def web3_env(monkeypatch):
+    for name in [
+        "WEB3_PROVIDER_URI",
+        "WEB3_HTTP_PROVIDER_URI",
+        "WEB3_WS_PROVIDER_URI",
+    ]:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("WEB3_NETWORK_NAME", "localhost")
+    monkeypatch.setenv("USER_PRIVATE_KEY", "0x" + "11" * 32)
+    return monkeypatch
+
+
+def test_load_web3_provider_uris_http_only(web3_env):
+    web3_env.setenv("WEB3_PROVIDER_URI", "http://node:8545")
+
+    assert load_web3_provider_uris() == (
+        "http://node:8545",
+        "http://node:8545",
+        None,
+    )
+
+
+def test_load_web3_provider_uris_wss_with_http(web3_env):
+    web3_env.setenv("WEB3_PROVIDER_URI", "wss://node/ws")
+    web3_env.setenv("WEB3_HTTP_PROVIDER_URI", "https://a/rpc,https://b/rpc")
+
+    # the wss uri is also used for event-driven requoting
+    assert load_web3_provider_uris() == (
+        "wss://node/ws",
+        "https://a/rpc,https://b/rpc",
+        "wss://node/ws",
+    )
+
+
+def test_create_market_maker_bot_wss_only_config(web3_env):
+    web3_env.setenv("WEB3_PROVIDER_URI", "wss://node/ws")
+
+    with pytest.raises(ValueError, match="WEB3_HTTP_PROVIDER_URI"):
+        create_market_maker_bot()
+
+
+def test_load_web3_provider_uris_rejects_ws_http_uri(web3_env):
+    web3_env.setenv("WEB3_PROVIDER_URI", "http://node:8545")
+    web3_env.setenv("WEB3_HTTP_PROVIDER_URI", "https://a/rpc,wss://b/ws")
+
+    with pytest.raises(ValueError, match="WEB3_HTTP_PROVIDER_URI"):
+        load_web3_provider_uris()
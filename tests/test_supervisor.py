@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from src.supervisor import Supervisor, SupervisorConfig
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_only_failed_component():
+    supervisor = Supervisor(SupervisorConfig(initial_backoff_sec=0.001))
+    starts = {"flaky": 0, "steady": 0}
+
+    async def flaky():
+        starts["flaky"] += 1
+        await asyncio.sleep(0.001)
+        if starts["flaky"] <= 2:
+            raise ValueError("crash")
+        await asyncio.sleep(10)
+
+    async def steady():
+        starts["steady"] += 1
+        await asyncio.sleep(10)
+
+    supervisor.start("flaky", flaky)
+    supervisor.start("steady", steady)
+    await asyncio.sleep(0.1)
+
+    assert starts == {"flaky": 3, "steady": 1}
+    assert supervisor.health_check()
+    await supervisor.stop()
+    assert not supervisor.health_check()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_gives_up_after_max_restarts():
+    supervisor = Supervisor(SupervisorConfig(initial_backoff_sec=0.001, max_restarts=1))
+    starts = 0
+
+    async def failing():
+        nonlocal starts
+        starts += 1
+        raise ValueError("crash")
+
+    supervisor.start("failing", failing)
+    await asyncio.wait_for(supervisor.wait(), timeout=1)
+
+    assert starts == 2
+    assert not supervisor.health_check()
+    await supervisor.stop()
+
+
+@pytest.mark.asyncio
+async def test_supervisor_counts_only_consecutive_restarts():
+    supervisor = Supervisor(
+        SupervisorConfig(
+            initial_backoff_sec=0.001, reset_after_sec=0.02, max_restarts=1
+        )
+    )
+    starts = 0
+
+    async def occasionally_failing():
+        nonlocal starts
+        starts += 1
+        # healthy for longer than reset_after_sec before each crash
+        await asyncio.sleep(0.03)
+        raise ValueError("crash")
+
+    supervisor.start("occasionally_failing", occasionally_failing)
+    await asyncio.sleep(0.2)
+
+    assert starts >= 3
+    assert supervisor.health_check()
+    await supervisor.stop()
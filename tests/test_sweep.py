@@ -0,0 +1,47 @@
+import numpy as np
+
+from src import sweep
+
+
+def _ohlcv(n):
+    cl = 1000 + 10 * np.sin(np.arange(n) / 10)
+    return dict(
+        timestamp=np.arange(n) * 60000.0,
+        op=cl,
+        hi=cl + 2,
+        lo=cl - 2,
+        cl=cl,
+        volume=np.ones(n),
+    )
+
+
+def test_param_sets_random_search_is_a_subset_of_the_grid():
+    config = sweep.SweepConfig(
+        price_params=dict(timeperiod=[10, 20], diff_k=[0.1, 0.2, 0.5]),
+        size_params=dict(unit_lot_size=[0.1]),
+    )
+    grid = sweep.param_sets(config)
+    assert len(grid) == 6
+    assert grid[0] == (dict(timeperiod=10, diff_k=0.1), dict(unit_lot_size=0.1))
+
+    config.samples = 3
+    samples = sweep.param_sets(config)
+    assert len(samples) == 3
+    assert all(params in grid for params in samples)
+    assert samples == sweep.param_sets(config)
+
+
+def test_run_sweep_ranks_results_by_pnl():
+    config = sweep.SweepConfig(
+        price_calculator="norm",
+        price_params=dict(timeperiod=[10, 20], diff_k=[0.1, 0.5]),
+        size_params=dict(unit_lot_size=[0.1]),
+    )
+
+    results = sweep.run_sweep(_ohlcv(300), config, workers=2)
+
+    assert len(results) == 4
+    assert list(results["pnl"]) == sorted(results["pnl"], reverse=True)
+    assert {"price.timeperiod", "fill_rate", "inventory_variance"} <= set(
+        results.columns
+    )